@@ -27,27 +27,87 @@ bl_info = {
     "category": "Compositing",
 }
 
+import os
 import re
 import math
+import time
 
 import bpy
+import numpy as np
+from bpy.app.handlers import persistent
 
 from .names import \
     compify_mat_name, \
     compify_baked_texture_name, \
     MAIN_NODE_NAME, \
     BAKE_IMAGE_NODE_NAME, \
-    UV_LAYER_NAME
+    UV_LAYER_NAME, \
+    PREP_FINGERPRINT_PROP, \
+    PREP_RESOLUTION_PROP, \
+    PREP_LAYOUT_PROP, \
+    BAKE_FINGERPRINT_PROP, \
+    UDIM_TILE_PROP
 from .node_groups import \
     ensure_footage_group, \
     ensure_camera_project_group, \
     ensure_feathered_square_group
-from .uv_utils import leftmost_u
+from .uv_utils import \
+    uv_bounds, \
+    island_margin_fraction, \
+    pin_uvs, \
+    restore_uv_pins, \
+    offset_uvs, \
+    udim_tile_offset, \
+    assign_udim_tiles, \
+    uv_areas, \
+    scale_uvs, \
+    uv_layout_hash
+from .mesh_utils import mesh_fingerprint, world_surface_areas
+from .camera_utils import camera_texel_weights, texel_density_resolution
 from .camera_align import camera_align_register, camera_align_unregister
-from .bake import Baker
+from .bake import \
+    Baker, \
+    ensure_lighting_decode_node, \
+    load_bake, \
+    show_bake, \
+    use_camera_project_group, \
+    use_footage_render_group
+from .image_utils import \
+    render_output_path, \
+    saved_image_ok, \
+    downsample_pixels, \
+    write_exr, \
+    AsyncFileWriter
+from .bake_cache import \
+    bake_decision, \
+    bake_sequence_path, \
+    light_states, \
+    ProxyBakeTracker
+from .journal import journal_path, RenderJournal
+from .interpolation import KeyframeSchedule
+from .vertex_projection import update_vertex_projection, clear_vertex_projection
 
 #========================================================
 
+# How often the modal operators check whether their (timer and handler
+# driven) work is done, to wrap up.  This isn't on the critical path.
+WRAP_UP_INTERVAL = 0.5
+
+# Preview bakes (see the `preview` option of Compify Bake) are done at
+# this fraction of the configured resolution (but no less than the
+# minimum), with this many samples.
+PREVIEW_RES_DIVISOR = 4
+PREVIEW_MIN_RES = 64
+PREVIEW_SAMPLES = 16
+
+# How often Compify Render checks whether a frame is done rendering.  The
+# render handlers run on the render thread, where registering a timer to
+# resume the pipeline right away isn't safe, so it has to poll.  Each
+# check is just a flag and a job lookup, so polling often is cheap, and
+# this matches the window manager's idle sleep, below which a shorter
+# interval wouldn't be noticed any sooner anyway.
+RENDER_POLL_INTERVAL = 0.005
+
 
 class CompifyPanel(bpy.types.Panel):
     """Composite in 3D space."""
@@ -75,6 +135,7 @@ class CompifyPanel(bpy.types.Panel):
             box.prop(context.scene.compify_config.footage, "source")
             box.prop(context.scene.compify_config.footage.colorspace_settings, "name", text="  Color Space")
         box.prop(context.scene.compify_config, "camera", text="  Camera")
+        box.prop(context.scene.compify_config, "use_vertex_projection", text="  Vertex Projection")
 
         layout.separator(factor=0.5)
 
@@ -96,14 +157,50 @@ class CompifyPanel(bpy.types.Panel):
 
         layout.use_property_split = True
         layout.prop(context.scene.compify_config, "bake_uv_margin")
-        layout.prop(context.scene.compify_config, "bake_image_res")
+        layout.prop(context.scene.compify_config, "bake_camera_texel_density")
+        if context.scene.compify_config.bake_camera_texel_density:
+            layout.prop(context.scene.compify_config, "bake_texels_per_pixel")
+        row = layout.row()
+        row.enabled = not context.scene.compify_config.bake_camera_texel_density
+        row.prop(context.scene.compify_config, "bake_image_res")
+        layout.prop(context.scene.compify_config, "bake_udim_tiles")
+        layout.prop(context.scene.compify_config, "bake_precision")
+        layout.prop(context.scene.compify_config, "use_bake_quality")
+        if context.scene.compify_config.use_bake_quality:
+            col = layout.column(align=True)
+            col.prop(context.scene.compify_config, "bake_samples")
+            col.prop(context.scene.compify_config, "bake_adaptive_threshold")
+            col.prop(context.scene.compify_config, "bake_max_bounces")
+            col.prop(context.scene.compify_config, "bake_denoise")
+            if context.scene.compify_config.bake_denoise:
+                col.prop(context.scene.compify_config, "bake_denoise_strength")
+        layout.prop(context.scene.compify_config, "bake_skip_unchanged")
+        layout.prop(context.scene.compify_config, "bake_visible_only")
+        layout.prop(context.scene.compify_config, "bake_interpolation_interval")
+        if context.scene.compify_config.bake_interpolation_interval > 1:
+            layout.prop(context.scene.compify_config, "bake_interpolation_threshold")
+        layout.prop(context.scene.compify_config, "use_bake_cache")
+        if context.scene.compify_config.use_bake_cache:
+            layout.prop(context.scene.compify_config, "bake_cache_dir")
+        layout.prop(context.scene.compify_config, "bake_sequence_dir")
+        layout.prop(context.scene.compify_config, "bake_sequence_downsample")
+        layout.prop(context.scene.compify_config, "use_bake_sequence")
 
         layout.separator(factor=1.0)
 
         #--------
-        layout.operator("material.compify_prep_scene")
-        layout.operator("material.compify_bake")
-        layout.operator("render.compify_render")
+        row = layout.row(align=True)
+        row.operator("material.compify_prep_scene")
+        row.operator("material.compify_prep_scene", text="", icon='FILE_REFRESH').full_reprep = True
+        row = layout.row(align=True)
+        row.operator("material.compify_bake")
+        row.operator("material.compify_bake", text="", icon='SHADING_RENDERED').preview = True
+        if context.scene.compify_config.bake_udim_tiles > 1:
+            row.operator("material.compify_bake", text="", icon='UV_SYNC_SELECT').changed_only = True
+        layout.operator("material.compify_bake_sequence")
+        row = layout.row(align=True)
+        row.operator("render.compify_render")
+        row.prop(context.scene.compify_config, "render_skip_existing", text="", icon='FILE_TICK')
 
 
 class CompifyCameraPanel(bpy.types.Panel):
@@ -239,6 +336,9 @@ def create_compify_material(name, camera, footage):
     mat.node_tree.links.new(baked_lighting.outputs['Color'], compify_footage.inputs['Baked Lighting'])
     mat.node_tree.links.new(compify_footage.outputs['Shader'], output.inputs['Surface'])
 
+    # Decoding of reduced-precision baked lighting.
+    ensure_lighting_decode_node(mat)
+
     return mat
 
 
@@ -257,15 +357,106 @@ def change_footage_camera(config, context):
         return
     mat = get_compify_material(context)
     if mat != None:
-        group = ensure_camera_project_group(config.camera)
-        mat.node_tree.nodes["Camera Project"].node_tree = group
+        use_camera_project_group(mat, config.camera)
+
+
+# Keeps the footage camera's projection group up to date with edits to
+# the camera's lens settings and their animation, which are copied into
+# the group rather than driven (see `ensure_camera_project_group()`).
+#
+# Frame changes during playback and rendering only re-evaluate the lens
+# animation rather than edit it, so they're ignored.
+@persistent
+def camera_lens_update_handler(scene, depsgraph):
+    camera = scene.compify_config.camera
+    if camera == None or camera.type != 'CAMERA':
+        return
+    screen = bpy.context.screen
+    if (screen != None and screen.is_animation_playing) or bpy.app.is_job_running('RENDER'):
+        return
+    for update in depsgraph.updates:
+        if update.id.original == camera.data:
+            change_footage_camera(scene.compify_config, bpy.context)
+            return
+
+
+def change_vertex_projection(config, context):
+    if config.use_vertex_projection:
+        update_vertex_projection(context)
+    else:
+        clear_vertex_projection(context)
+
+
+# Updates the per-vertex footage projection of the proxies (if enabled)
+# on frame changes.
+@persistent
+def vertex_projection_frame_handler(scene, depsgraph):
+    if scene.compify_config.use_vertex_projection:
+        update_vertex_projection(bpy.context)
+
+
+# Updates the per-vertex footage projection of the proxies (if enabled)
+# when the footage camera, the proxies' transforms, or the material
+# change outside of frame changes.
+#
+# Proxy geometry edits are deliberately not reacted to, since writing the
+# projection is itself a geometry edit.  They're picked up on the next
+# frame change.
+@persistent
+def vertex_projection_update_handler(scene, depsgraph):
+    config = scene.compify_config
+    if not config.use_vertex_projection or config.camera == None or config.geo_collection == None:
+        return
+    watched = {config.camera, config.camera.data, bpy.data.materials.get(compify_mat_name(bpy.context))}
+    for update in depsgraph.updates:
+        original = update.id.original
+        is_proxy = isinstance(original, bpy.types.Object) and original.name in config.geo_collection.objects
+        if original in watched or (update.is_updated_transform and is_proxy):
+            update_vertex_projection(bpy.context)
+            return
+
+
+# Packs the compify UV layer of the given proxy objects.
+#
+# The UVs of `locked_objects` (a subset of `objects`) are pinned and
+# locked in place for the duration, so that the other islands are packed
+# into the free space around them.  Islands are packed into the UDIM tile
+# closest to where they currently are.
+def pack_proxy_uvs(context, objects, locked_objects, margin):
+    for obj in context.selected_objects:
+        obj.select_set(False)
+    for obj in objects:
+        obj.select_set(True)
+    context.view_layer.objects.active = objects[0]
+
+    saved_pins = pin_uvs(locked_objects, UV_LAYER_NAME)
+    bpy.ops.object.mode_set(mode='EDIT')
+    bpy.ops.mesh.select_all(action='SELECT')
+    bpy.ops.uv.select_all(action='SELECT')
+    bpy.ops.uv.pack_islands(
+        udim_source='CLOSEST_UDIM',
+        rotate=False,
+        margin_method='FRACTION',
+        margin=margin,
+        pin=True,
+        pin_method='LOCKED',
+    )
+    bpy.ops.object.mode_set(mode='OBJECT')
+    restore_uv_pins(saved_pins, UV_LAYER_NAME)
 
 
 class CompifyPrepScene(bpy.types.Operator):
     """Prepares the scene for compification"""
     bl_idname = "material.compify_prep_scene"
     bl_label = "Prep Scene"
-    bl_options = {'UNDO'}
+    bl_options = {'REGISTER', 'UNDO'}
+
+    full_reprep: bpy.props.BoolProperty(
+        name="Full Re-Prep",
+        description="Re-unwrap all proxy meshes, even ones that haven't changed since the last prep",
+        default=False,
+        options={'SKIP_SAVE'},
+    )
 
     @classmethod
     def poll(cls, context):
@@ -276,58 +467,227 @@ class CompifyPrepScene(bpy.types.Operator):
             and len(context.scene.compify_config.geo_collection.all_objects) > 0
 
     def execute(self, context):
-        proxy_collection = context.scene.compify_config.geo_collection
-        lights_collection = context.scene.compify_config.lights_collection
+        config = context.scene.compify_config
+        proxy_collection = config.geo_collection
+        lights_collection = config.lights_collection
         material = ensure_compify_material(context)
 
-        # Deselect all objects.
-        for obj in context.scene.objects:
+        # Deselect all objects.  Only touching the ones that are actually
+        # selected avoids a selection update per object in big scenes.
+        for obj in context.selected_objects:
             obj.select_set(False)
 
-        # Set up proxy objects.
+        # Figure out which proxy meshes need their compify UV layer or
+        # material set up.  This is done as a read-only pass first, so
+        # that the actual changes below are applied together and only to
+        # meshes that differ from the target state, rather than clearing
+        # and re-adding materials on everything (each of which tags the
+        # mesh for a depsgraph update).
+        proxy_objects = []
+        setup_meshes = {}
         for obj in proxy_collection.all_objects:
             if obj.type == 'MESH':
-                # Select it.
-                obj.select_set(True)
-                context.view_layer.objects.active = obj
-
-                # Ensure it has a compify UV layer and that
-                # it's selected.
-                if UV_LAYER_NAME not in obj.data.uv_layers:
-                    obj.data.uv_layers.new(name=UV_LAYER_NAME)
-                obj.data.uv_layers.active = obj.data.uv_layers[UV_LAYER_NAME]
-
-                # Set it up with the footage material.
-                obj.data.materials.clear()
-                obj.data.materials.append(material)
-
-        # UV unwrap the proxy objects.
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.select_all(action='SELECT')
-        bpy.ops.uv.smart_project(
-            angle_limit=(math.pi/180)*60, # 60 degrees
-            island_margin=0.001,
-            area_weight=0.0,
-            correct_aspect=False,
-            scale_to_bounds=False,
+                proxy_objects.append(obj)
+                mesh = obj.data
+                if mesh in setup_meshes:
+                    continue
+                uv_layer = mesh.uv_layers.get(UV_LAYER_NAME)
+                needs_uv_layer = uv_layer == None
+                needs_active_uv = needs_uv_layer or mesh.uv_layers.active != uv_layer
+                needs_material = len(mesh.materials) != 1 or mesh.materials[0] != material
+                setup_meshes[mesh] = (needs_uv_layer, needs_active_uv, needs_material)
+
+        # Set up proxy objects.
+        #
+        # The depsgraph tagging is batched by Blender itself: these calls
+        # only flag the meshes (and the depsgraph relations) as needing an
+        # update, and all the flags are flushed together by the single
+        # evaluation that happens at the edit mode switch below, or at the
+        # end of the operator.  Explicitly updating the meshes here would
+        # only add evaluations.
+        changed_meshes = set()
+        for mesh, (needs_uv_layer, needs_active_uv, needs_material) in setup_meshes.items():
+            # Ensure it has a compify UV layer and that
+            # it's selected.
+            if needs_uv_layer:
+                mesh.uv_layers.new(name=UV_LAYER_NAME)
+            if needs_active_uv:
+                mesh.uv_layers.active = mesh.uv_layers[UV_LAYER_NAME]
+
+            # Set it up with the footage material, replacing a single
+            # slot's material in place rather than removing and re-adding
+            # the slot.
+            if needs_material:
+                if len(mesh.materials) == 1:
+                    mesh.materials[0] = material
+                else:
+                    mesh.materials.clear()
+                    mesh.materials.append(material)
+
+            if needs_uv_layer or needs_active_uv or needs_material:
+                changed_meshes.add(mesh)
+        changed_object_count = len([obj for obj in proxy_objects if obj.data in changed_meshes])
+
+        # With camera-weighted texel density, each proxy gets a share of
+        # the atlas in proportion to how much of the footage frame it
+        # covers, and the bake resolution is chosen to hit the target
+        # texel density.
+        texel_weights = None
+        if config.bake_camera_texel_density:
+            weights = camera_texel_weights(context.scene, config.camera, proxy_objects, config.bake_texels_per_pixel)
+            texel_weights = dict(zip(proxy_objects, weights))
+            res = texel_density_resolution(weights, config.bake_udim_tiles)
+            if res != config.bake_image_res:
+                config.bake_image_res = res
+
+        # Figure out which proxy meshes have changed since they were last
+        # unwrapped.  The bake settings that shape the layout are part of
+        # the fingerprint.  The bake resolution isn't, so that e.g. a
+        # camera coverage change that moves it doesn't re-unwrap every
+        # proxy (see the margin check below instead).
+        settings = (
+            config.bake_uv_margin,
+            config.bake_udim_tiles,
+            config.bake_camera_texel_density,
         )
-        bpy.ops.object.mode_set(mode='OBJECT')
-
-        # We have to do the UV island margins twice, because Blender's
-        # `island_margin` is stupid beyond belief and corresponds to
-        # nothing absolute that we can depend on.  So what we're doing
-        # here is saying, "Hey, what was the actual margin achieved
-        # with `island_margin=0.001`?  Okay, now let's redo it based on
-        # that result."  It's still not 100% precise even with this,
-        # but with a bit of buffer it's close enough.
-        actual_margin = leftmost_u(context.selected_objects, UV_LAYER_NAME)
-        actual_margin_pixels = actual_margin * context.scene.compify_config.bake_image_res
-        target_margin_with_buffer = context.scene.compify_config.bake_uv_margin * (5.0 / 4.0)
-        correction_factor = target_margin_with_buffer / actual_margin_pixels
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.uv.select_all(action='SELECT') 
-        bpy.ops.uv.pack_islands(rotate=False, margin = 0.001 * correction_factor)
-        bpy.ops.object.mode_set(mode='OBJECT')
+        fingerprints = {}
+        for obj in proxy_objects:
+            if obj.data not in fingerprints:
+                fingerprints[obj.data] = mesh_fingerprint(obj.data, settings)
+        dirty_objects = []
+        clean_objects = []
+        for obj in proxy_objects:
+            needs_uv_layer = setup_meshes[obj.data][0]
+            if self.full_reprep or needs_uv_layer or obj.data.get(PREP_FINGERPRINT_PROP) != fingerprints[obj.data]:
+                dirty_objects.append(obj)
+            else:
+                clean_objects.append(obj)
+
+        # Island margins are a fraction of the layout, so margins laid out
+        # for a higher bake resolution than the current one are now too
+        # thin in pixels.  Those layouts need packing again, but not
+        # re-unwrapping.  Margins laid out for a lower resolution are just
+        # wider than needed, and are left alone.
+        thin_margins = any(
+            obj.data.get(PREP_RESOLUTION_PROP, 0) > config.bake_image_res for obj in clean_objects
+        )
+
+        if len(dirty_objects) == 0 and not thin_margins:
+            self.report({'INFO'}, "Compify: set up {} of {} proxy objects, UVs are all up to date".format(
+                changed_object_count,
+                len(proxy_objects),
+            ))
+            return {'FINISHED'}
+
+        # With `margin_method='FRACTION'` the island margin is an exact
+        # fraction of the final UV layout rather than Blender's arbitrary
+        # relative units, so we can solve for it from the bake settings up
+        # front instead of packing once, measuring, and packing again.
+        margin = island_margin_fraction(config.bake_uv_margin, config.bake_image_res)
+
+        # UV unwrap the changed proxy objects in a single pass.
+        if len(dirty_objects) > 0:
+            for obj in dirty_objects:
+                obj.select_set(True)
+            context.view_layer.objects.active = dirty_objects[0]
+            bpy.ops.object.mode_set(mode='EDIT')
+            bpy.ops.mesh.select_all(action='SELECT')
+            bpy.ops.uv.smart_project(
+                angle_limit=(math.pi/180)*60, # 60 degrees
+                margin_method='FRACTION',
+                island_margin=margin,
+                area_weight=0.0,
+                correct_aspect=False,
+                scale_to_bounds=False,
+            )
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        if texel_weights != None and len(dirty_objects) > 0:
+            # Rescale each changed proxy's islands so that its share of the
+            # atlas follows its texel weight rather than its surface area.
+            # If some proxies were left as-is, the changed ones are given
+            # the same UV area per texel weight as those already have, so
+            # that density stays consistent across all proxies.  The
+            # packing below then keeps these relative sizes.
+            current_areas = uv_areas(dirty_objects, UV_LAYER_NAME)
+            target_areas = np.array([texel_weights[obj] for obj in dirty_objects])
+            clean_weight = sum(texel_weights[obj] for obj in clean_objects)
+            if clean_weight > 0.0:
+                target_areas *= uv_areas(clean_objects, UV_LAYER_NAME).sum() / clean_weight
+            scales = np.ones(len(dirty_objects))
+            valid = current_areas > 0.0
+            scales[valid] = np.sqrt(target_areas[valid] / current_areas[valid])
+            if clean_weight <= 0.0:
+                scales /= scales.max()
+            scale_uvs(dirty_objects, UV_LAYER_NAME, scales)
+
+        # The proxies whose islands are locked in place while packing.
+        locked_objects = [] if thin_margins else clean_objects
+
+        if config.bake_udim_tiles > 1:
+            # Distribute the proxy meshes across the UDIM tiles, balancing
+            # their world space surface area (or texel weight).  Unchanged
+            # meshes stay on the tile they're already on.
+            dirty_meshes = set([obj.data for obj in dirty_objects])
+            meshes = list(fingerprints.keys())
+            first_users = {}
+            for obj in proxy_objects:
+                first_users.setdefault(obj.data, obj)
+            if texel_weights != None:
+                areas = [texel_weights[first_users[mesh]] for mesh in meshes]
+            else:
+                areas = world_surface_areas([first_users[mesh] for mesh in meshes])
+            fixed_tiles = [-1 if mesh in dirty_meshes else mesh.get(UDIM_TILE_PROP, -1) for mesh in meshes]
+            tiles = assign_udim_tiles(areas, config.bake_udim_tiles, fixed_tiles)
+            for mesh, tile in zip(meshes, tiles):
+                mesh[UDIM_TILE_PROP] = int(tile)
+
+            # Move the freshly unwrapped meshes onto their tiles, and pack
+            # each tile that received any, around the unchanged meshes
+            # already there.  With too thin margins every tile is packed
+            # again from scratch.
+            if thin_margins:
+                dirty_tiles = sorted(set([mesh[UDIM_TILE_PROP] for mesh in meshes]))
+            else:
+                dirty_tiles = sorted(set([obj.data[UDIM_TILE_PROP] for obj in dirty_objects]))
+            for tile in dirty_tiles:
+                tile_objects = [obj for obj in proxy_objects if obj.data[UDIM_TILE_PROP] == tile]
+                tile_dirty_objects = [obj for obj in tile_objects if obj.data in dirty_meshes]
+                tile_locked_objects = [obj for obj in tile_objects if obj.data not in dirty_meshes and not thin_margins]
+                offset_uvs(tile_dirty_objects, UV_LAYER_NAME, udim_tile_offset(tile))
+                pack_proxy_uvs(context, tile_objects, tile_locked_objects, margin)
+        elif len(clean_objects) > 0 or texel_weights != None:
+            # If some proxies were left as-is, the freshly unwrapped ones
+            # now overlap them.  Repack the new islands into the free
+            # atlas space around the old ones (or everything, if the old
+            # margins are too thin).  Rescaled islands also need packing
+            # again, as they no longer fit the unwrap's layout.
+            pack_proxy_uvs(context, proxy_objects, locked_objects, margin)
+
+        for obj in dirty_objects:
+            obj.data[PREP_FINGERPRINT_PROP] = fingerprints[obj.data]
+        for obj in (proxy_objects if thin_margins else dirty_objects):
+            obj.data[PREP_RESOLUTION_PROP] = config.bake_image_res
+
+        # Stamp every proxy with its new layout.  Repacking for too thin
+        # margins moves the islands of proxies that weren't re-unwrapped
+        # too, and their earlier bakes (and cached bakes) must not be
+        # taken as matching the new layout.
+        for mesh in fingerprints.keys():
+            mesh[PREP_LAYOUT_PROP] = uv_layout_hash(mesh, UV_LAYER_NAME)
+
+        # Report the margin we actually achieved at the atlas border, for
+        # sanity checking against the requested one.
+        bounds = uv_bounds(proxy_objects, UV_LAYER_NAME)
+        actual_margin = min(bounds[:, 0].min(), bounds[:, 1].min())
+        self.report({'INFO'}, "Compify: set up {} and re-unwrapped {} of {} proxy objects, bake resolution {}px, UV border margin is {:.1f}px (requested {}px)".format(
+            changed_object_count,
+            len(dirty_objects),
+            len(proxy_objects),
+            config.bake_image_res,
+            actual_margin * config.bake_image_res,
+            config.bake_uv_margin,
+        ))
 
         return {'FINISHED'}
 
@@ -340,10 +700,37 @@ class CompifyBake(bpy.types.Operator):
 
     _timer = None
     baker = None
+    window = None
+    is_finished = False
+
+    # The bake passes to do, as `(resolution, samples)` tuples where None
+    # means the configured value, and the objects to bake.
+    passes = None
+    pass_index = 0
+    objects = None
+
+    # The footage light states when the current pass was started.
+    pass_light_states = None
+
+    changed_only: bpy.props.BoolProperty(
+        name="Changed Tiles Only",
+        description="Only rebake the UDIM tiles containing proxy meshes that were re-unwrapped since they were last baked",
+        default=False,
+        options={'SKIP_SAVE'},
+    )
+    preview: bpy.props.BoolProperty(
+        name="Preview",
+        description="Do a quick low resolution, low sample bake first, and then refine it to full quality.  Starts over if a footage light changes during the bake",
+        default=False,
+        options={'SKIP_SAVE'},
+    )
 
     # Note: we use a modal technique inspired by this to keep the baking
     # from blocking the UI:
     # https://blender.stackexchange.com/questions/71454/is-it-possible-to-make-a-sequence-of-renders-and-give-the-user-the-option-to-can
+    #
+    # The bake itself is advanced from its handlers (see `Baker.on_done`),
+    # and the modal timer only exists to wrap up the operator afterwards.
 
     @classmethod
     def poll(cls, context):
@@ -361,17 +748,93 @@ class CompifyBake(bpy.types.Operator):
         self.baker.cancelled(scene, context)
 
     def execute(self, context):
-        self.baker = Baker()
-        self._timer = context.window_manager.event_timer_add(0.05, window=context.window)
+        # Figure out which proxies to bake, if we're only rebaking stale
+        # tiles.
+        objects = None
+        if self.changed_only and context.scene.compify_config.bake_udim_tiles > 1:
+            proxies = [obj for obj in context.scene.compify_config.geo_collection.objects if obj.type == 'MESH']
+            stale_tiles = set()
+            for obj in proxies:
+                if obj.data.get(BAKE_FINGERPRINT_PROP) != obj.data.get(PREP_LAYOUT_PROP):
+                    stale_tiles.add(obj.data.get(UDIM_TILE_PROP))
+            if len(stale_tiles) == 0:
+                self.report({'INFO'}, "Compify: all bake tiles are up to date")
+                return {'CANCELLED'}
+            objects = [obj for obj in proxies if obj.data.get(UDIM_TILE_PROP) in stale_tiles]
+
+        self.passes = [(None, None)]
+        if self.preview:
+            preview_res = max(PREVIEW_MIN_RES, context.scene.compify_config.bake_image_res // PREVIEW_RES_DIVISOR)
+            self.passes.insert(0, (preview_res, PREVIEW_SAMPLES))
+        self.pass_index = 0
+        self.objects = objects
+
+        self.baker = Baker(on_done=self.schedule_step)
+        self.window = context.window
+        self.is_finished = False
+        if self.start_pass(context) == {'CANCELLED'}:
+            return {'CANCELLED'}
+
+        self._timer = context.window_manager.event_timer_add(WRAP_UP_INTERVAL, window=context.window)
         context.window_manager.modal_handler_add(self)
-        return self.baker.execute(context)
+        return {'RUNNING_MODAL'}
 
-    def modal(self, context, event):
-        result = self.baker.modal(context, event)
-        if result == {'FINISHED'} or result == {'CANCELLED'}:
-            context.window_manager.event_timer_remove(self._timer)
+    def start_pass(self, context):
+        resolution, samples = self.passes[self.pass_index]
+        self.pass_light_states = light_states(context)
+        result = self.baker.execute(
+            context,
+            objects=self.objects,
+            use_clear=self.objects == None,
+            resolution=resolution,
+            samples=samples,
+        )
+        if result != {'CANCELLED'}:
+            self.baker.step(context)
         return result
 
+    def schedule_step(self):
+        bpy.app.timers.register(self.step, first_interval=0.0)
+
+    # Finishes up the current bake pass and starts the next one, if any,
+    # from a `bpy.app.timers` callback scheduled by the bake handlers.
+    #
+    # Bake jobs can't be stopped from Python, so if a footage light
+    # changed during a pass, its result is stale by the time we get here,
+    # and we start over from the first (quick) pass.
+    def step(self):
+        with bpy.context.temp_override(window=self.window):
+            context = bpy.context
+            self.baker.step(context)
+            if self.baker.was_cancelled:
+                self.is_finished = True
+                return None
+
+            if light_states(context) != self.pass_light_states:
+                print("Compify: footage lights changed during the bake, starting over")
+                self.pass_index = 0
+            elif self.pass_index + 1 < len(self.passes):
+                self.pass_index += 1
+            else:
+                self.is_finished = True
+                return None
+
+            self.baker.reset()
+            if self.start_pass(context) == {'CANCELLED'}:
+                self.is_finished = True
+        return None
+
+    def modal(self, context, event):
+        if not self.is_finished:
+            return {'PASS_THROUGH'}
+
+        context.window_manager.event_timer_remove(self._timer)
+        if self.baker.was_cancelled:
+            return {'CANCELLED'}
+        if self.baker.precision_report != None:
+            self.report({'INFO'}, self.baker.precision_report)
+        return {'FINISHED'}
+
 
 class CompifyRender(bpy.types.Operator):
     """Render, but with Compify baking before rendering each frame"""
@@ -379,15 +842,52 @@ class CompifyRender(bpy.types.Operator):
     bl_label = "Render Animation with Compify Integration"
 
     _timer = None
+    window = None
     render_started = False
     render_done = False
+    # Whether a frame has been rendered yet, and whether renders use the
+    # footage render group.  Once a bake follows a render, the full group
+    # is kept for the rest of the render (see `start_bake()`).
+    has_rendered = False
+    use_render_group = True
     frame_range = None
     stage = ""
     baker = None
 
+    # Time spent between a stage finishing and the pipeline noticing, for
+    # measuring the per-frame overhead of the pipeline itself.
+    stage_done_time = None
+    overhead_time = 0.0
+
     is_finished = False
     is_cancelled = False
 
+    # The bake input states and pixels of the lighting most recently
+    # baked (or loaded from the cache), and the states of the bake in
+    # progress.
+    last_bake_states = None
+    last_bake_pixels = None
+    pending_bake_states = None
+
+    # The bake input states each proxy was last baked with.
+    tracker = None
+
+    # Per-frame log of `(frame, action, reason)` bake decisions.
+    bake_log = None
+
+    # Frames whose rendered image failed to save.
+    save_failures = None
+
+    # Frames whose rendered image already exists, and the journal of
+    # completed frames for resuming.
+    skip_frames = None
+    journal = None
+
+    # Temporal interpolation state.  When interpolating, only keyframes
+    # are baked, as scheduled by a `KeyframeSchedule`.
+    interpolating = False
+    schedule = None
+
     @classmethod
     def poll(cls, context):
         return context.mode == 'OBJECT' \
@@ -398,78 +898,485 @@ class CompifyRender(bpy.types.Operator):
             and compify_mat_name(context) in bpy.data.materials
 
     def render_post_callback(self, scene, context=None):
+        self.stage_done_time = time.perf_counter()
         self.render_done = True
 
     def cancelled_callback(self, scene, context=None):
         self.is_cancelled = True
 
+    def bake_done_callback(self):
+        self.stage_done_time = time.perf_counter()
+        self.schedule_step()
+
+    def schedule_step(self):
+        bpy.app.timers.register(self.step, first_interval=0.0)
+
     def execute(self, context):
+        config = context.scene.compify_config
+
+        # Make sure the camera projection group is up to date, so that
+        # groups from older files don't render with drivers.
+        change_footage_camera(config, context)
+
         self.render_started = False
         self.render_done = False
-        self.frame_range = (context.scene.frame_start, context.scene.frame_end)
+        self.has_rendered = False
+        self.use_render_group = True
+        # Figure out which frames are already rendered, and start the
+        # journal of this render.
+        self.journal = RenderJournal(
+            journal_path(bpy.path.abspath(context.scene.render.filepath)),
+            (context.scene.frame_start, context.scene.frame_end),
+            bpy.data.filepath,
+        )
+        self.skip_frames = set()
+        if config.render_skip_existing:
+            self.journal.load()
+            self.skip_frames = self.journal.existing_frames(context.scene)
+        self.journal.completed = set(self.skip_frames)
+        self.journal.in_progress = None
+
+        # Start at the first frame that still needs rendering.
+        frame_start = context.scene.frame_start
+        while frame_start in self.skip_frames:
+            frame_start += 1
+        if frame_start > context.scene.frame_end:
+            self.report({'INFO'}, "Compify: all frames are already rendered")
+            return {'CANCELLED'}
+
+        self.frame_range = (frame_start, context.scene.frame_end)
         self.stage = "bake"
-        self.baker = Baker()
+        self.baker = Baker(on_done=self.bake_done_callback)
+        self.window = context.window
+        self.stage_done_time = None
+        self.overhead_time = 0.0
 
         self.is_finished = False
         self.is_cancelled = False
 
+        self.last_bake_states = None
+        self.last_bake_pixels = None
+        self.pending_bake_states = None
+        self.tracker = ProxyBakeTracker()
+        self.bake_log = []
+        self.save_failures = []
+
+        # Interpolating needs access to the bake pixels, which isn't
+        # possible with UDIM tiles.
+        self.interpolating = config.bake_interpolation_interval > 1 and config.bake_udim_tiles == 1
+        self.schedule = None
+        if self.interpolating:
+            self.schedule = KeyframeSchedule(
+                self.frame_range,
+                config.bake_interpolation_interval,
+                config.bake_interpolation_threshold,
+            )
+
         bpy.app.handlers.render_post.append(self.render_post_callback)
         bpy.app.handlers.render_cancel.append(self.cancelled_callback)
         bpy.app.handlers.object_bake_cancel.append(self.cancelled_callback)
 
-        self._timer = context.window_manager.event_timer_add(0.05, window=context.window)
+        self._timer = context.window_manager.event_timer_add(WRAP_UP_INTERVAL, window=context.window)
         context.window_manager.modal_handler_add(self)
 
         context.scene.frame_set(self.frame_range[0])
+        self.schedule_step()
 
         return {'RUNNING_MODAL'}
 
-    def modal(self, context, event):
+    # Starts the bake stage for the current frame.
+    #
+    # If enabled, the lighting is loaded from the baked lighting sequence.
+    # Otherwise, depending on what changed since the lighting currently in
+    # the bake image was baked, this either skips baking entirely, loads a
+    # cached bake, or starts a real bake.  Each decision and its reason is logged.
+    #
+    # Returns True if the bake stage is already complete.
+    def start_bake(self, context):
+        config = context.scene.compify_config
+        frame = context.scene.frame_current
+
+        # Use the precomputed lighting, if there is any for this frame.
+        if config.use_bake_sequence:
+            sequence_path = bake_sequence_path(context, frame)
+            if os.path.exists(sequence_path):
+                self.log_bake(frame, "sequence", "loaded from the baked lighting sequence")
+                self.last_bake_pixels, _ = load_bake(context, sequence_path)
+                # The lighting inputs of the sequence are unknown.
+                self.last_bake_states = None
+                self.tracker = ProxyBakeTracker()
+                return True
+
+        action, reason, states, cache_path, objects = bake_decision(context, self.last_bake_states, self.tracker)
+        self.log_bake(frame, action, reason)
+
+        if action == "skip":
+            self.last_bake_states = states
+            return True
+        if action == "cached":
+            self.last_bake_pixels, _ = load_bake(context, cache_path)
+            self.last_bake_states = states
+            self.tracker.record(config.geo_collection.objects, states)
+            return True
+
+        # Baking needs the full footage group, so once a bake follows a
+        # render, keep using the full group for the rest of the render
+        # rather than swapping groups (and recompiling the material)
+        # twice per frame.
+        if self.has_rendered:
+            self.use_render_group = False
+
+        # When interpolating, the bake image holds the blended lighting of
+        # the last rendered frame, so a partial bake would end up on top of
+        # that blend rather than a real bake.  Put the last keyframe's
+        # lighting back first, or bake everything if there isn't one.
+        if self.interpolating and objects != None:
+            if self.last_bake_pixels is None:
+                objects = None
+            else:
+                show_bake(context, self.last_bake_pixels)
+
+        self.pending_bake_states = states
+        self.baker.execute(
+            context,
+            objects=objects,
+            use_clear=objects == None,
+            store_path=cache_path,
+            keep_pixels=self.interpolating,
+        )
+        return False
+
+    # Called when the bake stage of the current frame is complete, to
+    # decide what to do next.
+    def bake_finished(self, context):
+        if not self.interpolating:
+            self.stage = "render"
+            return
+
+        self.schedule.keyframe_baked(context.scene.frame_current, self.last_bake_pixels)
+        if len(self.schedule.render_queue) > 0:
+            self.stage = "render"
+        else:
+            context.scene.frame_set(self.schedule.next_bake_frame)
+
+    # Starts rendering the current frame, or when interpolating, the next
+    # frame in the render queue.  Frames that are already rendered are
+    # skipped.
+    #
+    # Returns False if there was nothing to render.
+    def start_render(self, context):
+        if self.interpolating:
+            render = self.schedule.next_render(self.skip_frames)
+            if render == None:
+                return False
+            frame, pixels = render
+            context.scene.frame_set(frame)
+            show_bake(context, pixels)
+        elif context.scene.frame_current in self.skip_frames:
+            return False
+
+        self.journal.frame_started(context.scene.frame_current)
+        use_footage_render_group(get_compify_material(context), self.use_render_group)
+        self.has_rendered = True
+
+        # Let the render job save the image itself, so that encoding and
+        # writing it happens on the render thread rather than blocking the
+        # UI.  The next bake still waits for the job (and so the save) to
+        # end.  Overlapping them would mean saving from a copy of the
+        # pixels instead, but Render Result pixels can't be read from
+        # Python, and going through the compositor's Viewer node would mean
+        # editing the user's compositing setup and bypassing their view
+        # transform and file format settings.
+        bpy.ops.render.render("INVOKE_DEFAULT", animation=False, write_still=True)
+        return True
+
+    # Called when the current frame is rendered and saved, to move on to
+    # the next frame.
+    def render_finished(self, context):
+        self.render_started = False
+        self.render_done = False
+
+        if self.interpolating:
+            if len(self.schedule.render_queue) > 0:
+                return
+            if self.schedule.next_bake_frame == None:
+                self.is_finished = True
+            else:
+                context.scene.frame_set(self.schedule.next_bake_frame)
+                self.stage = "bake"
+        elif context.scene.frame_current >= self.frame_range[1]:
+            self.is_finished = True
+        else:
+            context.scene.frame_set(context.scene.frame_current + 1)
+            self.stage = "bake"
+
+    def log_bake(self, frame, action, reason):
+        print("Compify frame {}: {} ({})".format(frame, action, reason))
+        self.bake_log.append((frame, action, reason))
+
+    def report_bake_log(self):
+        counts = {"bake": 0, "cached": 0, "skip": 0, "sequence": 0}
+        for _, action, _ in self.bake_log:
+            counts[action] += 1
+        self.report({'INFO'}, "Compify: baked {} frames, loaded {} from cache and {} from the sequence, skipped {}, {} already rendered".format(
+            counts["bake"],
+            counts["cached"],
+            counts["sequence"],
+            counts["skip"],
+            len(self.skip_frames),
+        ))
+        print("Compify: pipeline overhead {:.2f} ms per frame".format(
+            self.overhead_time * 1000.0 / max(1, len(self.bake_log)),
+        ))
+        if len(self.save_failures) > 0:
+            self.report({'WARNING'}, "Compify: {} frames failed to save: {}".format(
+                len(self.save_failures),
+                ", ".join(str(frame) for frame in self.save_failures),
+            ))
+
+    # Advances the bake/render pipeline as far as it can go right now.
+    #
+    # This runs as a `bpy.app.timers` callback.  Bakes notify completion
+    # through their handlers, which schedule this to run again right away.
+    # Renders only set a flag from their (render thread) handler, so while
+    # the render job is running this polls for it at `RENDER_POLL_INTERVAL`.
+    #
+    # Returns the timer interval to be called again after, or None.
+    def step(self):
         if self.is_cancelled or self.is_finished:
-            bpy.app.handlers.render_post.remove(self.render_post_callback)
-            bpy.app.handlers.render_cancel.remove(self.cancelled_callback)
-            bpy.app.handlers.object_bake_cancel.remove(self.cancelled_callback)
+            # A cancelled bake still needs cleaning up after.
+            if self.baker.is_done:
+                with bpy.context.temp_override(window=self.window):
+                    self.baker.step(bpy.context)
+            return None
 
-        if self.is_cancelled:
-            return {'CANCELLED'}
+        if self.stage_done_time != None:
+            self.overhead_time += time.perf_counter() - self.stage_done_time
+            self.stage_done_time = None
 
-        if self.is_finished:
-            return {'FINISHED'}
+        with bpy.context.temp_override(window=self.window):
+            context = bpy.context
 
-        if event.type == 'TIMER':
             # Bake stage.
             if self.stage == "bake":
                 if not self.baker.is_baking and not self.baker.is_done:
-                    self.baker.execute(context)
-                result = self.baker.modal(context, event)
-                if result == {'FINISHED'}:
-                    self.baker.reset()
-                    self.stage = "render"
-                else:
-                    if result == {'CANCELLED'}:
+                    if not self.interpolating and context.scene.frame_current in self.skip_frames:
+                        # Already rendered, so there's no need to bake.
+                        self.stage = "render"
+                        return 0.0
+                    if self.start_bake(context):
+                        self.bake_finished(context)
+                        return 0.0
+                    self.baker.step(context)
+                elif self.baker.is_done:
+                    self.baker.step(context)
+                    if self.baker.was_cancelled:
                         self.is_cancelled = True
-                    return result
+                        return None
+                    self.last_bake_states = self.pending_bake_states
+                    self.last_bake_pixels = self.baker.pixels
+                    self.tracker.record(self.baker.baked_objects, self.pending_bake_states)
+                    self.baker.reset()
+                    self.bake_finished(context)
+                    return 0.0
+                # Wait for the bake handlers to schedule the next step.
+                return None
             # Render stage.
             elif self.stage == "render":
                 if not self.render_started:
+                    if not self.start_render(context):
+                        self.render_finished(context)
+                        return 0.0
                     self.render_started = True
-                    bpy.ops.render.render("INVOKE_DEFAULT", animation=False)
-                elif self.render_done:
-                    image_path_start = bpy.path.abspath(context.scene.render.filepath)
-                    image_ext = context.scene.render.file_extension
-                    image_path = "{}{:04}{}".format(image_path_start, context.scene.frame_current, image_ext)
-                    print("Saving image \"{}\"".format(image_path))
-                    bpy.data.images['Render Result'].save_render(filepath=image_path)
-
-                    if context.scene.frame_current >= self.frame_range[1]:
-                        self.is_finished = True
+                elif self.render_done and not bpy.app.is_job_running('RENDER'):
+                    image_path = render_output_path(context.scene, context.scene.frame_current)
+                    if saved_image_ok(image_path, context.scene.render.image_settings.file_format):
+                        print("Saved image \"{}\"".format(image_path))
+                        self.journal.frame_completed(context.scene.frame_current)
                     else:
-                        context.scene.frame_set(context.scene.frame_current + 1)
-                        self.render_started = False
-                        self.render_done = False
-                        self.stage = "bake"
+                        print("Compify frame {}: saving image \"{}\" failed".format(context.scene.frame_current, image_path))
+                        self.save_failures.append(context.scene.frame_current)
+                    self.render_finished(context)
+                    return 0.0
+                elif not self.render_done and not bpy.app.is_job_running('RENDER'):
+                    # The render job ended without finishing the frame
+                    # (e.g. it failed to start), which the render handlers
+                    # don't report.  Stop polling.
+                    print("Compify frame {}: render stopped before finishing".format(context.scene.frame_current))
+                    self.is_cancelled = True
+                    return None
+                return RENDER_POLL_INTERVAL
+
+        return None
+
+    def modal(self, context, event):
+        if not (self.is_cancelled or self.is_finished):
+            return {'PASS_THROUGH'}
+
+        context.window_manager.event_timer_remove(self._timer)
+        use_footage_render_group(get_compify_material(context), False)
+        bpy.app.handlers.render_post.remove(self.render_post_callback)
+        bpy.app.handlers.render_cancel.remove(self.cancelled_callback)
+        bpy.app.handlers.object_bake_cancel.remove(self.cancelled_callback)
+
+        if self.is_cancelled:
+            return {'CANCELLED'}
+
+        self.report_bake_log()
+        return {'FINISHED'}
 
-        return {'PASS_THROUGH'}
+
+class CompifyBakeSequence(bpy.types.Operator):
+    """Bake the lighting of every frame to a numbered OpenEXR sequence, without rendering"""
+    bl_idname = "material.compify_bake_sequence"
+    bl_label = "Bake Lighting Sequence"
+
+    _timer = None
+    window = None
+    frame_range = None
+    baker = None
+    writer = None
+
+    is_finished = False
+    is_cancelled = False
+
+    # The bake input states and pixels of the lighting most recently
+    # baked (or loaded from the cache), and the states of the bake in
+    # progress.
+    last_bake_states = None
+    last_bake_pixels = None
+    pending_bake_states = None
+
+    # The bake input states each proxy was last baked with.
+    tracker = None
+
+    # Number of frames per bake decision action.
+    counts = None
+
+    @classmethod
+    def poll(cls, context):
+        return CompifyRender.poll(context) \
+            and context.scene.compify_config.bake_udim_tiles == 1
+
+    def cancelled_callback(self, scene, context=None):
+        self.is_cancelled = True
+
+    def schedule_step(self):
+        bpy.app.timers.register(self.step, first_interval=0.0)
+
+    def execute(self, context):
+        os.makedirs(bpy.path.abspath(context.scene.compify_config.bake_sequence_dir), exist_ok=True)
+
+        self.frame_range = (context.scene.frame_start, context.scene.frame_end)
+        self.baker = Baker(on_done=self.schedule_step)
+        self.writer = AsyncFileWriter()
+        self.window = context.window
+
+        self.is_finished = False
+        self.is_cancelled = False
+
+        self.last_bake_states = None
+        self.last_bake_pixels = None
+        self.pending_bake_states = None
+        self.tracker = ProxyBakeTracker()
+        self.counts = {"bake": 0, "cached": 0, "skip": 0}
+
+        bpy.app.handlers.object_bake_cancel.append(self.cancelled_callback)
+
+        self._timer = context.window_manager.event_timer_add(WRAP_UP_INTERVAL, window=context.window)
+        context.window_manager.modal_handler_add(self)
+
+        context.scene.frame_set(self.frame_range[0])
+        self.schedule_step()
+
+        return {'RUNNING_MODAL'}
+
+    # Advances the bake sequence as far as it can go right now, as a
+    # `bpy.app.timers` callback.  See `CompifyRender.step()`.
+    def step(self):
+        if self.is_cancelled or self.is_finished:
+            # A cancelled bake still needs cleaning up after.
+            if self.baker.is_done:
+                with bpy.context.temp_override(window=self.window):
+                    self.baker.step(bpy.context)
+            return None
+
+        with bpy.context.temp_override(window=self.window):
+            context = bpy.context
+
+            if not self.baker.is_baking and not self.baker.is_done:
+                action, reason, states, cache_path, objects = bake_decision(context, self.last_bake_states, self.tracker)
+                print("Compify frame {}: {} ({})".format(context.scene.frame_current, action, reason))
+                self.counts[action] += 1
+                if action == "bake":
+                    self.pending_bake_states = states
+                    self.baker.execute(
+                        context,
+                        objects=objects,
+                        use_clear=objects == None,
+                        store_path=cache_path,
+                        keep_pixels=True,
+                    )
+                    self.baker.step(context)
+                    # Wait for the bake handlers to schedule the next step.
+                    return None
+                if action == "cached":
+                    self.last_bake_pixels, _ = load_bake(context, cache_path)
+                    self.tracker.record(context.scene.compify_config.geo_collection.objects, states)
+                self.last_bake_states = states
+            elif self.baker.is_done:
+                self.baker.step(context)
+                if self.baker.was_cancelled:
+                    self.is_cancelled = True
+                    return None
+                self.last_bake_states = self.pending_bake_states
+                self.last_bake_pixels = self.baker.pixels
+                self.tracker.record(self.baker.baked_objects, self.pending_bake_states)
+                self.baker.reset()
+            else:
+                return None
+
+            self.write_frame(context)
+            if context.scene.frame_current >= self.frame_range[1]:
+                self.is_finished = True
+                return None
+            context.scene.frame_set(context.scene.frame_current + 1)
+            return 0.0
+
+    # Queues the lighting of the current frame to be written to the
+    # sequence.  Downsampling and writing both happen on the writer's
+    # threads, so the next frame can start baking right away.
+    def write_frame(self, context):
+        filepath = bake_sequence_path(context, context.scene.frame_current)
+        factor = int(context.scene.compify_config.bake_sequence_downsample)
+        pixels = self.last_bake_pixels
+        self.writer.submit(
+            filepath,
+            lambda: write_exr(downsample_pixels(pixels, factor), filepath),
+        )
+
+    def modal(self, context, event):
+        if not (self.is_cancelled or self.is_finished):
+            return {'PASS_THROUGH'}
+
+        context.window_manager.event_timer_remove(self._timer)
+        bpy.app.handlers.object_bake_cancel.remove(self.cancelled_callback)
+
+        failures = self.writer.finish()
+        for filepath, error in failures:
+            print("Compify: writing \"{}\" failed: {}".format(filepath, error))
+        if len(failures) > 0:
+            self.report({'WARNING'}, "Compify: {} lighting frames failed to write, see the console for details".format(len(failures)))
+
+        if self.is_cancelled:
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, "Compify: wrote lighting sequence, baked {} frames, loaded {} from cache, skipped {}".format(
+            self.counts["bake"],
+            self.counts["cached"],
+            self.counts["skip"],
+        ))
+        return {'FINISHED'}
 
 
 class CompifyAddFootageGeoCollection(bpy.types.Operator):
@@ -541,6 +1448,13 @@ class CompifyFootageConfig(bpy.types.PropertyGroup):
         poll=lambda scene, obj : obj.type == 'CAMERA',
         update=change_footage_camera,
     )
+    use_vertex_projection: bpy.props.BoolProperty(
+        name="Vertex Projection",
+        description="Project the footage per proxy vertex with NumPy on each frame change, instead of per shading sample in the material.  Speeds up viewport playback with dense proxies.  Falls back to projecting in the material while any proxy has topology-changing modifiers or shares its mesh.  Animation renders other than Compify Render need Lock Interface enabled",
+        options=set(), # Not animatable.
+        default=False,
+        update=change_vertex_projection,
+    )
     geo_collection: bpy.props.PointerProperty(
         type=bpy.types.Collection,
         name="Footage Geo Collection",
@@ -567,6 +1481,157 @@ class CompifyFootageConfig(bpy.types.PropertyGroup):
         max=2**16,
         soft_max=8192,
     )
+    bake_udim_tiles: bpy.props.IntProperty(
+        name="Bake UDIM Tiles",
+        description="Number of UDIM tiles to distribute the proxy geometry across when baking.  Each tile is baked at the bake resolution",
+        options=set(), # Not animatable.
+        default=1,
+        min=1,
+        max=100,
+        soft_max=16,
+    )
+    bake_precision: bpy.props.EnumProperty(
+        name="Bake Precision",
+        description="How the baked lighting is stored after baking",
+        items=[
+            ('FULL', "Full Float", "Store baked lighting as 32-bit float"),
+            ('HALF', "Half Float", "Save and pack baked lighting as 16-bit half float OpenEXR"),
+            ('LOG8', "Log 8-bit", "Render with baked lighting log-encoded in an 8-bit image, using a quarter of the texture memory of full float.  The full float bake is still kept in memory for rebaking"),
+        ],
+        options=set(), # Not animatable.
+        default='FULL',
+    )
+    use_bake_quality: bpy.props.BoolProperty(
+        name="Custom Bake Quality",
+        description="Use the quality settings below while baking, instead of the scene's render settings.  Diffuse lighting on proxies usually needs far fewer samples than the final render",
+        options=set(), # Not animatable.
+        default=False,
+    )
+    bake_samples: bpy.props.IntProperty(
+        name="Bake Samples",
+        description="Number of samples per texel to bake with",
+        options=set(), # Not animatable.
+        default=64,
+        min=1,
+        soft_max=4096,
+    )
+    bake_adaptive_threshold: bpy.props.FloatProperty(
+        name="Bake Noise Threshold",
+        description="Noise level at which texels stop being sampled during baking.  Zero disables adaptive sampling",
+        options=set(), # Not animatable.
+        default=0.05,
+        min=0.0,
+        max=1.0,
+        precision=3,
+    )
+    bake_max_bounces: bpy.props.IntProperty(
+        name="Bake Max Bounces",
+        description="Maximum number of light bounces while baking",
+        options=set(), # Not animatable.
+        default=4,
+        min=0,
+        soft_max=32,
+    )
+    bake_denoise: bpy.props.BoolProperty(
+        name="Denoise Bake",
+        description="Denoise the baked lighting with an edge-aware filter that stays within UV islands.  Not supported with UDIM tiles",
+        options=set(), # Not animatable.
+        default=False,
+    )
+    bake_denoise_strength: bpy.props.FloatProperty(
+        name="Denoise Strength",
+        description="How strongly to smooth the baked lighting, relative to its estimated noise level",
+        options=set(), # Not animatable.
+        default=1.0,
+        min=0.0,
+        soft_max=4.0,
+    )
+    bake_visible_only: bpy.props.BoolProperty(
+        name="Bake Visible Proxies Only",
+        description="When rendering, only bake the proxies whose bounds are in the footage camera's frame on each frame, keeping the previously baked lighting of the rest",
+        options=set(), # Not animatable.
+        default=False,
+    )
+    bake_skip_unchanged: bpy.props.BoolProperty(
+        name="Skip Unchanged Bakes",
+        description="When rendering, skip baking frames where nothing that affects the lighting (proxies, footage lights, footage frame, footage camera, Compify node inputs, world, bake settings) changed since the last baked frame.  Moving footage cameras and footage sequences bounce different light every frame, so they're baked every frame",
+        options=set(), # Not animatable.
+        default=True,
+    )
+    bake_interpolation_interval: bpy.props.IntProperty(
+        name="Bake Keyframe Interval",
+        description="When rendering, only bake every this many frames, and blend between those bakes for the frames in between.  1 bakes every frame.  Not used with UDIM tiles",
+        options=set(), # Not animatable.
+        default=1,
+        min=1,
+        soft_max=24,
+    )
+    bake_interpolation_threshold: bpy.props.FloatProperty(
+        name="Interpolation Error Threshold",
+        description="When the bakes of two keyframes differ by more than this (mean relative difference), the frame halfway between them is baked too, rather than blending",
+        subtype='PERCENTAGE',
+        options=set(), # Not animatable.
+        default=2.0,
+        min=0.0,
+        soft_max=20.0,
+    )
+    render_skip_existing: bpy.props.BoolProperty(
+        name="Skip Existing Frames",
+        description="When rendering, skip frames whose output image already exists and is valid, e.g. to resume an interrupted render",
+        options=set(), # Not animatable.
+        default=False,
+    )
+    use_bake_cache: bpy.props.BoolProperty(
+        name="Bake Cache",
+        description="When rendering, reuse the baked lighting of earlier frames (or earlier renders) when the proxies, lights, footage frame, footage camera, world, and bake settings are unchanged, instead of baking again.  Not used with UDIM tiles",
+        options=set(), # Not animatable.
+        default=False,
+    )
+    bake_cache_dir: bpy.props.StringProperty(
+        name="Bake Cache Directory",
+        description="Directory to store cached bakes in",
+        subtype='DIR_PATH',
+        options=set(), # Not animatable.
+        default="//compify_bake_cache/",
+    )
+    bake_sequence_dir: bpy.props.StringProperty(
+        name="Lighting Sequence Directory",
+        description="Directory that Bake Lighting Sequence writes the baked lighting of each frame to, as numbered OpenEXR files",
+        subtype='DIR_PATH',
+        options=set(), # Not animatable.
+        default="//compify_lighting/",
+    )
+    bake_sequence_downsample: bpy.props.EnumProperty(
+        name="Lighting Sequence Downsample",
+        description="Reduce the resolution of the baked lighting sequence by this factor",
+        items=[
+            ('1', "Full Resolution", ""),
+            ('2', "1/2 Resolution", ""),
+            ('4', "1/4 Resolution", ""),
+        ],
+        options=set(), # Not animatable.
+        default='1',
+    )
+    use_bake_sequence: bpy.props.BoolProperty(
+        name="Render From Lighting Sequence",
+        description="When rendering, load each frame's lighting from the baked lighting sequence instead of baking it, where available",
+        options=set(), # Not animatable.
+        default=False,
+    )
+    bake_camera_texel_density: bpy.props.BoolProperty(
+        name="Camera Texel Density",
+        description="On Prep Scene, give each proxy a share of the bake texture proportional to how much of the footage frame it covers, and pick the bake resolution automatically to hit the target texels per pixel",
+        options=set(), # Not animatable.
+        default=False,
+    )
+    bake_texels_per_pixel: bpy.props.FloatProperty(
+        name="Texels per Pixel",
+        description="Target number of bake texels per footage pixel when using camera texel density",
+        options=set(), # Not animatable.
+        default=0.25,
+        min=0.001,
+        soft_max=4.0,
+    )
 
 
 #========================================================
@@ -580,12 +1645,18 @@ def register():
     bpy.utils.register_class(CompifyPrepScene)
     bpy.utils.register_class(CompifyBake)
     bpy.utils.register_class(CompifyRender)
+    bpy.utils.register_class(CompifyBakeSequence)
     bpy.utils.register_class(CompifyCameraProjectGroupNew)
     bpy.utils.register_class(CompifyFootageConfig)
 
     # Custom properties.
     bpy.types.Scene.compify_config = bpy.props.PointerProperty(type=CompifyFootageConfig)
 
+    # Handlers.
+    bpy.app.handlers.depsgraph_update_post.append(camera_lens_update_handler)
+    bpy.app.handlers.depsgraph_update_post.append(vertex_projection_update_handler)
+    bpy.app.handlers.frame_change_post.append(vertex_projection_frame_handler)
+
     # Other modules.
     camera_align_register()
 
@@ -597,12 +1668,18 @@ def unregister():
     bpy.utils.unregister_class(CompifyPrepScene)
     bpy.utils.unregister_class(CompifyBake)
     bpy.utils.unregister_class(CompifyRender)
+    bpy.utils.unregister_class(CompifyBakeSequence)
     bpy.utils.unregister_class(CompifyCameraProjectGroupNew)
     bpy.utils.unregister_class(CompifyFootageConfig)
 
     # Custom properties.
     del bpy.types.Scene.compify_config
 
+    # Handlers.
+    bpy.app.handlers.depsgraph_update_post.remove(camera_lens_update_handler)
+    bpy.app.handlers.depsgraph_update_post.remove(vertex_projection_update_handler)
+    bpy.app.handlers.frame_change_post.remove(vertex_projection_frame_handler)
+
     # Other modules.
     camera_align_unregister()
 
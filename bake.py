@@ -1,35 +1,326 @@
+import os
+
 import bpy
 
 from .names import \
     compify_mat_name, \
     compify_baked_texture_name, \
+    compify_encoded_texture_name, \
     MAIN_NODE_NAME, \
     BAKE_IMAGE_NODE_NAME, \
-    UV_LAYER_NAME
+    LIGHTING_DECODE_NODE_NAME, \
+    UV_LAYER_NAME, \
+    PREP_LAYOUT_PROP, \
+    BAKE_FINGERPRINT_PROP
 from .node_groups import \
     ensure_footage_group, \
+    ensure_footage_render_group, \
     ensure_camera_project_group, \
-    ensure_feathered_square_group
-from .uv_utils import leftmost_u
+    ensure_feathered_square_group, \
+    ensure_lighting_decode_group
+from .image_utils import \
+    read_pixels, \
+    write_pixels, \
+    relative_error, \
+    quantize_half, \
+    encode_log8, \
+    decode_log8, \
+    resize_pixels_nearest
+from .denoise import denoise_bake
 from .camera_align import camera_align_register, camera_align_unregister
 
+# Ensures that the image to bake to exists for this scene, with the
+# resolution and UDIM tiles currently configured.  Passing `resolution`
+# overrides the configured resolution.
+#
+# Returns a `(image, created)` tuple, where `created` is True if the
+# image was (re)created and therefore has no baked lighting in it yet.
+def ensure_bake_image(context, resolution=None):
+    bake_image_name = compify_baked_texture_name(context)
+    bake_res = context.scene.compify_config.bake_image_res if resolution == None else resolution
+    tile_count = context.scene.compify_config.bake_udim_tiles
+
+    # Remove the existing image if it doesn't match the current settings.
+    if bake_image_name in bpy.data.images:
+        image = bpy.data.images[bake_image_name]
+        is_tiled = image.source == 'TILED'
+        if image.resolution[0] != bake_res \
+        or is_tiled != (tile_count > 1) \
+        or (is_tiled and len(image.tiles) != tile_count):
+            bpy.data.images.remove(image)
+
+    if bake_image_name in bpy.data.images:
+        return (bpy.data.images[bake_image_name], False)
+
+    image = bpy.data.images.new(
+        bake_image_name,
+        bake_res, bake_res,
+        alpha=False,
+        float_buffer=True,
+        stereo3d=False,
+        is_data=False,
+        tiled=tile_count > 1,
+    )
+    if tile_count > 1:
+        # Tiles added through `image.tiles.new()` have no pixel buffer to
+        # bake into, so we go through the operator to get filled tiles.
+        with context.temp_override(edit_image=image):
+            bpy.ops.image.tile_add(
+                number=1002,
+                count=tile_count - 1,
+                fill=True,
+                generated_type='BLANK',
+                width=bake_res,
+                height=bake_res,
+                float=True,
+                alpha=False,
+            )
+    return (image, True)
+
+
+# Ensures that the material has a lighting decode node between the baked
+# lighting image node and the main Compify node, adding one if it's
+# missing (e.g. in materials created by older versions).
+#
+# Returns the decode node.
+def ensure_lighting_decode_node(material):
+    nodes = material.node_tree.nodes
+    if LIGHTING_DECODE_NODE_NAME in nodes:
+        return nodes[LIGHTING_DECODE_NODE_NAME]
+
+    baked_lighting = nodes[BAKE_IMAGE_NODE_NAME]
+    main_node = nodes[MAIN_NODE_NAME]
+
+    decode = nodes.new(type='ShaderNodeGroup')
+    decode.label = LIGHTING_DECODE_NODE_NAME
+    decode.name = LIGHTING_DECODE_NODE_NAME
+    decode.location = (baked_lighting.location[0], baked_lighting.location[1] - 300.0)
+    decode.node_tree = ensure_lighting_decode_group()
+
+    material.node_tree.links.new(baked_lighting.outputs['Color'], decode.inputs['Color'])
+    material.node_tree.links.new(decode.outputs['Color'], main_node.inputs['Baked Lighting'])
+
+    return decode
+
+
+# Points the camera projection node of the material at the projection
+# group of `camera`, bringing the group up to date with the camera's lens
+# settings and their animation first.  The node is only touched if it
+# needs to change, since reassigning its group makes the material
+# recompile.
+def use_camera_project_group(material, camera):
+    camera_project = material.node_tree.nodes["Camera Project"]
+    group = ensure_camera_project_group(camera)
+    if camera_project.node_tree != group:
+        camera_project.node_tree = group
+
+
+# Switches the main Compify node of the material between the full footage
+# group (`use_render=False`, needed for baking and debugging) and its lean
+# render variant (`use_render=True`), for faster final renders.
+#
+# The node is only touched if it needs to change, since swapping its
+# group makes the material recompile, so render loops should swap at
+# most a couple of times per render rather than around every bake.  Both
+# groups are built from the same interface spec, so their sockets have
+# the same identifiers and the node keeps its input values and links
+# across the swap.
+def use_footage_render_group(material, use_render):
+    main_node = material.node_tree.nodes[MAIN_NODE_NAME]
+    group = ensure_footage_render_group() if use_render else ensure_footage_group()
+    if main_node.node_tree != group:
+        main_node.node_tree = group
+
+
+# Stores freshly baked lighting at the precision configured for the scene.
+#
+# With 'HALF' the bake image is flagged to be saved and packed as half
+# float OpenEXR, which halves its size on disk but not in memory.  With
+# 'LOG8' the lighting is log-encoded into a separate 8-bit image that
+# replaces the float bake image in the material (with the decode node set
+# up to match), so renders only load a quarter of the texture data.
+#
+# Either way the float bake image itself stays in memory, since later
+# bakes of only some of the proxies (with `use_clear=False`) bake into it
+# and rely on the rest of its lighting still being there.  Tiled (UDIM)
+# bake images are always kept at full float precision, since their pixels
+# can't be accessed per tile from Python.
+#
+# Returns a message describing the measured precision loss, or None if
+# the lighting is stored at full precision.
+def apply_bake_precision(context, bake_image, image_node, decode_node):
+    precision = context.scene.compify_config.bake_precision
+    bake_image.use_half_precision = precision == 'HALF'
+    if precision == 'FULL' or bake_image.source == 'TILED':
+        return None
+
+    pixels = read_pixels(bake_image)
+
+    if precision == 'HALF':
+        bake_image.file_format = 'OPEN_EXR'
+        mean_error, max_error = relative_error(pixels, quantize_half(pixels))
+        return "Compify: bake stored as half float, mean error {:.3f}%, max error {:.3f}%".format(
+            mean_error * 100.0,
+            max_error * 100.0,
+        )
+
+    # Log-encoded 8-bit.
+    encoded, log_min, log_max = encode_log8(pixels)
+    mean_error, max_error = relative_error(pixels, decode_log8(encoded, log_min, log_max))
+
+    encoded_image_name = compify_encoded_texture_name(context)
+    if encoded_image_name in bpy.data.images \
+    and tuple(bpy.data.images[encoded_image_name].size) != tuple(bake_image.size):
+        bpy.data.images.remove(bpy.data.images[encoded_image_name])
+    if encoded_image_name in bpy.data.images:
+        encoded_image = bpy.data.images[encoded_image_name]
+    else:
+        encoded_image = bpy.data.images.new(
+            encoded_image_name,
+            bake_image.size[0], bake_image.size[1],
+            alpha=False,
+            float_buffer=False,
+            stereo3d=False,
+            is_data=True,
+            tiled=False,
+        )
+    write_pixels(encoded_image, encoded)
+
+    image_node.image = encoded_image
+    decode_node.inputs["Encoded"].default_value = 1.0
+    decode_node.inputs["Log Min"].default_value = log_min
+    decode_node.inputs["Log Max"].default_value = log_max
+
+    return "Compify: bake stored as log-encoded 8-bit, mean error {:.3f}%, max error {:.3f}%".format(
+        mean_error * 100.0,
+        max_error * 100.0,
+    )
+
+
+# Shows the given full float lighting pixels in the scene's bake image, as
+# if they had just been baked.  Only works with non-tiled bake images.
+#
+# Returns the precision report from `apply_bake_precision()`.
+def show_bake(context, pixels):
+    material = bpy.data.materials[compify_mat_name(context)]
+    image_node = material.node_tree.nodes[BAKE_IMAGE_NODE_NAME]
+    decode_node = ensure_lighting_decode_node(material)
+
+    bake_image, _ = ensure_bake_image(context)
+    write_pixels(bake_image, pixels)
+    image_node.image = bake_image
+    decode_node.inputs["Encoded"].default_value = 0.0
+
+    return apply_bake_precision(context, bake_image, image_node, decode_node)
+
+
+# Saves float pixels of shape (height, width, channels) to an OpenEXR file.
+#
+# This goes through a temporary image, so that no existing image has its
+# file path or source changed by saving.  The file is written under a
+# temporary name and then moved into place, so that other processes (e.g.
+# farm workers sharing the bake cache) never see a partially written file.
+def save_exr(pixels, filepath):
+    temp_path = "{}.{}.tmp".format(filepath, os.getpid())
+    height, width = pixels.shape[:2]
+    image = bpy.data.images.new(
+        "Compify Temp",
+        width, height,
+        alpha=pixels.shape[2] == 4,
+        float_buffer=True,
+        is_data=True,
+    )
+    try:
+        write_pixels(image, pixels)
+        image.filepath_raw = temp_path
+        image.file_format = 'OPEN_EXR'
+        image.save()
+    finally:
+        bpy.data.images.remove(image)
+    os.replace(temp_path, filepath)
+
+
+# Loads the pixels of an image file into a float32 array of shape
+# (height, width, channels), without keeping the image around.
+def load_pixels(filepath):
+    image = bpy.data.images.load(filepath, check_existing=False)
+    try:
+        image.colorspace_settings.is_data = True
+        return read_pixels(image)
+    finally:
+        bpy.data.images.remove(image)
+
+
+# Loads previously saved baked lighting (see the `store_path` parameter
+# of `Baker.execute()`, and the baked lighting sequence) into the scene's
+# bake image.  Lighting saved at a lower resolution is scaled up to fit.
+#
+# Returns a `(pixels, report)` tuple of the loaded pixels and the
+# precision report from `apply_bake_precision()`.
+def load_bake(context, filepath):
+    pixels = load_pixels(filepath)
+    bake_res = context.scene.compify_config.bake_image_res
+    if pixels.shape[:2] != (bake_res, bake_res):
+        pixels = resize_pixels_nearest(pixels, bake_res, bake_res)
+    return (pixels, show_bake(context, pixels))
+
+
 class Baker:
-    def __init__(self):
+    # `on_done`, if given, is called (with no arguments) from the bake
+    # handlers once the bake is done or cancelled, so that the owner can
+    # schedule `step()` right away rather than polling for it.
+    def __init__(self, on_done=None):
+        self.on_done = on_done
         self.is_baking = False
         self.is_done = False
         self.proxy_objects = []
+        self.bake_objects = []
+        self.use_clear = True
         self.hide_render_list = {}
         self.main_node = None
+        self.bake_image = None
+        self.image_node = None
+        self.decode_node = None
+        self.precision_report = None
+        self.store_path = None
+        self.keep_pixels = False
+        self.pixels = None
+        self.was_cancelled = False
+        self.saved_settings = []
+        self.baked_objects = []
 
     def post(self, scene, context=None):
         self.is_baking = False
         self.is_done = True
+        if self.on_done != None:
+            self.on_done()
 
     def cancelled(self, scene, context=None):
         self.is_baking = False
         self.is_done = True
+        self.was_cancelled = True
+        if self.on_done != None:
+            self.on_done()
 
-    def execute(self, context):
+    # Sets up the scene for baking.
+    #
+    # By default all proxy objects are baked, clearing the bake image
+    # first.  Passing `objects` bakes only those proxy objects, and
+    # `use_clear=False` leaves the rest of the bake image intact.  If the
+    # bake image had to be (re)created, or its pixels aren't in memory,
+    # everything is baked regardless.
+    #
+    # The bake quality settings of the Compify config (if enabled) are
+    # applied to the scene's render settings for the duration of the bake.
+    # `resolution` and `samples` further override the configured bake
+    # resolution and samples for this bake only.
+    #
+    # If `store_path` is given, the finished bake is also saved there as a
+    # full float OpenEXR file (e.g. for the bake cache).  If `store_path`
+    # is given or `keep_pixels` is True, the full float pixels of the
+    # finished bake are kept in `self.pixels`.  Neither works with tiled
+    # bake images.
+    def execute(self, context, objects=None, use_clear=True, store_path=None, keep_pixels=False, resolution=None, samples=None):
         # Misc setup and checks.
         if context.scene.compify_config.geo_collection == None:
             return {'CANCELLED'}
@@ -40,33 +331,57 @@ class Baker:
         material = bpy.data.materials[compify_mat_name(context)]
         self.main_node = material.node_tree.nodes[MAIN_NODE_NAME]
         delight_image_node = material.node_tree.nodes[BAKE_IMAGE_NODE_NAME]
+        decode_node = ensure_lighting_decode_node(material)
 
         if len(self.proxy_objects) == 0:
             return {'CANCELLED'}
 
         # Ensure we have an image of the right resolution to bake to.
-        bake_image_name = compify_baked_texture_name(context)
-        bake_res = context.scene.compify_config.bake_image_res
-        if bake_image_name in bpy.data.images \
-        and bpy.data.images[bake_image_name].resolution[0] != bake_res:
-            bpy.data.images.remove(bpy.data.images[bake_image_name])
-
-        bake_image = None
-        if bake_image_name in bpy.data.images:
-            bake_image = bpy.data.images[bake_image_name]
+        #
+        # Baking only some proxies relies on the rest of the bake image's
+        # lighting staying as it is, which needs its float pixels to be in
+        # memory.  If they aren't (e.g. the file was reloaded, and the
+        # generated bake image would come back blank), everything is
+        # baked instead.
+        bake_image, created = ensure_bake_image(context, resolution)
+        if objects != None and not created and not bake_image.has_data:
+            print("Compify: the bake image has no lighting in memory, baking all proxies")
+            created = True
+        if created or objects == None:
+            self.bake_objects = list(self.proxy_objects)
+            self.use_clear = True
         else:
-            bake_image = bpy.data.images.new(
-                bake_image_name,
-                bake_res, bake_res,
-                alpha=False,
-                float_buffer=True,
-                stereo3d=False,
-                is_data=False,
-                tiled=False,
-            )
+            self.bake_objects = list(objects)
+            self.use_clear = use_clear
+        if len(self.bake_objects) == 0:
+            return {'CANCELLED'}
         delight_image_node.image = bake_image
+        decode_node.inputs["Encoded"].default_value = 0.0
+        self.bake_image = bake_image
+        self.image_node = delight_image_node
+        self.decode_node = decode_node
+        self.precision_report = None
+        self.store_path = store_path
+        self.keep_pixels = keep_pixels
+        self.pixels = None
+        self.was_cancelled = False
+
+        # Temporarily override render settings with the bake quality
+        # settings.
+        config = context.scene.compify_config
+        if hasattr(context.scene, "cycles"):
+            cycles = context.scene.cycles
+            if config.use_bake_quality:
+                self.override_setting(cycles, "samples", config.bake_samples)
+                self.override_setting(cycles, "use_adaptive_sampling", config.bake_adaptive_threshold > 0.0)
+                if config.bake_adaptive_threshold > 0.0:
+                    self.override_setting(cycles, "adaptive_threshold", config.bake_adaptive_threshold)
+                self.override_setting(cycles, "max_bounces", config.bake_max_bounces)
+            if samples != None:
+                self.override_setting(cycles, "samples", samples)
 
         # Configure the material for baking mode.
+        use_footage_render_group(material, False)
         self.main_node.inputs["Do Bake"].default_value = 1.0
         self.main_node.inputs["Debug"].default_value = 0.0
         delight_image_node.select = True
@@ -93,65 +408,154 @@ class Baker:
         return {'RUNNING_MODAL'}
 
 
-    def modal(self, context, event):
-        if event.type == 'TIMER':
-            if not self.is_baking and not self.is_done:
-                self.is_baking = True
-
-                # Select objects for baking.
-                for obj in self.proxy_objects:
-                    obj.select_set(True)
-                context.view_layer.objects.active = self.proxy_objects[0]
-
-                # Do the bake.
-                bpy.ops.object.bake(
-                    "INVOKE_DEFAULT",
-                    type='DIFFUSE',
-                    pass_filter={'DIRECT', 'INDIRECT', 'COLOR'},
-                    # filepath='',
-                    # width=512,
-                    # height=512,
-                    margin=context.scene.compify_config.bake_uv_margin,
-                    margin_type='EXTEND',
-                    use_selected_to_active=False,
-                    max_ray_distance=0.0,
-                    cage_extrusion=0.0,
-                    cage_object='',
-                    normal_space='TANGENT',
-                    normal_r='POS_X',
-                    normal_g='POS_Y',
-                    normal_b='POS_Z',
-                    target='IMAGE_TEXTURES',
-                    save_mode='INTERNAL',
-                    use_clear=True,
-                    use_cage=False,
-                    use_split_materials=False,
-                    use_automatic_name=False,
-                    uv_layer='',
-                )
-            elif self.is_done:
-                # Clean up the handlers and timer.
-                bpy.app.handlers.object_bake_complete.remove(self.post)
-                bpy.app.handlers.object_bake_cancel.remove(self.cancelled)
-                self._timer = None
-
-                # Restore visibility of non-proxy objects.
-                for obj_name in self.hide_render_list:
-                    bpy.data.objects[obj_name].hide_render = self.hide_render_list[obj_name]
-                self.hide_render_list = {}
-
-                # Set material to non-bake mode.
-                self.main_node.inputs["Do Bake"].default_value = 0.0
-                self.main_node = None
-
-                # Reset other self properties.
-                self.is_baking = False
-                self.is_done = False
-                self.proxy_objects = []
-
-                return {'FINISHED'}
-
-        return {'PASS_THROUGH'}
+    # Sets `data.<attribute>` to `value` until the bake is finished.
+    def override_setting(self, data, attribute, value):
+        self.saved_settings.append((data, attribute, getattr(data, attribute)))
+        setattr(data, attribute, value)
+
+
+    # Advances the bake: starts it if it hasn't been started yet, and
+    # finishes up once it's done.  Nothing happens in between, so after
+    # starting the bake this only needs calling again once `on_done` is
+    # called (or `is_done` is set).
+    #
+    # Returns {'FINISHED'} once finished up, and {'RUNNING_MODAL'} before.
+    def step(self, context):
+        if not self.is_baking and not self.is_done:
+            self.is_baking = True
+            result = self.start_bake(context, 'INVOKE_DEFAULT')
+            if 'CANCELLED' in result:
+                # No bake job was started, so the handlers won't fire.
+                self.cancelled(context.scene)
+        elif self.is_done:
+            return self.finish(context)
+
+        return {'RUNNING_MODAL'}
+
+
+    # Bakes synchronously, blocking until the bake is done, and then
+    # finishes up like `step()` does.  For use after `execute()` in
+    # background mode, where there's no event loop to run a bake job.
+    #
+    # Returns {'FINISHED'} or {'CANCELLED'}.
+    def run(self, context):
+        self.is_baking = True
+        result = self.start_bake(context, 'EXEC_DEFAULT')
+        self.is_baking = False
+        self.is_done = True
+        if result != {'FINISHED'}:
+            self.was_cancelled = True
+        self.finish(context)
+        return {'CANCELLED'} if self.was_cancelled else {'FINISHED'}
+
+
+    # Selects the objects to bake and kicks off the bake operator.
+    def start_bake(self, context, execution_context):
+        # Select objects for baking.
+        for obj in self.bake_objects:
+            obj.select_set(True)
+        context.view_layer.objects.active = self.bake_objects[0]
+
+        # Do the bake.
+        return bpy.ops.object.bake(
+            execution_context,
+            type='DIFFUSE',
+            pass_filter={'DIRECT', 'INDIRECT', 'COLOR'},
+            # filepath='',
+            # width=512,
+            # height=512,
+            margin=context.scene.compify_config.bake_uv_margin,
+            margin_type='EXTEND',
+            use_selected_to_active=False,
+            max_ray_distance=0.0,
+            cage_extrusion=0.0,
+            cage_object='',
+            normal_space='TANGENT',
+            normal_r='POS_X',
+            normal_g='POS_Y',
+            normal_b='POS_Z',
+            target='IMAGE_TEXTURES',
+            save_mode='INTERNAL',
+            use_clear=self.use_clear,
+            use_cage=False,
+            use_split_materials=False,
+            use_automatic_name=False,
+            uv_layer='',
+        )
+
+
+    # Cleans up and stores the results after the bake is done.
+    def finish(self, context):
+        # Clean up the handlers.
+        bpy.app.handlers.object_bake_complete.remove(self.post)
+        bpy.app.handlers.object_bake_cancel.remove(self.cancelled)
+
+        # Restore overridden render settings.
+        for data, attribute, value in reversed(self.saved_settings):
+            setattr(data, attribute, value)
+        self.saved_settings = []
+
+        # Restore visibility of non-proxy objects.
+        for obj_name in self.hide_render_list:
+            bpy.data.objects[obj_name].hide_render = self.hide_render_list[obj_name]
+        self.hide_render_list = {}
+
+        config = context.scene.compify_config
+        has_pixels = not self.was_cancelled and self.bake_image.source != 'TILED'
+
+        # Denoise the bake if requested.
+        if config.use_bake_quality and config.bake_denoise and has_pixels:
+            self.pixels = denoise_bake(
+                read_pixels(self.bake_image),
+                self.proxy_objects,
+                self.bake_objects,
+                UV_LAYER_NAME,
+                config.bake_uv_margin,
+                config.bake_denoise_strength,
+            )
+            write_pixels(self.bake_image, self.pixels)
+
+        # Keep and save the full precision bake if requested.
+        if (self.store_path != None or self.keep_pixels) and has_pixels:
+            if self.pixels is None:
+                self.pixels = read_pixels(self.bake_image)
+            if self.store_path != None:
+                save_exr(self.pixels, self.store_path)
+        if not self.keep_pixels:
+            self.pixels = None
+        self.store_path = None
+        self.keep_pixels = False
+
+        # Store the bake at the configured precision.
+        self.precision_report = apply_bake_precision(
+            context,
+            self.bake_image,
+            self.image_node,
+            self.decode_node,
+        )
+        self.bake_image = None
+        self.image_node = None
+        self.decode_node = None
+
+        # Record which objects were baked, and which mesh layouts the bake
+        # is now up to date with.
+        self.baked_objects = [] if self.was_cancelled else list(self.bake_objects)
+        if not self.was_cancelled:
+            for obj in self.bake_objects:
+                if obj.type == 'MESH' and PREP_LAYOUT_PROP in obj.data:
+                    obj.data[BAKE_FINGERPRINT_PROP] = obj.data[PREP_LAYOUT_PROP]
+
+        # Set material to non-bake mode.
+        self.main_node.inputs["Do Bake"].default_value = 0.0
+        self.main_node = None
+
+        # Reset other self properties.
+        self.is_baking = False
+        self.is_done = False
+        self.proxy_objects = []
+        self.bake_objects = []
+
+        return {'FINISHED'}
 
 
     def reset(self):
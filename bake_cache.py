@@ -0,0 +1,254 @@
+import os
+
+import bpy
+import numpy as np
+
+from .names import compify_mat_name, MAIN_NODE_NAME, PREP_LAYOUT_PROP
+from .mesh_utils import mesh_fingerprint
+from .camera_utils import render_aspect, objects_in_frame
+from .image_utils import image_user_frame, saved_image_ok
+from .node_groups import CAMERA_LENS_SETTINGS
+from .lighting_changes import \
+    bake_input_hash, \
+    bake_reason, \
+    ProxyBakeTracker
+
+# Property types whose values are gathered into light states.
+SIMPLE_PROPERTY_TYPES = {'BOOLEAN', 'INT', 'FLOAT', 'STRING', 'ENUM'}
+
+# Properties that every datablock has (name, user count, tags, session
+# uid, etc.).  They're bookkeeping rather than settings, and some of them
+# change on their own, so they're left out of light states.
+ID_PROPERTIES = {prop.identifier for prop in bpy.types.ID.bl_rna.properties}
+
+
+# Gets the values of all the simple (non-pointer, non-collection) RNA
+# properties of a datablock, as a hashable tuple.  Generic datablock
+# properties (see `ID_PROPERTIES`) are skipped.
+def simple_properties_state(data):
+    state = []
+    for prop in data.bl_rna.properties:
+        if prop.type not in SIMPLE_PROPERTY_TYPES or prop.identifier in ID_PROPERTIES:
+            continue
+        value = getattr(data, prop.identifier)
+        if getattr(prop, "is_array", False):
+            value = tuple(value)
+        elif prop.type == 'ENUM' and prop.is_enum_flag:
+            value = tuple(sorted(value))
+        state.append((prop.identifier, value))
+    return tuple(state)
+
+
+# Gets the value of an unlinked node input socket as a hashable value.
+def socket_value_state(socket):
+    value = socket.default_value
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        value = tuple(value)
+    return value
+
+
+# Names of the nodes of the Compify material whose unlinked inputs affect
+# the baked lighting, and the prefix of their input names in the bake
+# input states.
+STATE_NODES = [
+    (MAIN_NODE_NAME, "Footage Group Input"),
+    ("Camera Project", "Camera Project Input"),
+    ("Feathered Square", "Feathered Square Input"),
+]
+
+
+# Gets the state of an evaluated object as far as baking is concerned: its
+# transform, plus its light settings, lens settings, or (evaluated) mesh
+# fingerprint and prep UV layout.
+def object_state(obj_eval):
+    state = [tuple(tuple(row) for row in obj_eval.matrix_world)]
+    if obj_eval.type == 'LIGHT':
+        state.append(simple_properties_state(obj_eval.data))
+    elif obj_eval.type == 'CAMERA':
+        state.append(tuple(getattr(obj_eval.data, data_path) for _, data_path in CAMERA_LENS_SETTINGS))
+    elif obj_eval.type == 'MESH':
+        state.append(mesh_fingerprint(obj_eval.data))
+        state.append(obj_eval.original.data.get(PREP_LAYOUT_PROP))
+    return tuple(state)
+
+
+# Gets the proxy objects that are in the footage camera's frame on the
+# current frame, or None if baking only visible proxies is disabled (or
+# there's no camera).
+#
+# Proxies outside the frame don't need baking, since their lighting can't
+# be seen.  They still take part in the bake as bounce light occluders,
+# and their previously baked lighting is kept.
+def visible_proxies(context):
+    config = context.scene.compify_config
+    if not config.bake_visible_only or config.camera == None or config.geo_collection == None:
+        return None
+    proxies = [obj for obj in config.geo_collection.objects if obj.type == 'MESH']
+    return objects_in_frame(proxies, config.camera, render_aspect(context.scene))
+
+
+# Gathers the state of the footage lights, as part of the bake input
+# states (see `bake_input_states()`).
+def light_states(context):
+    config = context.scene.compify_config
+    depsgraph = context.evaluated_depsgraph_get()
+
+    states = {}
+    if config.lights_collection != None:
+        for obj in config.lights_collection.objects:
+            states["Light \"{}\"".format(obj.name)] = object_state(obj.evaluated_get(depsgraph))
+    return states
+
+
+# Gathers the state of everything that affects the baked lighting for the
+# current frame: the proxy objects, the footage lights, the footage image
+# and frame, the footage camera, the unlinked inputs of the Compify nodes
+# in the material, the world, and the bake settings.
+#
+# The footage and its projection matter because while baking, the footage
+# group gives the proxies the footage as emission for all but camera
+# rays, so it bounces onto the other proxies.
+#
+# Returns a dict mapping an input name to a hashable state.
+def bake_input_states(context):
+    scene = context.scene
+    config = scene.compify_config
+    depsgraph = context.evaluated_depsgraph_get()
+
+    states = {}
+    if config.geo_collection != None:
+        for obj in config.geo_collection.objects:
+            states["Proxy \"{}\"".format(obj.name)] = object_state(obj.evaluated_get(depsgraph))
+    states.update(light_states(context))
+
+    visible = visible_proxies(context)
+    if visible != None:
+        states["Visible Proxies"] = tuple(sorted(obj.name for obj in visible))
+
+    if config.camera != None:
+        states["Footage Camera"] = object_state(config.camera.evaluated_get(depsgraph))
+
+    # "Do Bake" and "Debug" are toggled by the baker itself, so they're
+    # left out.
+    material = bpy.data.materials.get(compify_mat_name(context))
+    nodes = material.node_tree.nodes if material != None else {}
+    for node_name, prefix in STATE_NODES:
+        if node_name not in nodes:
+            continue
+        for socket in nodes[node_name].inputs:
+            if socket.name in {"Do Bake", "Debug"} or socket.is_linked or not hasattr(socket, "default_value"):
+                continue
+            states["{} \"{}\"".format(prefix, socket.name)] = socket_value_state(socket)
+
+    if "Input Footage" in nodes and nodes["Input Footage"].image != None:
+        footage_node = nodes["Input Footage"]
+        footage = footage_node.image
+        footage_state = [footage.name, footage.filepath, footage.source]
+        if footage.source in {'SEQUENCE', 'MOVIE'}:
+            user = footage_node.image_user
+            footage_state.append(image_user_frame(
+                scene.frame_current,
+                user.frame_start,
+                user.frame_duration,
+                user.frame_offset,
+                user.use_cyclic,
+            ))
+        states["Footage"] = tuple(footage_state)
+
+    if scene.world != None:
+        world_state = [scene.world.name]
+        if scene.world.use_nodes:
+            for node in scene.world.node_tree.nodes:
+                for socket in node.inputs:
+                    if hasattr(socket, "default_value") and not socket.is_linked:
+                        world_state.append((node.name, socket.identifier, socket_value_state(socket)))
+        states["World"] = tuple(world_state)
+
+    settings = [
+        config.bake_image_res,
+        config.bake_uv_margin,
+        config.bake_udim_tiles,
+        scene.render.engine,
+    ]
+    if config.use_bake_quality:
+        settings += [
+            config.bake_samples,
+            config.bake_adaptive_threshold,
+            config.bake_denoise,
+            config.bake_denoise_strength,
+            config.bake_max_bounces,
+        ]
+    if hasattr(scene, "cycles"):
+        settings.append(scene.cycles.samples)
+    states["Bake Settings"] = tuple(settings)
+
+    return states
+
+
+# Gets the path of the cached bake for the given key, creating the cache
+# directory if needed.
+def bake_cache_path(context, key):
+    directory = bpy.path.abspath(context.scene.compify_config.bake_cache_dir)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, key + ".exr")
+
+
+# Decides how to get the baked lighting for the current frame, given the
+# bake input states of the lighting currently in the bake image (None if
+# there isn't any).  Baking is only skipped if none of the inputs from
+# `bake_input_states()` changed, which includes the footage frame and
+# footage camera.
+#
+# If a `ProxyBakeTracker` is given, only the proxies whose lighting is
+# affected by what changed are baked, leaving the rest of the bake image
+# as it is.
+#
+# Returns an `(action, reason, states, cache_path, objects)` tuple.
+# `action` is "skip" if the current lighting is still valid (or there's
+# nothing in frame to bake), "cached" if the lighting should be loaded
+# from `cache_path`, or "bake".  When baking, `cache_path` is where to
+# store the new bake, or None if the bake cache isn't in use, and
+# `objects` is the proxies to bake (to pass to `Baker.execute()`), or None
+# for all of them.  `reason` is a human readable explanation.
+def bake_decision(context, last_states, tracker=None):
+    config = context.scene.compify_config
+    states = bake_input_states(context)
+
+    if last_states != None and "Visible Proxies" in states and len(states["Visible Proxies"]) == 0:
+        return ("skip", "no proxies in frame", states, None, None)
+
+    skip, reason = bake_reason(last_states, states, config.bake_skip_unchanged)
+    if skip:
+        return ("skip", reason, states, None, None)
+
+    # Figure out which proxies need baking.
+    proxies = [obj for obj in config.geo_collection.objects if obj.type == 'MESH']
+    objects = visible_proxies(context)
+    if objects == None or len(objects) == 0:
+        objects = proxies
+    if tracker != None and last_states != None and config.bake_skip_unchanged:
+        objects = tracker.dirty_proxies(objects, states)
+        if len(objects) == 0:
+            return ("skip", reason + ", but no proxies are affected", states, None, None)
+    if len(objects) < len(proxies):
+        reason += " ({} of {} proxies)".format(len(objects), len(proxies))
+    else:
+        objects = None
+
+    # Reuse a cached bake if nothing that affects the lighting differs
+    # from a previously baked frame.  Incomplete files (e.g. left behind
+    # by a crash) are baked over.
+    cache_path = None
+    if config.use_bake_cache and config.bake_udim_tiles == 1:
+        cache_path = bake_cache_path(context, bake_input_hash(states))
+        if saved_image_ok(cache_path, 'OPEN_EXR'):
+            return ("cached", reason, states, cache_path, None)
+
+    return ("bake", reason, states, cache_path, objects)
+
+
+# Gets the path of the given frame's file in the baked lighting sequence
+# (see the Bake Lighting Sequence operator).
+def bake_sequence_path(context, frame):
+    directory = bpy.path.abspath(context.scene.compify_config.bake_sequence_dir)
+    return os.path.join(directory, "lighting_{:04}.exr".format(frame))
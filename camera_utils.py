@@ -0,0 +1,172 @@
+import math
+
+import numpy as np
+
+# Depth in front of the camera that points behind it are clamped to when
+# projecting, so that partially visible objects still project sensibly.
+NEAR_CLIP = 1.0e-3
+
+
+# Gets the aspect ratio of the scene's render output, including pixel
+# aspect.
+def render_aspect(scene):
+    render_x = scene.render.resolution_x * scene.render.pixel_aspect_x
+    render_y = scene.render.resolution_y * scene.render.pixel_aspect_y
+    return render_x / render_y
+
+
+# Projects world space points into the footage frame of `camera`, using
+# the same math as the camera projection node group (minus its user
+# offset and rotation inputs).
+#
+# `points` is an Nx3 array.  Returns a `(uvs, depths)` tuple, where `uvs`
+# is an Nx2 array of footage frame coordinates (0-1 across the frame) and
+# `depths` is each point's distance in front of the camera.
+def project_points(points, camera, aspect):
+    to_camera = np.array(camera.matrix_world.inverted(), dtype=np.float64)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    local = points @ to_camera[:3, :3].T + to_camera[:3, 3]
+
+    depths = -local[:, 2]
+    safe_depths = np.maximum(depths, NEAR_CLIP)
+    zoom = camera.data.lens / camera.data.sensor_width
+
+    uvs = np.empty((len(points), 2), dtype=np.float64)
+    uvs[:, 0] = local[:, 0] / safe_depths * zoom - camera.data.shift_x
+    uvs[:, 1] = local[:, 1] / safe_depths * zoom - camera.data.shift_y
+    if aspect < 1.0:
+        uvs[:, 0] /= aspect
+    else:
+        uvs[:, 1] *= aspect
+    uvs += 0.5
+
+    return (uvs, depths)
+
+
+# Projects camera-local points into the footage frame in homogeneous
+# form, using the same math as the camera projection node group,
+# including its user inputs: `location` is its `(Loc X, Loc Y)`,
+# `rotation` its Rotation in degrees, and `aspect` its Aspect Ratio.
+#
+# `local` is an Nx3 array.  Returns an Nx3 array of `(u * w, v * w, w)`
+# rows, where `(u, v)` are the footage frame coordinates and `w` is each
+# point's depth in front of the camera.  Unlike `(u, v)` these are affine
+# in the points' positions, so interpolating them linearly across a
+# triangle and then dividing by `w` gives exactly the projection of every
+# point of the triangle, however big it is.
+def homogeneous_projection(local, lens, sensor_width, shift, location, rotation, aspect):
+    local = np.asarray(local, dtype=np.float64).reshape(-1, 3)
+    depths = -local[:, 2]
+    zoom = lens / sensor_width
+
+    u = local[:, 0] * zoom - (shift[0] + location[0]) * depths
+    v = local[:, 1] * zoom - (shift[1] + location[1]) * depths
+
+    angle = math.radians(rotation)
+    cos = math.cos(angle)
+    sin = math.sin(angle)
+    scale = (1.0 / aspect, 1.0) if aspect < 1.0 else (1.0, aspect)
+
+    projected = np.empty((len(local), 3), dtype=np.float64)
+    projected[:, 0] = (u * cos - v * sin) * scale[0] + 0.5 * depths
+    projected[:, 1] = (u * sin + v * cos) * scale[1] + 0.5 * depths
+    projected[:, 2] = depths
+    return projected
+
+
+# Gets the world space bounding box corners of the given objects.
+#
+# Returns an Nx8x3 array.
+def bounding_box_corners(objects):
+    objects = list(objects)
+    corners = np.empty((len(objects), 8, 3), dtype=np.float64)
+    for i, obj in enumerate(objects):
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        local = np.array(obj.bound_box, dtype=np.float64)
+        corners[i] = local @ matrix[:3, :3].T + matrix[:3, 3]
+    return corners
+
+
+# Computes the footage frame rectangle covered by each object's bounding
+# box, as seen from `camera`.
+#
+# Returns an Nx4 array of `(min_u, min_v, max_u, max_v)` rows, clipped to
+# the frame.  Objects entirely outside the frame or behind the camera get
+# an empty (zero area) rectangle.
+def frame_rects(objects, camera, aspect):
+    corners = bounding_box_corners(objects)
+    uvs, depths = project_points(corners.reshape(-1, 3), camera, aspect)
+    uvs = uvs.reshape(-1, 8, 2)
+    depths = depths.reshape(-1, 8)
+
+    rects = np.empty((len(corners), 4), dtype=np.float64)
+    rects[:, :2] = np.clip(uvs.min(axis=1), 0.0, 1.0)
+    rects[:, 2:] = np.clip(uvs.max(axis=1), 0.0, 1.0)
+
+    behind = (depths <= NEAR_CLIP).all(axis=1)
+    rects[behind] = 0.0
+    return rects
+
+
+# Finds which of the given objects' bounding boxes are at least partly
+# inside the footage frame of `camera`.  This ignores occlusion.
+#
+# Returns a list of the objects in the frame.
+def objects_in_frame(objects, camera, aspect):
+    objects = list(objects)
+    if len(objects) == 0:
+        return []
+    rects = frame_rects(objects, camera, aspect)
+    in_frame = (rects[:, 2] > rects[:, 0]) & (rects[:, 3] > rects[:, 1])
+    return [obj for obj, visible in zip(objects, in_frame) if visible]
+
+
+# Computes the fraction of the footage frame covered by each object's
+# bounding box, as seen from `camera`.  This ignores occlusion, so it's
+# an upper bound.
+def frame_coverage(objects, camera, aspect):
+    rects = frame_rects(objects, camera, aspect)
+    return (rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])
+
+
+# Computes how many bake texels each object should get to hit
+# `texels_per_pixel` bake texels per footage pixel, based on the largest
+# fraction of the frame its bounding box covers from `camera`.
+#
+# Coverage is sampled at `samples` frames spread evenly over the scene's
+# frame range, since the camera usually moves.  Objects that are never
+# seen still get a small share of the atlas so they remain bakeable.
+#
+# Returns a float array with one entry per object.
+def camera_texel_weights(scene, camera, objects, texels_per_pixel, samples=8):
+    objects = list(objects)
+    aspect = render_aspect(scene)
+    coverage = np.zeros(len(objects), dtype=np.float64)
+
+    original_frame = scene.frame_current
+    frames = np.unique(np.linspace(scene.frame_start, scene.frame_end, samples).round().astype(int))
+    for frame in frames:
+        scene.frame_set(int(frame))
+        coverage = np.maximum(coverage, frame_coverage(objects, camera, aspect))
+    scene.frame_set(original_frame)
+
+    pixels = scene.render.resolution_x * scene.render.resolution_y \
+        * (scene.render.resolution_percentage / 100.0) ** 2
+    weights = coverage * pixels * texels_per_pixel
+
+    seen = weights > 0.0
+    floor = weights[seen].mean() * 0.01 if seen.any() else 1.0
+    return np.maximum(weights, floor)
+
+
+# Computes the (per-tile) bake resolution needed to fit the given texel
+# weights into `tile_count` square tiles.
+#
+# UV packing never fills the whole atlas, so this assumes roughly half of
+# each tile ends up covered by islands.  The result is rounded up to a
+# multiple of 256 to avoid re-prepping over tiny coverage changes.
+def texel_density_resolution(weights, tile_count, min_res=64, max_res=2**14):
+    PACKING_EFFICIENCY = 0.5
+    res = math.sqrt(float(np.sum(weights)) / (PACKING_EFFICIENCY * tile_count))
+    res = int(math.ceil(res / 256.0)) * 256
+    return max(min_res, min(res, max_res))
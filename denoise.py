@@ -0,0 +1,207 @@
+import numpy as np
+
+from .uv_utils import rasterize_uv_islands, uv_layout_hash
+
+# Radius, in texels, of the denoising filter window.
+DENOISE_RADIUS = 3
+
+# Size, in texels, of the square tiles that the bake is denoised and its
+# margin refilled in, to bound the size of the temporary arrays.
+TILE_SIZE = 512
+
+# Maximum number of texels sampled to estimate the noise level.
+NOISE_SAMPLE_TEXELS = 2**22
+
+# Rec. 709 luminance weights.
+LUMINANCE_WEIGHTS = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+
+# The most recent rasterization of the proxies' UV islands, as a `(key,
+# labels, label_objects)` tuple (see `island_labels()`).  Only one is kept,
+# since the label map of a large bake takes a lot of memory.
+island_cache = None
+
+
+# Computes the log2 luminance of RGB lighting values, clamped away from
+# zero.
+def log_luminance(rgb):
+    return np.log2(np.maximum(rgb @ LUMINANCE_WEIGHTS, 1.0e-6)).astype(np.float32)
+
+
+# Estimates the standard deviation of the noise in `values` (a 2D array)
+# from the differences between horizontally adjacent texels of the same
+# island, using the median absolute deviation so that real edges in the
+# lighting don't count as noise.
+def estimate_noise(values, labels):
+    same = (labels[:, 1:] == labels[:, :-1]) & (labels[:, 1:] > 0)
+    differences = (values[:, 1:] - values[:, :-1])[same]
+    if differences.size == 0:
+        return 0.0
+    return float(np.median(np.abs(differences))) * 1.4826 / np.sqrt(2.0)
+
+
+# Yields the `(y0, y1, x0, x1)` bounds of the `TILE_SIZE` tiles of a
+# (height, width) texel grid that contain any True texel of `mask`, after
+# growing each tile by `halo` texels on all sides.
+def tiles_touching(mask, halo):
+    height, width = mask.shape
+    for y0 in range(0, height, TILE_SIZE):
+        for x0 in range(0, width, TILE_SIZE):
+            y1 = min(y0 + TILE_SIZE, height)
+            x1 = min(x0 + TILE_SIZE, width)
+            if mask[max(y0 - halo, 0):y1 + halo, max(x0 - halo, 0):x1 + halo].any():
+                yield (y0, y1, x0, x1)
+
+
+# Gets the `halo` texels wide window around the tile `(y0, y1, x0, x1)`
+# of `array`, padded with zeros where it goes past the edges.
+def padded_window(array, tile, halo):
+    y0, y1, x0, x1 = tile
+    height, width = array.shape[:2]
+    sy0 = max(y0 - halo, 0)
+    sy1 = min(y1 + halo, height)
+    sx0 = max(x0 - halo, 0)
+    sx1 = min(x1 + halo, width)
+    padding = [(sy0 - (y0 - halo), (y1 + halo) - sy1), (sx0 - (x0 - halo), (x1 + halo) - sx1)]
+    padding += [(0, 0)] * (array.ndim - 2)
+    return np.pad(array[sy0:sy1, sx0:sx1], padding, mode='constant')
+
+
+# Denoises baked lighting with an edge-aware (bilateral) filter.
+#
+# Each texel is replaced by a weighted average of the texels around it
+# that are in the same UV island, weighted by distance and by similarity
+# in log luminance.  Texels in other islands or in the gutters between
+# them are never used.  The range weight is scaled to the noise level
+# estimated from (a sample of) the texels being denoised, times
+# `strength`.
+#
+# `labels` is a (height, width) island label array as from
+# `rasterize_uv_islands()`, and only texels where `mask` is True are
+# changed.  The filter runs one tile at a time, skipping tiles with
+# nothing to denoise.
+def bilateral_denoise(pixels, labels, mask, strength=1.0):
+    height, width = labels.shape
+    if strength <= 0.0 or not mask.any():
+        return pixels
+
+    row_step = max(1, (height * width) // NOISE_SAMPLE_TEXELS)
+    noise = estimate_noise(
+        log_luminance(pixels[::row_step, :, :3]),
+        np.where(mask[::row_step], labels[::row_step], 0),
+    )
+    if noise <= 0.0:
+        return pixels
+    range_factor = -0.5 / (noise * 2.0 * strength) ** 2
+    spatial_factor = -0.5 / (DENOISE_RADIUS * 0.5) ** 2
+
+    r = DENOISE_RADIUS
+    denoised = pixels.copy()
+    for tile in tiles_touching(mask, 0):
+        y0, y1, x0, x1 = tile
+        tile_height = y1 - y0
+        tile_width = x1 - x0
+        tile_mask = mask[y0:y1, x0:x1]
+
+        padded_rgb = padded_window(pixels[..., :3], tile, r)
+        padded_luminance = log_luminance(padded_rgb)
+        padded_labels = padded_window(labels, tile, r)
+        center = (slice(r, r + tile_height), slice(r, r + tile_width))
+        luminance = padded_luminance[center]
+        tile_labels = padded_labels[center]
+
+        total = np.zeros((tile_height, tile_width, 3), dtype=np.float32)
+        total_weight = np.zeros((tile_height, tile_width), dtype=np.float32)
+        for dy in range(-r, r + 1):
+            for dx in range(-r, r + 1):
+                window = (slice(r + dy, r + dy + tile_height), slice(r + dx, r + dx + tile_width))
+                weight = np.exp(
+                    (padded_luminance[window] - luminance) ** 2 * range_factor
+                    + (dx * dx + dy * dy) * spatial_factor
+                ).astype(np.float32)
+                weight *= padded_labels[window] == tile_labels
+                total += padded_rgb[window] * weight[..., None]
+                total_weight += weight
+
+        denoised[y0:y1, x0:x1, :3][tile_mask] = total[tile_mask] / total_weight[tile_mask][:, None]
+
+    return denoised
+
+
+# Refills the bake margin around the UV islands where `baked` is True
+# from their (denoised) texels, the way the bake's 'EXTEND' margin does:
+# each ring of gutter texels is filled with the average of its already
+# filled 4-neighbours, for `margin` rings.  Texels further out, inside
+# any island (where `covered` is True), or only next to islands that
+# weren't baked are left untouched.
+#
+# `covered` and `baked` are (height, width) bool arrays.  The fill runs
+# one tile at a time, skipping tiles that no baked island reaches.
+def fill_margin(pixels, covered, baked, margin):
+    filled_pixels = pixels.copy()
+    if margin <= 0:
+        return filled_pixels
+
+    for tile in tiles_touching(baked, margin):
+        y0, y1, x0, x1 = tile
+        window_pixels = padded_window(pixels, tile, margin)
+        window_covered = padded_window(covered, tile, margin)
+        filled = padded_window(baked, tile, margin)
+        height, width = filled.shape
+
+        for _ in range(margin):
+            total = np.zeros_like(window_pixels)
+            count = np.zeros((height, width), dtype=np.float32)
+            for target, source in [
+                ((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+                ((slice(None, -1), slice(None)), (slice(1, None), slice(None))),
+                ((slice(None), slice(1, None)), (slice(None), slice(None, -1))),
+                ((slice(None), slice(None, -1)), (slice(None), slice(1, None))),
+            ]:
+                total[target] += window_pixels[source] * filled[source][..., None]
+                count[target] += filled[source]
+
+            ring = ~filled & ~window_covered & (count > 0.0)
+            if not ring.any():
+                break
+            window_pixels[ring] = total[ring] / count[ring][:, None]
+            filled |= ring
+
+        center = (slice(margin, margin + y1 - y0), slice(margin, margin + x1 - x0))
+        filled_pixels[y0:y1, x0:x1] = window_pixels[center]
+
+    return filled_pixels
+
+
+# Rasterizes the UV islands of `mesh_objects` like
+# `rasterize_uv_islands()`, reusing the previous result if the objects,
+# their UV layouts and the bake size are all unchanged.  Rasterizing a
+# large bake takes far longer than hashing the UVs, and the layout rarely
+# changes between the frames of a render.
+def island_labels(mesh_objects, uv_layer_name, width, height):
+    global island_cache
+    key = (width, height, tuple(
+        (obj.name, uv_layout_hash(obj.data, uv_layer_name)) for obj in mesh_objects
+    ))
+    if island_cache == None or island_cache[0] != key:
+        labels, label_objects = rasterize_uv_islands(mesh_objects, uv_layer_name, width, height)
+        island_cache = (key, labels, label_objects)
+    return island_cache[1], island_cache[2]
+
+
+# Denoises freshly baked lighting pixels of a non-tiled bake image.
+#
+# The UV islands of all `proxy_objects` are rasterized (see
+# `island_labels()`) to know where islands and gutters are, but only the islands of `bake_objects` (the
+# ones that were just baked) are denoised.  Their margin is then refilled
+# from the denoised texels, so noise doesn't survive in the gutters and
+# nothing bleeds across them.
+def denoise_bake(pixels, proxy_objects, bake_objects, uv_layer_name, margin, strength=1.0):
+    height, width = pixels.shape[:2]
+    proxy_objects = [obj for obj in proxy_objects if obj.type == 'MESH' and uv_layer_name in obj.data.uv_layers]
+    labels, label_objects = island_labels(proxy_objects, uv_layer_name, width, height)
+
+    baked_indices = [i for i, obj in enumerate(proxy_objects) if obj in bake_objects]
+    mask = np.isin(label_objects, baked_indices)[labels]
+
+    denoised = bilateral_denoise(pixels, labels, mask, strength)
+    return fill_margin(denoised, labels > 0, mask, margin)
@@ -0,0 +1,210 @@
+import argparse
+import subprocess
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import bpy
+
+from .bake import Baker, load_bake, use_camera_project_group, use_footage_render_group
+from .bake_cache import bake_decision, ProxyBakeTracker
+from .farm_utils import frame_chunks, parse_progress_line, progress_line, threads_per_worker
+from .image_utils import render_output_path, saved_image_ok
+from .journal import journal_path, RenderJournal
+from .names import compify_mat_name
+
+# How many lines of a failed worker's output to include in its report.
+FAILURE_OUTPUT_LINES = 20
+
+
+# Bakes and renders the given (inclusive) frame range of the current scene
+# synchronously.  This is what each worker process runs.
+#
+# Like Compify Render, frames whose lighting inputs didn't change since
+# the last bake reuse that bake, the bake cache is used if enabled, and
+# already rendered frames are skipped if enabled.  Each chunk keeps its own
+# render journal, so that re-running an interrupted chunk resumes it.
+# After each frame a progress line is printed for the controlling process.
+def render_chunk(frame_start, frame_end):
+    context = bpy.context
+    scene = context.scene
+    baker = Baker()
+    tracker = ProxyBakeTracker()
+    last_states = None
+    # Baking needs the full footage group, so once a bake follows a
+    # render, the full group is kept for the rest of the chunk rather than
+    # swapping groups (and recompiling the material) twice per frame.
+    has_rendered = False
+    use_render_group = True
+
+    file_format = scene.render.image_settings.file_format
+
+    frame_range = (frame_start, frame_end)
+    journal = RenderJournal(
+        journal_path(bpy.path.abspath(scene.render.filepath), frame_range),
+        frame_range,
+        bpy.data.filepath,
+    )
+    skip_frames = set()
+    if scene.compify_config.render_skip_existing:
+        journal.load()
+        skip_frames = journal.existing_frames(scene)
+    journal.completed = set(skip_frames)
+    journal.in_progress = None
+
+    # Make sure the camera projection group matches the camera's current
+    # lens settings, in case the file was saved with a stale one.
+    material = bpy.data.materials[compify_mat_name(context)]
+    use_camera_project_group(material, scene.compify_config.camera)
+
+    for frame in range(frame_start, frame_end + 1):
+        image_path = render_output_path(scene, frame)
+        if frame in skip_frames:
+            print(progress_line(frame, "exists", "already rendered"), flush=True)
+            continue
+
+        scene.frame_set(frame)
+
+        action, reason, states, cache_path, objects = bake_decision(context, last_states, tracker)
+        if action == "cached":
+            load_bake(context, cache_path)
+            tracker.record(scene.compify_config.geo_collection.objects, states)
+        elif action == "bake":
+            if has_rendered:
+                use_render_group = False
+            if baker.execute(context, objects=objects, use_clear=objects == None, store_path=cache_path) == {'CANCELLED'} \
+            or baker.run(context) == {'CANCELLED'}:
+                raise RuntimeError("Compify: baking frame {} failed".format(frame))
+            tracker.record(baker.baked_objects, states)
+        last_states = states
+
+        use_footage_render_group(material, use_render_group)
+        has_rendered = True
+        journal.frame_started(frame)
+        bpy.ops.render.render(write_still=True)
+        if not saved_image_ok(image_path, file_format):
+            raise RuntimeError("Compify: saving frame {} failed".format(frame))
+        journal.frame_completed(frame)
+
+        print(progress_line(frame, action, reason), flush=True)
+
+
+# Runs `render_chunk()` for one chunk of frames in a background Blender
+# process, forwarding its progress to `on_progress(chunk, frame, action)`.
+#
+# Returns a `(chunk, return_code, output_tail)` tuple, where `output_tail`
+# is the last few lines of the worker's output, for error reporting.
+def run_worker(blend_path, chunk, threads, on_progress):
+    expression = "import importlib; importlib.import_module({!r}).render_chunk({}, {})".format(
+        __name__,
+        chunk[0],
+        chunk[1],
+    )
+    command = [
+        bpy.app.binary_path,
+        "--background", blend_path,
+        "--threads", str(threads),
+        "--python-exit-code", "1",
+        "--python-expr", expression,
+    ]
+
+    output_tail = deque(maxlen=FAILURE_OUTPUT_LINES)
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    for line in process.stdout:
+        line = line.rstrip()
+        output_tail.append(line)
+        progress = parse_progress_line(line)
+        if progress != None:
+            on_progress(chunk, progress[0], progress[1])
+    return (chunk, process.wait(), list(output_tail))
+
+
+# Bakes and renders frames `frame_start` through `frame_end` of a saved
+# .blend file, split into chunks of `chunk_size` frames that each run in
+# their own background Blender process, with up to `workers` of them at a
+# time.  Each worker gets `threads` render threads (0 splits the machine's
+# cores evenly between the workers).
+#
+# Returns a list of `(chunk, return_code, output_tail)` tuples for the
+# chunks that failed.
+def farm_render(blend_path, frame_start, frame_end, workers, chunk_size, threads=0):
+    chunks = frame_chunks(frame_start, frame_end, chunk_size)
+    threads = threads_per_worker(threads, workers)
+    total_frames = frame_end - frame_start + 1
+
+    lock = threading.Lock()
+    done_frames = [0]
+    def on_progress(chunk, frame, action):
+        with lock:
+            done_frames[0] += 1
+            print("Compify farm: frames {}-{}: frame {} done ({}), {}/{} frames total".format(
+                chunk[0],
+                chunk[1],
+                frame,
+                action,
+                done_frames[0],
+                total_frames,
+            ), flush=True)
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_worker, blend_path, chunk, threads, on_progress) for chunk in chunks]
+        for future in as_completed(futures):
+            chunk, return_code, output_tail = future.result()
+            with lock:
+                if return_code == 0:
+                    print("Compify farm: frames {}-{} finished".format(chunk[0], chunk[1]), flush=True)
+                else:
+                    print("Compify farm: frames {}-{} FAILED with exit code {}".format(chunk[0], chunk[1], return_code), flush=True)
+                    failures.append((chunk, return_code, output_tail))
+
+    for chunk, return_code, output_tail in sorted(failures):
+        print("\nCompify farm: output of failed frames {}-{}:".format(chunk[0], chunk[1]))
+        for line in output_tail:
+            print("    " + line)
+
+    return failures
+
+
+# Command line entry point, for use with a background Blender that has the
+# .blend file to render loaded, e.g.:
+#
+#     blender -b shot.blend --python-expr "import compify.farm; compify.farm.main()" -- --workers 8
+#
+# Arguments after `--` are parsed by this function.  Exits with a non-zero
+# exit code if any chunk failed.
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    scene = bpy.context.scene
+
+    parser = argparse.ArgumentParser(
+        prog="compify.farm",
+        description="Bake and render a Compify scene with multiple background Blender processes.",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="number of worker processes to run at once")
+    parser.add_argument("--chunk-size", type=int, default=10, help="number of frames per worker process")
+    parser.add_argument("--threads", type=int, default=0, help="render threads per worker (default: split the cores evenly)")
+    parser.add_argument("--frame-start", type=int, default=scene.frame_start)
+    parser.add_argument("--frame-end", type=int, default=scene.frame_end)
+    args = parser.parse_args(argv)
+
+    if bpy.data.filepath == "":
+        print("Compify farm: the .blend file must be saved before farm rendering")
+        sys.exit(1)
+
+    failures = farm_render(
+        bpy.data.filepath,
+        args.frame_start,
+        args.frame_end,
+        max(1, args.workers),
+        max(1, args.chunk_size),
+        args.threads,
+    )
+    if len(failures) > 0:
+        sys.exit(1)
@@ -0,0 +1,45 @@
+import os
+
+# Prefix of the lines that worker processes print to report progress.
+PROGRESS_PREFIX = "COMPIFY_FARM_PROGRESS"
+
+
+# Splits the (inclusive) frame range `frame_start` through `frame_end` into
+# inclusive `(start, end)` chunks of at most `chunk_size` frames.
+def frame_chunks(frame_start, frame_end, chunk_size):
+    return [
+        (start, min(start + chunk_size - 1, frame_end))
+        for start in range(frame_start, frame_end + 1, chunk_size)
+    ]
+
+
+# Returns how many render threads each of `workers` worker processes gets.
+# A positive `threads` is used as is, otherwise the machine's cores are
+# split evenly between the workers.
+def threads_per_worker(threads, workers, cpu_count=None):
+    if threads > 0:
+        return threads
+    if cpu_count == None:
+        cpu_count = os.cpu_count() or 1
+    return max(1, cpu_count // workers)
+
+
+# Formats a worker's progress line for `frame`.
+def progress_line(frame, action, reason=None):
+    if reason == None:
+        return "{} {} {}".format(PROGRESS_PREFIX, frame, action)
+    return "{} {} {} ({})".format(PROGRESS_PREFIX, frame, action, reason)
+
+
+# Parses a line of a worker's output.
+#
+# Returns a `(frame, action)` tuple if it's a progress line, and None
+# otherwise.
+def parse_progress_line(line):
+    parts = line.rstrip().split(" ", 3)
+    if len(parts) < 3 or parts[0] != PROGRESS_PREFIX:
+        return None
+    try:
+        return (int(parts[1]), parts[2])
+    except ValueError:
+        return None
@@ -0,0 +1,328 @@
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# The dynamic range, in stops, that log-encoded 8-bit lighting covers
+# below the brightest value in the bake.
+LOG_ENCODE_STOPS = 12.0
+
+
+# Reads the pixels of an image into a float32 array of shape
+# (height, width, channels).
+def read_pixels(image):
+    width, height = image.size
+    pixels = np.empty(width * height * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels.reshape(height, width, image.channels)
+
+
+# Writes a float array of shape (height, width, channels) into the pixels
+# of an image of the same size.
+def write_pixels(image, pixels):
+    image.pixels.foreach_set(np.ascontiguousarray(pixels, dtype=np.float32).ravel())
+    image.update()
+
+
+# Computes the relative error of approximate lighting values `stored`
+# against the original `pixels`, over the RGB channels of pixels that
+# aren't (near) black.
+#
+# Returns a `(mean, max)` tuple of relative errors.
+def relative_error(pixels, stored):
+    original = pixels[..., :3]
+    lit = original > 1.0e-4
+    if not lit.any():
+        return (0.0, 0.0)
+    error = np.abs(stored[..., :3][lit] - original[lit]) / original[lit]
+    return (float(error.mean()), float(error.max()))
+
+
+# Rounds float pixels to half float precision, as they would be stored in
+# a half float OpenEXR file.
+def quantize_half(pixels):
+    return pixels.astype(np.float16).astype(np.float32)
+
+
+# Log-encodes lighting values into the 0-1 range for storage in an 8-bit
+# image.
+#
+# The encoded range spans `LOG_ENCODE_STOPS` stops down from the brightest
+# value, and anything darker is clamped to its bottom.  Alpha is set to 1.
+#
+# Returns an `(encoded, log_min, log_max)` tuple, where `log_min` and
+# `log_max` are the base-2 logs of the values that 0 and 1 decode to.
+def encode_log8(pixels):
+    rgb = pixels[..., :3]
+    log_max = float(np.log2(max(float(rgb.max()), 1.0e-8)))
+    log_min = log_max - LOG_ENCODE_STOPS
+
+    encoded = np.empty(pixels.shape[:2] + (4,), dtype=np.float32)
+    with np.errstate(divide='ignore'):
+        encoded[..., :3] = (np.log2(np.maximum(rgb, 2.0 ** log_min)) - log_min) / (log_max - log_min)
+    encoded[..., 3] = 1.0
+    return (encoded, log_min, log_max)
+
+
+# Decodes lighting values from `encode_log8()`, after quantizing them to 8
+# bits the way Blender does when storing them in a byte image.
+def decode_log8(encoded, log_min, log_max):
+    quantized = np.floor(np.clip(encoded, 0.0, 1.0) * 255.0 + 0.5) / 255.0
+    decoded = np.exp2(quantized * (log_max - log_min) + log_min)
+    decoded[..., 3] = 1.0
+    return decoded.astype(np.float32)
+
+
+# Gets the file path that the render of `frame` is saved to, based on the
+# scene's output path and file format.  This is the same path Blender
+# itself writes still renders of that frame to.
+def render_output_path(scene, frame):
+    return scene.render.frame_path(frame=frame)
+
+
+# Gets the frame of an image sequence or movie that an image user shows
+# on scene frame `frame`, the way Blender computes it for image users
+# with auto refresh: counting from `frame_start`, clamped to (or with
+# `use_cyclic`, wrapped around) `frame_duration`, plus `frame_offset`.
+def image_user_frame(frame, frame_start, frame_duration, frame_offset, use_cyclic):
+    if frame_duration == 0:
+        return 0
+    frame = frame - frame_start + 1
+    if use_cyclic:
+        frame %= frame_duration
+        if frame == 0:
+            frame = frame_duration
+    else:
+        frame = min(max(frame, 0), frame_duration)
+    return frame + frame_offset
+
+
+# Box filters float pixels of shape (height, width, channels) down by an
+# integer `factor`.  Any leftover rows/columns that don't fill a whole box
+# are dropped.
+def downsample_pixels(pixels, factor):
+    if factor <= 1:
+        return pixels
+    height = pixels.shape[0] // factor
+    width = pixels.shape[1] // factor
+    boxes = pixels[:height * factor, :width * factor].reshape(height, factor, width, factor, -1)
+    return boxes.mean(axis=(1, 3), dtype=np.float32)
+
+
+# Resizes float pixels of shape (height, width, channels) to the given
+# size with nearest neighbour sampling.
+def resize_pixels_nearest(pixels, height, width):
+    rows = np.arange(height) * pixels.shape[0] // height
+    columns = np.arange(width) * pixels.shape[1] // width
+    return pixels[rows][:, columns]
+
+
+# Writes the RGB channels of float pixels of shape (height, width,
+# channels) to an uncompressed scanline OpenEXR file, as half floats (or
+# full floats if `half` is False).
+#
+# Unlike `bake.save_exr()` this doesn't touch Blender's data at all, so it's
+# safe to call from other threads.
+def write_exr(pixels, filepath, half=True):
+    height, width = pixels.shape[:2]
+    pixel_type, dtype = (1, np.dtype("<f2")) if half else (2, np.dtype("<f4"))
+
+    def attribute(name, type_name, data):
+        return name.encode() + b"\0" + type_name.encode() + b"\0" + struct.pack("<i", len(data)) + data
+
+    # Channels must be listed (and stored) in alphabetical order.
+    channel_list = b"".join(
+        name + b"\0" + struct.pack("<iB3xii", pixel_type, 0, 1, 1)
+        for name in [b"B", b"G", b"R"]
+    ) + b"\0"
+    window = struct.pack("<iiii", 0, 0, width - 1, height - 1)
+    header = IMAGE_FILE_MAGIC['OPEN_EXR'][0] \
+        + struct.pack("<i", 2) \
+        + attribute("channels", "chlist", channel_list) \
+        + attribute("compression", "compression", b"\0") \
+        + attribute("dataWindow", "box2i", window) \
+        + attribute("displayWindow", "box2i", window) \
+        + attribute("lineOrder", "lineOrder", b"\0") \
+        + attribute("pixelAspectRatio", "float", struct.pack("<f", 1.0)) \
+        + attribute("screenWindowCenter", "v2f", struct.pack("<ff", 0.0, 0.0)) \
+        + attribute("screenWindowWidth", "float", struct.pack("<f", 1.0)) \
+        + b"\0"
+
+    # One block per scanline, top to bottom (Blender's pixels are bottom to
+    # top), each made up of its y coordinate, its data size, and then each
+    # channel's values for the whole scanline.
+    line_size = width * 3 * dtype.itemsize
+    planar = np.ascontiguousarray(pixels[::-1, :, 2::-1].transpose(0, 2, 1), dtype=dtype)
+    blocks = np.empty((height, 8 + line_size), dtype=np.uint8)
+    blocks[:, :4] = np.arange(height, dtype="<i4").view(np.uint8).reshape(height, 4)
+    blocks[:, 4:8] = np.full(height, line_size, dtype="<i4").view(np.uint8).reshape(height, 4)
+    blocks[:, 8:] = planar.view(np.uint8).reshape(height, line_size)
+    offsets = len(header) + 8 * height + np.arange(height, dtype="<u8") * (8 + line_size)
+
+    with open(filepath, "wb") as f:
+        f.write(header)
+        f.write(offsets.astype("<u8").tobytes())
+        f.write(blocks.tobytes())
+
+
+# Runs file writing jobs on a small thread pool.
+#
+# At most `max_pending` jobs are queued or running at once, and
+# `submit()` blocks until there's room, so that a slow disk can't make
+# pixel buffers pile up in memory.  Failures are collected rather than
+# raised, to be reported all together by `finish()`.
+class AsyncFileWriter:
+    def __init__(self, max_workers=2, max_pending=4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.failures = []
+
+    # Calls `function(*args)` on the thread pool, to write `filepath`.
+    def submit(self, filepath, function, *args):
+        self.pending.acquire()
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(lambda future: self.job_done(filepath, future))
+
+    def job_done(self, filepath, future):
+        self.pending.release()
+        if future.exception() != None:
+            with self.lock:
+                self.failures.append((filepath, future.exception()))
+
+    # Waits for all jobs to finish.
+    #
+    # Returns a list of `(filepath, exception)` tuples for failed jobs.
+    def finish(self):
+        self.executor.shutdown(wait=True)
+        return self.failures
+
+
+# Leading bytes of image files written in each of Blender's still image
+# file formats, for the formats that have them.
+IMAGE_FILE_MAGIC = {
+    'BMP': [b"BM"],
+    'PNG': [b"\x89PNG\r\n\x1a\n"],
+    'JPEG': [b"\xff\xd8\xff"],
+    'JPEG2000': [b"\x00\x00\x00\x0cjP  \r\n\x87\n", b"\xff\x4f\xff\x51"],
+    'CINEON': [b"\x80\x2a\x5f\xd7"],
+    'DPX': [b"SDPX", b"XPDS"],
+    'OPEN_EXR_MULTILAYER': [b"\x76\x2f\x31\x01"],
+    'OPEN_EXR': [b"\x76\x2f\x31\x01"],
+    'HDR': [b"#?RADIANCE", b"#?RGBE"],
+    'TIFF': [b"II*\x00", b"MM\x00*"],
+    'WEBP': [b"RIFF"],
+}
+
+# Trailing bytes of complete image files, for the formats whose files
+# end with a fixed marker.  Used to catch truncated files.
+IMAGE_FILE_TRAILER = {
+    'PNG': b"IEND\xae\x42\x60\x82",
+    'JPEG': b"\xff\xd9",
+}
+
+
+# Lines of pixels per block of a scanline OpenEXR file, indexed by its
+# compression (NONE, RLE, ZIPS, ZIP, PIZ, PXR24, B44, B44A, DWAA, DWAB).
+EXR_LINES_PER_BLOCK = [1, 1, 1, 16, 32, 16, 32, 32, 32, 256]
+
+
+# Reads a null-terminated string from a file, without the null.
+#
+# Returns None if the file ends first.
+def read_c_string(f):
+    chars = bytearray()
+    while True:
+        char = f.read(1)
+        if char == b"":
+            return None
+        if char == b"\0":
+            return bytes(chars)
+        chars += char
+
+
+# Checks that a scanline OpenEXR file, open for reading in `f`, is
+# complete: that its header is intact, that its block offset table was
+# filled in (OpenEXR only writes it once all the pixels are written), and
+# that its last block fits in the file's `size`.
+#
+# Tiled, deep, and multi-part files are laid out differently, so only
+# their header is checked.
+def exr_complete(f, size):
+    f.seek(4)
+    version = f.read(4)
+    if len(version) < 4:
+        return False
+    if struct.unpack("<i", version)[0] & 0x1a00:
+        return True
+
+    compression = None
+    window = None
+    while True:
+        name = read_c_string(f)
+        if name == None:
+            return False
+        if name == b"":
+            break
+        type_name = read_c_string(f)
+        data_size = f.read(4)
+        if type_name == None or len(data_size) < 4:
+            return False
+        data_size = struct.unpack("<i", data_size)[0]
+        data = f.read(data_size)
+        if len(data) < data_size:
+            return False
+        if name == b"compression" and data_size == 1:
+            compression = data[0]
+        elif name == b"dataWindow" and data_size == 16:
+            window = struct.unpack("<iiii", data)
+    if compression == None or window == None:
+        return False
+    if compression >= len(EXR_LINES_PER_BLOCK):
+        return True
+
+    lines = window[3] - window[1] + 1
+    blocks = -(-lines // EXR_LINES_PER_BLOCK[compression])
+    table_end = f.tell() + 8 * blocks
+    if blocks <= 0 or table_end > size:
+        return False
+    offsets = np.frombuffer(f.read(8 * blocks), dtype="<u8")
+    if int(offsets.min()) < table_end or int(offsets.max()) + 8 > size:
+        return False
+    f.seek(int(offsets.max()))
+    _, data_size = struct.unpack("<ii", f.read(8))
+    return int(offsets.max()) + 8 + data_size <= size
+
+
+# Checks that an image file was saved: that it exists, isn't empty, and
+# if `file_format` (one of Blender's image file format identifiers) is
+# given, that it starts like a file of that format and, where the format
+# allows checking, that it's complete.
+def saved_image_ok(filepath, file_format=None):
+    if not os.path.isfile(filepath):
+        return False
+    size = os.path.getsize(filepath)
+    if size == 0:
+        return False
+
+    magics = IMAGE_FILE_MAGIC.get(file_format, [])
+    trailer = IMAGE_FILE_TRAILER.get(file_format)
+    if len(magics) == 0 and trailer == None:
+        return True
+
+    with open(filepath, "rb") as f:
+        if len(magics) > 0:
+            header = f.read(max(len(magic) for magic in magics))
+            if not any(header.startswith(magic) for magic in magics):
+                return False
+        if trailer != None:
+            if size < len(trailer):
+                return False
+            f.seek(size - len(trailer))
+            if f.read() != trailer:
+                return False
+        if file_format in {'OPEN_EXR', 'OPEN_EXR_MULTILAYER'} and not exr_complete(f, size):
+            return False
+    return True
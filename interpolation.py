@@ -0,0 +1,76 @@
+import numpy as np
+
+from .image_utils import relative_error
+
+
+# Schedules the bakes and renders of temporally interpolated lighting:
+# only keyframes are baked, and the frames in between are rendered with a
+# blend of the bakes of the keyframes on either side.
+#
+# Keyframes are `interval` frames apart, starting at the first frame of
+# `frame_range`.  If the bakes of two consecutive keyframes differ by more
+# than `threshold` percent (see `image_utils.relative_error()`), blending
+# between them would drift too far from the real lighting, so the frame
+# halfway between them is baked as well.
+class KeyframeSchedule:
+    def __init__(self, frame_range, interval, threshold):
+        self.frame_range = frame_range
+        self.interval = interval
+        self.threshold = threshold
+
+        # `(frame, pixels)` of the keyframe whose segment is next to be
+        # rendered.
+        self.key_frame = None
+        # Baked keyframes past `key_frame`, as a frame -> pixels dict.
+        self.future_keys = {}
+        # Frames to render next, as `(frame, pixels_a, pixels_b, factor)`
+        # tuples.
+        self.render_queue = []
+        # The frame to bake next, or None once everything is baked.
+        self.next_bake_frame = frame_range[0]
+
+    # Takes the bake of keyframe `frame`, and queues up the frames that can
+    # be rendered as a result, or decides which frame to bake next.
+    def keyframe_baked(self, frame, pixels):
+        if self.key_frame != None:
+            key_a, pixels_a = self.key_frame
+            if frame - key_a > 1:
+                difference, _ = relative_error(pixels_a, pixels)
+                if difference * 100.0 > self.threshold:
+                    print("Compify frame {}: bakes of frames {} and {} differ by {:.2f}%, baking in between".format(
+                        frame,
+                        key_a,
+                        frame,
+                        difference * 100.0,
+                    ))
+                    self.future_keys[frame] = pixels
+                    self.next_bake_frame = key_a + (frame - key_a) // 2
+                    return
+            for f in range(key_a, frame):
+                self.render_queue.append((f, pixels_a, pixels, (f - key_a) / (frame - key_a)))
+        self.key_frame = (frame, pixels)
+
+        # Figure out what comes after this keyframe.
+        if frame >= self.frame_range[1]:
+            self.render_queue.append((frame, pixels, pixels, 0.0))
+            self.next_bake_frame = None
+        elif len(self.future_keys) > 0:
+            next_frame = min(self.future_keys.keys())
+            self.keyframe_baked(next_frame, self.future_keys.pop(next_frame))
+        else:
+            self.next_bake_frame = min(frame + self.interval, self.frame_range[1])
+
+    # Takes the next frame to render off the render queue, skipping any in
+    # `skip_frames`.
+    #
+    # Returns a `(frame, pixels)` tuple of the frame and its blended
+    # lighting, or None if the queue is empty.
+    def next_render(self, skip_frames):
+        while len(self.render_queue) > 0 and self.render_queue[0][0] in skip_frames:
+            self.render_queue.pop(0)
+        if len(self.render_queue) == 0:
+            return None
+        frame, pixels_a, pixels_b, factor = self.render_queue.pop(0)
+        if factor == 0.0:
+            return (frame, pixels_a)
+        return (frame, pixels_a + (pixels_b - pixels_a) * np.float32(factor))
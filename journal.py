@@ -0,0 +1,100 @@
+import json
+import os
+import time
+
+from .image_utils import render_output_path, saved_image_ok
+
+# Appended to the scene's output path to get the render journal's path.
+JOURNAL_SUFFIX = "compify_journal.json"
+
+
+# Gets the path of the render journal for renders saved to `output_path`
+# (the scene's output path, made absolute).  Renders of part of the frame
+# range that run alongside each other (e.g. farm chunks) each get their
+# own journal, by passing their `frame_range`.
+def journal_path(output_path, frame_range=None):
+    if frame_range == None:
+        return output_path + JOURNAL_SUFFIX
+    return "{}{}-{}_{}".format(output_path, frame_range[0], frame_range[1], JOURNAL_SUFFIX)
+
+
+# Keeps track of which frames of a Compify render have been completed, in
+# a small JSON file next to the rendered frames, so that an interrupted
+# render can be resumed.
+#
+# The frame currently being rendered is recorded as well: if Blender
+# crashes while saving it, its file may exist but be incomplete, so it's
+# never trusted on resume.
+class RenderJournal:
+    # `path` is where the journal is kept (see `journal_path()`),
+    # `frame_range` is the (inclusive) range of frames being rendered, and
+    # `blend_file` is only recorded in it for reference.
+    def __init__(self, path, frame_range, blend_file):
+        self.path = path
+        self.completed = set()
+        self.in_progress = None
+        self.is_loaded = False
+        self.frame_range = frame_range
+        self.blend_file = blend_file
+
+    # Loads the journal from disk, if there is one.
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.completed = set(data.get("completed", []))
+            self.in_progress = data.get("in_progress")
+            self.is_loaded = True
+        except (OSError, ValueError):
+            self.completed = set()
+            self.in_progress = None
+            self.is_loaded = False
+
+    def save(self):
+        data = {
+            "blend_file": self.blend_file,
+            "frame_start": self.frame_range[0],
+            "frame_end": self.frame_range[1],
+            "completed": sorted(self.completed),
+            "in_progress": self.in_progress,
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        # Write to a temporary file first, so that a crash never leaves a
+        # half-written journal.
+        directory = os.path.dirname(self.path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(temp_path, self.path)
+
+    def frame_started(self, frame):
+        self.in_progress = frame
+        self.save()
+
+    def frame_completed(self, frame):
+        self.completed.add(frame)
+        if self.in_progress == frame:
+            self.in_progress = None
+        self.save()
+
+    # Gets the frames in the journal's frame range that are already
+    # rendered and can be skipped.
+    #
+    # If the journal was loaded, those are its completed frames whose
+    # output file still exists and looks valid.  Otherwise (e.g. the frames
+    # were rendered without Compify) any frame whose output file exists and
+    # looks valid is taken as rendered.  Either way, the frame that was in
+    # progress when the journal was last written never is.
+    def existing_frames(self, scene):
+        file_format = scene.render.image_settings.file_format
+        existing = set()
+        for frame in range(self.frame_range[0], self.frame_range[1] + 1):
+            if frame == self.in_progress:
+                continue
+            if self.is_loaded and frame not in self.completed:
+                continue
+            if saved_image_ok(render_output_path(scene, frame), file_format):
+                existing.add(frame)
+        return existing
@@ -0,0 +1,124 @@
+import hashlib
+
+import numpy as np
+
+from .camera_utils import bounding_box_corners
+
+# Working out what changed between two sets of bake input states (see
+# `bake_cache.bake_input_states()`), and which proxies' lighting that
+# affects.  None of this needs Blender's data beyond the proxies' bounds.
+
+
+# Hashes bake input states (from `bake_cache.bake_input_states()`) into
+# a key for the bake cache.
+def bake_input_hash(states):
+    h = hashlib.sha1()
+    h.update(repr(sorted(states.items())).encode())
+    return h.hexdigest()
+
+
+# Compares two sets of bake input states (from
+# `bake_cache.bake_input_states()`).
+#
+# Returns a sorted list of the names of the inputs that differ, including
+# ones that were added or removed.
+def changed_bake_inputs(previous, current):
+    changed = []
+    for name in set(previous.keys()) | set(current.keys()):
+        if previous.get(name) != current.get(name):
+            changed.append(name)
+    return sorted(changed)
+
+
+# Gets the world space sphere, as a `(center, radius)` tuple, within which
+# a light influences the lighting, given its state from
+# `bake_cache.object_state()`.  A light's Custom Distance is taken as its
+# range.
+#
+# Returns None if the light may influence everything.
+def light_influence(state):
+    properties = dict(state[1])
+    if not properties.get("use_custom_distance", False):
+        return None
+    matrix = state[0]
+    center = np.array([matrix[0][3], matrix[1][3], matrix[2][3]])
+    return (center, properties["cutoff_distance"])
+
+
+# Checks whether a proxy with the given world space bounds (`low` and
+# `high` corners) may be affected by the changes between two sets of
+# bake input states.
+#
+# Changes to lights with a Custom Distance only affect the proxies within
+# that distance of the light (before or after the change).  Any other
+# change is assumed to affect every proxy, since e.g. a moved proxy can
+# shadow or bounce light onto any other.
+def proxy_affected(changed, previous, current, low, high):
+    for name in changed:
+        if name == "Visible Proxies":
+            continue
+        if not name.startswith("Light "):
+            return True
+        for state in [previous.get(name), current.get(name)]:
+            if state == None:
+                continue
+            influence = light_influence(state)
+            if influence == None:
+                return True
+            center, radius = influence
+            if np.linalg.norm(center - np.clip(center, low, high)) <= radius:
+                return True
+    return False
+
+
+# Keeps track of the bake input states that each proxy's area of the bake
+# image was last baked with, so that only the proxies whose lighting is
+# actually affected by a change need rebaking.
+class ProxyBakeTracker:
+    def __init__(self):
+        self.baked_states = {}
+
+    # Gets which of `proxies` need (re)baking for the bake input states
+    # `states`.  Proxies that were never baked always do.
+    def dirty_proxies(self, proxies, states):
+        proxies = list(proxies)
+        if len(proxies) == 0:
+            return []
+        corners = bounding_box_corners(proxies)
+
+        dirty = []
+        for obj, box in zip(proxies, corners):
+            previous = self.baked_states.get(obj.name)
+            if previous == None:
+                dirty.append(obj)
+                continue
+            changed = changed_bake_inputs(previous, states)
+            if proxy_affected(changed, previous, states, box.min(axis=0), box.max(axis=0)):
+                dirty.append(obj)
+        return dirty
+
+    # Records that `proxies` were baked with the bake input states
+    # `states`.
+    def record(self, proxies, states):
+        for obj in proxies:
+            self.baked_states[obj.name] = states
+
+
+# Decides whether the lighting baked with the bake input states
+# `last_states` (None if there isn't any) is still valid for the bake
+# input states `states`, and explains why (not).  With `skip_unchanged`
+# False, the lighting is never considered valid.
+#
+# Returns a `(skip, reason)` tuple.
+def bake_reason(last_states, states, skip_unchanged):
+    if last_states == None:
+        return (False, "first frame")
+    if not skip_unchanged:
+        return (False, "skipping unchanged frames is disabled")
+
+    changed = changed_bake_inputs(last_states, states)
+    if len(changed) == 0:
+        return (True, "no lighting inputs changed")
+    if len(changed) > 5:
+        changed = changed[:5] + ["{} more".format(len(changed) - 5)]
+    return (False, "changed: " + ", ".join(changed))
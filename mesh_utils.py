@@ -0,0 +1,56 @@
+import hashlib
+
+import numpy as np
+
+# Maximum number of vertex positions sampled into a mesh fingerprint.
+FINGERPRINT_SAMPLES = 4096
+
+
+# Computes a fingerprint string for a mesh, for cheaply detecting whether
+# it has changed.
+#
+# The fingerprint covers the element counts, an evenly strided sample of
+# vertex positions, and the sum of all vertex positions.  `extra` is any
+# additional hashable data that should invalidate the fingerprint when it
+# changes (e.g. settings the mesh was processed with).
+def mesh_fingerprint(mesh, extra=()):
+    counts = (len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons))
+
+    h = hashlib.sha1()
+    h.update(repr((counts, tuple(extra))).encode())
+
+    if counts[0] > 0:
+        co = np.empty(counts[0] * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        co = co.reshape(-1, 3)
+        stride = max(1, counts[0] // FINGERPRINT_SAMPLES)
+        h.update(co[::stride].tobytes())
+        h.update(co.sum(axis=0, dtype=np.float64).tobytes())
+
+    return h.hexdigest()
+
+
+# Computes the world space surface area of each of the given mesh
+# objects, reading polygon areas in bulk.
+#
+# Non-uniform object scaling is approximated by the volume scale of the
+# object's transform.
+#
+# Returns a float array with one entry per object.
+def world_surface_areas(mesh_objects):
+    mesh_objects = list(mesh_objects)
+    areas = np.zeros(len(mesh_objects), dtype=np.float64)
+
+    max_polygons = max((len(obj.data.polygons) for obj in mesh_objects), default=0)
+    buffer = np.empty(max_polygons, dtype=np.float32)
+
+    for i, obj in enumerate(mesh_objects):
+        polygon_count = len(obj.data.polygons)
+        if polygon_count == 0:
+            continue
+        polygon_areas = buffer[:polygon_count]
+        obj.data.polygons.foreach_get("area", polygon_areas)
+        scale = abs(np.linalg.det(np.array(obj.matrix_world.to_3x3())))
+        areas[i] = polygon_areas.sum(dtype=np.float64) * scale ** (2.0 / 3.0)
+
+    return areas
@@ -1,7 +1,39 @@
 MAIN_NODE_NAME = "Compify Footage"
 BAKE_IMAGE_NODE_NAME = "Baked Lighting"
+LIGHTING_DECODE_NODE_NAME = "Lighting Decode"
+VERTEX_PROJECTION_NODE_NAME = "Vertex Projection"
 UV_LAYER_NAME = 'Compify Baked Lighting'
 
+# Point attribute on proxy meshes holding their per-vertex footage
+# projection, when vertex projection is enabled.
+PROJECTION_ATTRIBUTE_NAME = "compify_projection"
+
+# Custom property on proxy meshes storing their fingerprint as of the
+# last time Prep Scene unwrapped them.
+PREP_FINGERPRINT_PROP = "compify_prep_fingerprint"
+
+# Custom property on proxy meshes storing the bake resolution that Prep
+# Scene last laid out their UV island margins for.
+PREP_RESOLUTION_PROP = "compify_prep_resolution"
+
+# Custom property on proxy meshes storing a hash of the UV layout that
+# Prep Scene last left them with, which changes whenever their islands
+# are moved, including by repacking without re-unwrapping.
+PREP_LAYOUT_PROP = "compify_prep_layout"
+
+# Custom property on proxy meshes storing the prep layout hash their
+# lighting was last baked with.
+BAKE_FINGERPRINT_PROP = "compify_bake_fingerprint"
+
+# Custom property on proxy meshes storing the (zero-based) UDIM tile
+# that Prep Scene placed them on.
+UDIM_TILE_PROP = "compify_udim_tile"
+
+# Custom properties on node groups built by Compify, storing the version
+# of the builder that built them and a hash of what they were built from.
+GROUP_VERSION_PROP = "compify_group_version"
+GROUP_INPUTS_PROP = "compify_group_inputs"
+
 # Gets the Compify Material name for the active scene.
 def compify_mat_name(context):
     return "Compify Footage | " + context.scene.name
@@ -10,3 +42,9 @@ def compify_mat_name(context):
 # Gets the Compify baked lighting image name for the active scene.
 def compify_baked_texture_name(context):
     return "Compify Bake | " + context.scene.name
+
+
+# Gets the Compify reduced-precision baked lighting image name for the
+# active scene.
+def compify_encoded_texture_name(context):
+    return "Compify Bake Encoded | " + context.scene.name
@@ -0,0 +1,298 @@
+import math
+
+import bpy
+import numpy as np
+
+# Builds node trees from compact declarative specs, and updates existing
+# trees to match a spec by applying only what differs.
+#
+# A spec is a dict with:
+#
+# - "inputs" and "outputs" (node groups only): the group's interface
+#   sockets, as `(name, socket_type, properties)` tuples.  An optional
+#   fourth dict holds properties that are only set when the socket is
+#   first created, so as not to override later user edits.
+# - "nodes": `(name, type, properties)` tuples.  The node names are what
+#   nodes in an existing tree are matched by.  The properties are node
+#   attributes (label, location, operation, ...) plus these special keys:
+#   - "parent": the name of the frame node to put the node in.
+#   - "inputs": a dict of input socket (name or index) default values.
+#   - "outputs": a dict of output socket default values (e.g. of Value
+#     nodes).
+#   - "show_outputs": hide all output sockets except the named ones.
+#   - "hide_sockets": hide all sockets.
+#   - "driver": an `(id_type, id, data_path)` tuple to drive the node's
+#     first output's value with a single property driver.
+#   - "animation": an F-Curve whose keyframes are copied to animate the
+#     node's first output's value.  Unlike a driver, this doesn't make the
+#     tree depend on the F-Curve's owner.
+# - "links": `(from_node, from_socket, to_node, to_socket)` tuples, with
+#   sockets given by name or index.
+SPECIAL_NODE_KEYS = {"parent", "inputs", "outputs", "show_outputs", "hide_sockets", "driver", "animation"}
+
+
+# Compares an RNA property value with a spec value, with a little slack
+# for floats (which RNA stores in single precision).
+def values_equal(a, b):
+    if hasattr(a, "__len__") and not isinstance(a, str):
+        return len(a) == len(b) and all(values_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1.0e-6, abs_tol=1.0e-9)
+    return a == b
+
+
+# Sets `data.attr` to `value` if it isn't already.  Returns the number of
+# changes made (0 or 1).
+def set_if_changed(data, attr, value):
+    if values_equal(getattr(data, attr), value):
+        return 0
+    setattr(data, attr, value)
+    return 1
+
+
+# Gets the interface socket of a node group with the given name, type,
+# and direction, creating it if there isn't one.  An existing socket of
+# the same name but a different type is replaced.
+#
+# Returns a `(socket, created)` tuple.
+def interface_socket(tree, name, socket_type, in_out):
+    for item in tree.interface.items_tree:
+        if item.item_type == 'SOCKET' and item.in_out == in_out and item.name == name:
+            if item.socket_type == socket_type:
+                return (item, False)
+            tree.interface.remove(item)
+            break
+    return (tree.interface.new_socket(name=name, socket_type=socket_type, in_out=in_out), True)
+
+
+def apply_interface_spec(tree, spec):
+    changes = 0
+    wanted = set()
+    for in_out, key in [('INPUT', "inputs"), ('OUTPUT', "outputs")]:
+        for entry in spec.get(key, []):
+            name, socket_type, properties = entry[:3]
+            wanted.add((in_out, name))
+            socket, created = interface_socket(tree, name, socket_type, in_out)
+            changes += created
+            for attr, value in properties.items():
+                changes += set_if_changed(socket, attr, value)
+            if created and len(entry) > 3:
+                for attr, value in entry[3].items():
+                    setattr(socket, attr, value)
+
+    for item in list(tree.interface.items_tree):
+        if item.item_type == 'SOCKET' and (item.in_out, item.name) not in wanted:
+            tree.interface.remove(item)
+            changes += 1
+    return changes
+
+
+def apply_node_properties(tree, node, properties):
+    changes = 0
+
+    parent = properties.get("parent")
+    parent = tree.nodes[parent] if parent != None else None
+    if node.parent != parent:
+        node.parent = parent
+        changes += 1
+
+    for attr, value in properties.items():
+        if attr not in SPECIAL_NODE_KEYS:
+            changes += set_if_changed(node, attr, value)
+
+    for ref, value in properties.get("inputs", {}).items():
+        changes += set_if_changed(node.inputs[ref], "default_value", value)
+    for ref, value in properties.get("outputs", {}).items():
+        changes += set_if_changed(node.outputs[ref], "default_value", value)
+
+    hide_all = properties.get("hide_sockets", False)
+    shown = properties.get("show_outputs")
+    if hide_all or shown != None:
+        for socket in node.outputs:
+            changes += set_if_changed(socket, "hide", hide_all or socket.name not in shown)
+    if hide_all:
+        for socket in node.inputs:
+            changes += set_if_changed(socket, "hide", True)
+
+    return changes
+
+
+def apply_nodes_spec(tree, spec):
+    changes = 0
+    wanted = {name: node_type for name, node_type, _ in spec["nodes"]}
+
+    # Remove nodes that aren't in the spec (or have the wrong type) before
+    # creating any, so their names are free.
+    for node in list(tree.nodes):
+        if wanted.get(node.name) != node.bl_idname:
+            tree.nodes.remove(node)
+            changes += 1
+
+    for name, node_type, _ in spec["nodes"]:
+        if name not in tree.nodes:
+            node = tree.nodes.new(type=node_type)
+            node.name = name
+            changes += 1
+
+    # Configure in a second pass, once all the frames exist.
+    for name, _, properties in spec["nodes"]:
+        changes += apply_node_properties(tree, tree.nodes[name], properties)
+
+    return changes
+
+
+def driver_matches(driver, target):
+    id_type, id, data_path = target
+    if driver.type != 'SUM' or len(driver.variables) != 1:
+        return False
+    var = driver.variables[0]
+    return var.type == 'SINGLE_PROP' \
+        and var.targets[0].id_type == id_type \
+        and var.targets[0].id == id \
+        and var.targets[0].data_path == data_path
+
+
+def apply_drivers_spec(tree, spec):
+    changes = 0
+    wanted = {}
+    for name, _, properties in spec["nodes"]:
+        if "driver" in properties:
+            wanted['nodes["{}"].outputs[0].default_value'.format(name)] = (name, properties["driver"])
+
+    if tree.animation_data != None:
+        for fcurve in list(tree.animation_data.drivers):
+            name, target = wanted.get(fcurve.data_path, (None, None))
+            if target == None or not driver_matches(fcurve.driver, target):
+                tree.animation_data.drivers.remove(fcurve)
+                changes += 1
+
+    for data_path, (name, target) in wanted.items():
+        if tree.animation_data != None and tree.animation_data.drivers.find(data_path) != None:
+            continue
+        id_type, id, prop = target
+        driver = tree.nodes[name].outputs[0].driver_add("default_value").driver
+        driver.type = 'SUM'
+        var = driver.variables.new()
+        var.type = 'SINGLE_PROP'
+        var.targets[0].id_type = id_type
+        var.targets[0].id = id
+        var.targets[0].data_path = prop
+        changes += 1
+
+    return changes
+
+
+# Gets the keyframes of an F-Curve (and its extrapolation) as a hashable
+# value, to tell whether two F-Curves animate the same way.
+def keyframes_state(fcurve):
+    points = fcurve.keyframe_points
+    state = [fcurve.extrapolation]
+    for attr in ["co", "handle_left", "handle_right"]:
+        values = np.empty(len(points) * 2, dtype=np.float32)
+        points.foreach_get(attr, values)
+        state.append(values.tobytes())
+    for attr in ["interpolation", "easing", "handle_left_type", "handle_right_type"]:
+        state.append(tuple(getattr(point, attr) for point in points))
+    return tuple(state)
+
+
+# Copies the keyframes of F-Curve `source` into the empty F-Curve `target`.
+def copy_keyframes(source, target):
+    count = len(source.keyframe_points)
+    target.keyframe_points.add(count)
+
+    co = np.empty(count * 2, dtype=np.float32)
+    source.keyframe_points.foreach_get("co", co)
+    target.keyframe_points.foreach_set("co", co)
+
+    # Set the handle types before the handles themselves, so that setting
+    # them doesn't recalculate the handles.
+    for source_point, target_point in zip(source.keyframe_points, target.keyframe_points):
+        target_point.interpolation = source_point.interpolation
+        target_point.easing = source_point.easing
+        target_point.handle_left_type = source_point.handle_left_type
+        target_point.handle_right_type = source_point.handle_right_type
+
+    for attr in ["handle_left", "handle_right"]:
+        handles = np.empty(count * 2, dtype=np.float32)
+        source.keyframe_points.foreach_get(attr, handles)
+        target.keyframe_points.foreach_set(attr, handles)
+
+    target.extrapolation = source.extrapolation
+    target.update()
+
+
+def apply_animation_spec(tree, spec):
+    changes = 0
+    wanted = {}
+    for name, _, properties in spec["nodes"]:
+        if "animation" in properties:
+            wanted['nodes["{}"].outputs[0].default_value'.format(name)] = properties["animation"]
+
+    action = tree.animation_data.action if tree.animation_data != None else None
+    if action != None:
+        for fcurve in list(action.fcurves):
+            source = wanted.get(fcurve.data_path)
+            if source == None or keyframes_state(fcurve) != keyframes_state(source):
+                action.fcurves.remove(fcurve)
+                changes += 1
+
+    if len(wanted) == 0:
+        return changes
+
+    if tree.animation_data == None:
+        tree.animation_data_create()
+    if tree.animation_data.action == None:
+        tree.animation_data.action = bpy.data.actions.new(tree.name)
+    action = tree.animation_data.action
+    for data_path, source in wanted.items():
+        if action.fcurves.find(data_path) == None:
+            copy_keyframes(source, action.fcurves.new(data_path))
+            changes += 1
+
+    return changes
+
+
+def link_key(from_socket, to_socket):
+    return (from_socket.node.name, from_socket.identifier, to_socket.node.name, to_socket.identifier)
+
+
+def apply_links_spec(tree, spec):
+    changes = 0
+    wanted = {}
+    for from_name, from_ref, to_name, to_ref in spec["links"]:
+        from_socket = tree.nodes[from_name].outputs[from_ref]
+        to_socket = tree.nodes[to_name].inputs[to_ref]
+        wanted[link_key(from_socket, to_socket)] = (from_socket, to_socket)
+
+    existing = set()
+    for link in list(tree.links):
+        key = link_key(link.from_socket, link.to_socket)
+        if key in wanted:
+            existing.add(key)
+        else:
+            tree.links.remove(link)
+            changes += 1
+
+    for key, (from_socket, to_socket) in wanted.items():
+        if key not in existing:
+            tree.links.new(from_socket, to_socket)
+            changes += 1
+
+    return changes
+
+
+# Makes a node tree match a spec (see the top of this file), creating,
+# changing, and removing only what differs, so that a tree that already
+# matches is left untouched.
+#
+# Returns the number of changes made.
+def apply_node_spec(tree, spec):
+    changes = 0
+    if "inputs" in spec or "outputs" in spec:
+        changes += apply_interface_spec(tree, spec)
+    changes += apply_nodes_spec(tree, spec)
+    changes += apply_drivers_spec(tree, spec)
+    changes += apply_animation_spec(tree, spec)
+    changes += apply_links_spec(tree, spec)
+    return changes
@@ -1,442 +1,479 @@
 import bpy
+import hashlib
 import math
 
-def hide_sockets(node):
-    for input in node.inputs:
-        input.hide = True
-    for output in node.outputs:
-        output.hide = True
+from .names import GROUP_VERSION_PROP, GROUP_INPUTS_PROP, PROJECTION_ATTRIBUTE_NAME
+from .node_graph import apply_node_spec, keyframes_state
+
+# Versions of the node group builders below.  Bump a builder's version
+# whenever it changes what it builds, so that groups in existing .blend
+# files get rebuilt.
+FOOTAGE_GROUP_VERSION = 2
+FEATHERED_SQUARE_GROUP_VERSION = 2
+CAMERA_PROJECT_GROUP_VERSION = 3
+LIGHTING_DECODE_GROUP_VERSION = 2
+VERTEX_PROJECTION_GROUP_VERSION = 1
+FOOTAGE_RENDER_GROUP_VERSION = 1
+
+
+# Hashes the things a node group is built from into a string to stamp on
+# the group.
+def group_inputs_hash(*inputs):
+    return hashlib.sha1(repr(inputs).encode()).hexdigest()
+
+
+# Gets the named node group if it was built by builder version `version`
+# from inputs with the hash `inputs_hash`, or None if it doesn't exist or
+# is out of date.
+def current_group(name, version, inputs_hash=""):
+    group = bpy.data.node_groups.get(name)
+    if group != None \
+    and group.get(GROUP_VERSION_PROP) == version \
+    and group.get(GROUP_INPUTS_PROP) == inputs_hash:
+        return group
+    return None
+
+
+# Builds the named node group from a node spec (see `node_graph.py`), and
+# stamps it with its builder version and inputs hash so that
+# `current_group()` finds it up to date.
+#
+# An existing group is updated in place rather than replaced, so that the
+# materials using it stay linked to it, and only the parts that differ
+# from the spec are changed.
+def build_group(name, spec, version, inputs_hash=""):
+    group = bpy.data.node_groups.get(name)
+    if group == None:
+        group = bpy.data.node_groups.new(name, type='ShaderNodeTree')
+    apply_node_spec(group, spec)
+    group[GROUP_VERSION_PROP] = version
+    group[GROUP_INPUTS_PROP] = inputs_hash
+    return group
+
+
+# Properties of 0-1 float interface sockets.
+def unit_float(default):
+    return {"default_value": default, "min_value": 0.0, "max_value": 1.0}
+
+
+#========================================================
+# Compify Footage.
+
+FOOTAGE_GROUP_SPEC = {
+    "inputs": [
+        ("Footage", 'NodeSocketColor', {"default_value": (1.0, 0.0, 1.0, 1.0), "hide_value": True}),
+        ("Footage Alpha", 'NodeSocketFloat', unit_float(1.0)),
+        ("Footage Emit", 'NodeSocketFloat', unit_float(0.0)),
+        ("Background", 'NodeSocketColor', {"default_value": (1.0, 0.0, 1.0, 1.0), "hide_value": True}),
+        ("Background Alpha", 'NodeSocketFloat', unit_float(0.0)),
+        ("Background Emit", 'NodeSocketFloat', unit_float(0.0)),
+        ("Baked Lighting", 'NodeSocketColor', {"default_value": (1.0, 1.0, 1.0, 1.0), "hide_value": True}),
+        ("Do Bake", 'NodeSocketFloat', unit_float(0.0)),
+        ("Debug", 'NodeSocketFloat', unit_float(0.0)),
+    ],
+    "outputs": [
+        ("Shader", 'NodeSocketShader', {}),
+    ],
+
+    "nodes": [
+        #-------------------
+        # Footage nodes.
+        ("footage_frame", 'NodeFrame', {"label": "Footage"}),
+        ("footage_input", 'NodeGroupInput', {
+            "label": "Footage Input", "parent": "footage_frame", "location": (200.0, -330.0),
+            "show_outputs": ["Footage", "Footage Emit", "Baked Lighting", "Do Bake"],
+        }),
+        ("footage_delight", 'ShaderNodeMixRGB', {
+            "label": "Footage Delight", "parent": "footage_frame", "location": (400.0, -330.0),
+            "blend_type": 'DIVIDE', "use_clamp": False, "inputs": {0: 1.0},
+        }),
+        ("footage_debug", 'ShaderNodeMath', {
+            "label": "Footage Debug", "parent": "footage_frame", "location": (400.0, -280.0),
+            "operation": 'MAXIMUM', "use_clamp": True, "hide": True,
+        }),
+        ("footage_1", 'ShaderNodeBsdfDiffuse', {
+            "label": "Footage 1", "parent": "footage_frame", "location": (600.0, -330.0),
+            "hide": True, "inputs": {'Roughness': 0.0},
+        }),
+        ("footage_2", 'ShaderNodeMixShader', {
+            "label": "Footage 2", "parent": "footage_frame", "location": (800.0, -330.0),
+        }),
+
+        #-------------------
+        # Background nodes.
+        ("background_frame", 'NodeFrame', {"label": "Background"}),
+        ("background_input", 'NodeGroupInput', {
+            "label": "Background Input", "parent": "background_frame", "location": (0.0, 0.0),
+            "show_outputs": ["Background", "Background Alpha", "Background Emit", "Baked Lighting", "Do Bake"],
+        }),
+        ("background_delight", 'ShaderNodeMixRGB', {
+            "label": "Background Delight", "parent": "background_frame", "location": (200.0, 0.0),
+            "blend_type": 'DIVIDE', "use_clamp": False, "inputs": {0: 1.0},
+        }),
+        ("background_debug", 'ShaderNodeMath', {
+            "label": "Background Debug", "parent": "background_frame", "location": (200.0, 80.0),
+            "operation": 'MAXIMUM', "use_clamp": True, "hide": True,
+        }),
+        ("background_1", 'ShaderNodeBsdfDiffuse', {
+            "label": "Background 1", "parent": "background_frame", "location": (400.0, 30.0),
+            "hide": True, "inputs": {'Roughness': 0.0},
+        }),
+        ("background_transparent", 'ShaderNodeBsdfTransparent', {
+            "label": "Background Transparent", "parent": "background_frame", "location": (600.0, -80.0),
+            "inputs": {'Color': (1.0, 1.0, 1.0, 1.0)},
+        }),
+        ("background_2", 'ShaderNodeMixShader', {
+            "label": "Background 2", "parent": "background_frame", "location": (600.0, 100.0),
+        }),
+        ("background_3", 'ShaderNodeMixShader', {
+            "label": "Background 3", "parent": "background_frame", "location": (800.0, 0.0),
+        }),
+
+        #-------------------
+        # Camera Ray nodes.
+        ("camera_ray_frame", 'NodeFrame', {"label": "Camera Ray"}),
+        ("camera_input", 'NodeGroupInput', {
+            "label": "Camera Input", "parent": "camera_ray_frame", "location": (400.0, 260.0),
+            "show_outputs": ["Debug"],
+        }),
+        ("light_path", 'ShaderNodeLightPath', {
+            "label": "Light Path", "parent": "camera_ray_frame", "location": (600.0, 260.0),
+            "show_outputs": ["Is Camera Ray"],
+        }),
+        ("debug_invert", 'ShaderNodeMath', {
+            "label": "Debug Invert", "parent": "camera_ray_frame", "location": (600.0, 310.0),
+            "operation": 'MULTIPLY_ADD', "use_clamp": True, "hide": True,
+            "inputs": {1: -1.0, 2: 1.0},
+        }),
+        ("camera_ray", 'ShaderNodeMath', {
+            "label": "Camera Ray", "parent": "camera_ray_frame", "location": (800.0, 260.0),
+            "operation": 'MINIMUM', "use_clamp": True, "hide": True,
+        }),
+
+        #---------------
+        # Baking nodes.
+        ("baking_frame", 'NodeFrame', {"label": "Baking"}),
+        ("baking_input", 'NodeGroupInput', {
+            "label": "Baking Input", "parent": "baking_frame", "location": (1050.0, 560.0),
+            "show_outputs": ["Footage", "Background", "Background Alpha", "Footage Alpha"],
+        }),
+        ("baking_transparent", 'ShaderNodeBsdfTransparent', {
+            "label": "Baking Transparent", "parent": "baking_frame", "location": (1050.0, 700.0),
+            "inputs": {'Color': (1.0, 1.0, 1.0, 1.0)},
+        }),
+        ("baking_diffuse", 'ShaderNodeBsdfDiffuse', {
+            "label": "Baking Diffuse", "parent": "baking_frame", "location": (1450.0, 560.0),
+            "inputs": {'Color': (1.0, 1.0, 1.0, 1.0), 'Roughness': 0.0},
+        }),
+        ("baking_1", 'ShaderNodeMixShader', {
+            "label": "Baking 1", "parent": "baking_frame", "location": (1250.0, 700.0),
+        }),
+        ("baking_2", 'ShaderNodeMixShader', {
+            "label": "Baking 2", "parent": "baking_frame", "location": (1450.0, 700.0),
+        }),
+        ("baking_3", 'ShaderNodeMixShader', {
+            "label": "Baking 3", "parent": "baking_frame", "location": (1650.0, 700.0),
+        }),
+
+        #----------------------
+        # The remaining nodes.
+        ("mix_input", 'NodeGroupInput', {
+            "label": "Mix Input", "location": (1200.0, 300.0),
+            "show_outputs": ["Footage Alpha", "Do Bake"],
+        }),
+        ("background_mask", 'ShaderNodeMixShader', {
+            "label": "Background Mask", "location": (1400.0, 100.0),
+        }),
+        ("backfacing1_geo", 'ShaderNodeNewGeometry', {
+            "location": (1400.0, -150.0), "hide_sockets": True,
+        }),
+        ("backfacing1_shader", 'ShaderNodeBsdfTransparent', {
+            "location": (1400.0, -250.0),
+        }),
+        ("backfacing1_mask", 'ShaderNodeMixShader', {
+            "label": "Backfacing Mask", "location": (1600.0, -150.0),
+        }),
+        ("camera_switch", 'ShaderNodeMixShader', {
+            "label": "Camera Switch", "location": (1800.0, 100.0),
+        }),
+        ("backfacing2_geo", 'ShaderNodeNewGeometry', {
+            "location": (1850.0, 600.0), "hide_sockets": True,
+        }),
+        ("backfacing2_shader", 'ShaderNodeBsdfTransparent', {
+            "location": (1850.0, 500.0),
+        }),
+        ("backfacing2_mask", 'ShaderNodeMixShader', {
+            "label": "Backfacing Mask", "location": (2050.0, 600.0),
+        }),
+        ("bake_switch", 'ShaderNodeMixShader', {
+            "label": "Bake Switch", "location": (2250.0, 300.0),
+        }),
+        ("output", 'NodeGroupOutput', {
+            "location": (2450.0, 300.0),
+        }),
+    ],
+
+    "links": [
+        # Footage nodes.
+        ("footage_input", 'Footage', "footage_delight", 'Color1'),
+        ("footage_input", 'Footage', "footage_2", 2),
+        ("footage_input", 'Footage Emit', "footage_debug", 0),
+        ("footage_input", 'Baked Lighting', "footage_delight", 'Color2'),
+        ("footage_input", 'Do Bake', "footage_debug", 1),
+        ("footage_delight", 'Color', "footage_1", 'Color'),
+        ("footage_1", 'BSDF', "footage_2", 1),
+        ("footage_debug", 'Value', "footage_2", 'Fac'),
+
+        # Background nodes.
+        ("background_input", 'Background', "background_delight", 'Color1'),
+        ("background_input", 'Background', "background_2", 2),
+        ("background_input", 'Background Alpha', "background_3", 'Fac'),
+        ("background_input", 'Background Emit', "background_debug", 0),
+        ("background_input", 'Baked Lighting', "background_delight", 'Color2'),
+        ("background_input", 'Do Bake', "background_debug", 1),
+        ("background_delight", 'Color', "background_1", 'Color'),
+        ("background_1", 'BSDF', "background_2", 1),
+        ("background_debug", 'Value', "background_2", 'Fac'),
+        ("background_transparent", 'BSDF', "background_3", 1),
+        ("background_2", 'Shader', "background_3", 2),
+
+        # Camera Ray nodes.
+        ("camera_input", 'Debug', "debug_invert", 'Value'),
+        ("light_path", 'Is Camera Ray', "camera_ray", 0),
+        ("debug_invert", 'Value', "camera_ray", 1),
+
+        # Baking nodes.
+        ("baking_transparent", 'BSDF', "baking_1", 1),
+        ("baking_input", 'Footage', "baking_2", 2),
+        ("baking_input", 'Background', "baking_1", 2),
+        ("baking_input", 'Background Alpha', "baking_1", 'Fac'),
+        ("baking_input", 'Footage Alpha', "baking_2", 'Fac'),
+        ("baking_1", 'Shader', "baking_2", 1),
+        ("baking_2", 'Shader', "baking_3", 1),
+        ("baking_diffuse", 'BSDF', "baking_3", 2),
+
+        # The remaining nodes.
+        ("mix_input", 'Footage Alpha', "background_mask", 'Fac'),
+        ("mix_input", 'Do Bake', "bake_switch", 'Fac'),
+        ("backfacing1_geo", 'Backfacing', "backfacing1_mask", 'Fac'),
+        ("background_mask", 'Shader', "backfacing1_mask", 1),
+        ("backfacing1_shader", 0, "backfacing1_mask", 2),
+        ("backfacing1_mask", 'Shader', "camera_switch", 1),
+        ("camera_switch", 'Shader', "bake_switch", 1),
+        ("bake_switch", 'Shader', "output", 'Shader'),
+        ("backfacing2_geo", 'Backfacing', "backfacing2_mask", 'Fac'),
+        ("backfacing2_shader", 0, "backfacing2_mask", 2),
+
+        # Final hook up of all the groups of nodes above.
+        ("camera_ray", 'Value', "baking_3", 'Fac'),
+        ("camera_ray", 'Value', "camera_switch", 'Fac'),
+        ("background_3", 'Shader', "background_mask", 1),
+        ("footage_2", 'Shader', "background_mask", 2),
+        ("footage_2", 'Shader', "camera_switch", 2),
+        ("baking_3", 'Shader', "backfacing2_mask", 1),
+        ("backfacing2_mask", 'Shader', "bake_switch", 2),
+    ],
+}
+
 
 # Ensures that the Compify Footage shader group exists.
 #
-# It will create it if it doesn't exist, and returns the group.
+# It will create it if it doesn't exist, rebuild it in place if it was
+# built by an older version of Compify, and returns the group.
 def ensure_footage_group():
     NAME = "Compify Footage"
-    if NAME in bpy.data.node_groups:
-        return bpy.data.node_groups[NAME]
-
-    # Create the group.
-    group = bpy.data.node_groups.new(NAME, type='ShaderNodeTree')
-    for node in group.nodes:
-        group.nodes.remove(node)
-
-    # Create the group inputs and outputs.
-    socket = group.interface.new_socket(name="Footage", socket_type='NodeSocketColor', in_out='INPUT')
-    socket.default_value = (1.0, 0.0, 1.0, 1.0)
-    socket.hide_value = True
-
-    socket = group.interface.new_socket(name="Footage Alpha", socket_type='NodeSocketFloat', in_out='INPUT')
-    socket.default_value = 1.0
-    socket.min_value = 0.0
-    socket.max_value = 1.0
-
-    socket = group.interface.new_socket(name="Footage Emit", socket_type='NodeSocketFloat', in_out='INPUT')
-    socket.default_value = 0.0
-    socket.min_value = 0.0
-    socket.max_value = 1.0
-
-    socket = group.interface.new_socket(name="Background", socket_type='NodeSocketColor', in_out='INPUT')
-    socket.default_value = (1.0, 0.0, 1.0, 1.0)
-    socket.hide_value = True
-
-    socket = group.interface.new_socket(name="Background Alpha", socket_type='NodeSocketFloat', in_out='INPUT')
-    socket.default_value = 0.0
-    socket.min_value = 0.0
-    socket.max_value = 1.0
-
-    socket = group.interface.new_socket(name="Background Emit", socket_type='NodeSocketFloat', in_out='INPUT')
-    socket.default_value = 0.0
-    socket.min_value = 0.0
-    socket.max_value = 1.0
-
-    socket = group.interface.new_socket(name="Baked Lighting", socket_type='NodeSocketColor', in_out='INPUT')
-    socket.default_value = (1.0, 1.0, 1.0, 1.0)
-    socket.hide_value = True
-
-    socket = group.interface.new_socket(name="Do Bake", socket_type='NodeSocketFloat', in_out='INPUT')
-    socket.default_value = 0.0
-    socket.min_value = 0.0
-    socket.max_value = 1.0
-
-    socket = group.interface.new_socket(name="Debug", socket_type='NodeSocketFloat', in_out='INPUT')
-    socket.default_value = 0.0
-    socket.min_value = 0.0
-    socket.max_value = 1.0
-
-    group.interface.new_socket(name="Shader", socket_type='NodeSocketShader', in_out='OUTPUT')
-
-    #-------------------
-    # Footage nodes.
-
-    # Create the nodes.
-    footage_frame = group.nodes.new(type='NodeFrame')
-    footage_input = group.nodes.new(type='NodeGroupInput')
-    footage_debug = group.nodes.new(type='ShaderNodeMath')
-    footage_delight = group.nodes.new(type='ShaderNodeMixRGB')
-    footage_1 = group.nodes.new(type='ShaderNodeBsdfDiffuse')
-    footage_2 = group.nodes.new(type='ShaderNodeMixShader')
-
-    # Label the nodes.
-    footage_frame.label = "Footage"
-    footage_input.label = "Footage Input"
-    footage_debug.label = "Footage Debug"
-    footage_delight.label = "Footage Delight"
-    footage_1.label = "Footage 1"
-    footage_2.label = "Footage 2"
-
-    # Put the nodes in their frame.
-    footage_input.parent = footage_frame
-    footage_debug.parent = footage_frame
-    footage_delight.parent = footage_frame
-    footage_1.parent = footage_frame
-    footage_2.parent = footage_frame
-
-    # Position the nodes.
-    hs = 200.0
-    x = 200.0
-    y = -330.0
-
-    footage_input.location = (x, y)
-    x += hs
-    footage_delight.location = (x, y)
-    footage_debug.location = (x, y + 50.0)
-    x += hs
-    footage_1.location = (x, y)
-    x += hs
-    footage_2.location = (x, y)
-
-    # Configure the nodes.
-    for socket in footage_input.outputs:
-        socket.hide = True
-    footage_input.outputs["Footage"].hide = False
-    footage_input.outputs["Footage Emit"].hide = False
-    footage_input.outputs["Baked Lighting"].hide = False
-    footage_input.outputs["Do Bake"].hide = False
-
-    footage_delight.blend_type = 'DIVIDE'
-    footage_delight.use_clamp = False
-    footage_delight.inputs[0].default_value = 1.0
-
-    footage_1.inputs['Roughness'].default_value = 0.0
-    footage_1.hide = True
-
-    footage_debug.operation = 'MAXIMUM'
-    footage_debug.use_clamp = True
-    footage_debug.hide = True
-
-    # Hook up the nodes.
-    group.links.new(footage_input.outputs['Footage'], footage_delight.inputs['Color1'])
-    group.links.new(footage_input.outputs['Footage'], footage_2.inputs[2])
-    group.links.new(footage_input.outputs['Footage Emit'], footage_debug.inputs[0])
-    group.links.new(footage_input.outputs['Baked Lighting'], footage_delight.inputs['Color2'])
-    group.links.new(footage_input.outputs['Do Bake'], footage_debug.inputs[1])
-    group.links.new(footage_delight.outputs['Color'], footage_1.inputs['Color'])
-    group.links.new(footage_1.outputs['BSDF'], footage_2.inputs[1])
-    group.links.new(footage_debug.outputs['Value'], footage_2.inputs['Fac'])
-
-    #-------------------
-    # Background nodes.
-
-    # Create the nodes.
-    background_frame = group.nodes.new(type='NodeFrame')
-    background_input = group.nodes.new(type='NodeGroupInput')
-    background_debug = group.nodes.new(type='ShaderNodeMath')
-    background_delight = group.nodes.new(type='ShaderNodeMixRGB')
-    background_transparent = group.nodes.new(type='ShaderNodeBsdfTransparent')
-    background_1 = group.nodes.new(type='ShaderNodeBsdfDiffuse')
-    background_2 = group.nodes.new(type='ShaderNodeMixShader')
-    background_3 = group.nodes.new(type='ShaderNodeMixShader')
-
-    # Label the nodes.
-    background_frame.label = "Background"
-    background_input.label = "Background Input"
-    background_debug.label = "Background Debug"
-    background_delight.label = "Background Delight"
-    background_transparent.label = "Background Transparent"
-    background_1.label = "Background 1"
-    background_2.label = "Background 2"
-    background_3.label = "Background 3"
-
-    # Put the nodes in their frame.
-    background_input.parent = background_frame
-    background_debug.parent = background_frame
-    background_delight.parent = background_frame
-    background_transparent.parent = background_frame
-    background_1.parent = background_frame
-    background_2.parent = background_frame
-    background_3.parent = background_frame
-
-    # Position the nodes.
-    hs = 200.0
-    x = 0.0
-    y = 0.0
-
-    background_input.location = (x, y)
-    x += hs
-    background_delight.location = (x, y)
-    background_debug.location = (x, y + 80.0)
-    x += hs
-    background_1.location = (x, y + 30)
-    x += hs
-    background_transparent.location = (x, y - 80.0)
-    background_2.location = (x, y + 100.0)
-    x += hs
-    background_3.location = (x, y)
-
-    # Configure the nodes.
-    for socket in background_input.outputs:
-        socket.hide = True
-    background_input.outputs["Background"].hide = False
-    background_input.outputs["Background Alpha"].hide = False
-    background_input.outputs["Background Emit"].hide = False
-    background_input.outputs["Baked Lighting"].hide = False
-    background_input.outputs["Do Bake"].hide = False
-
-    background_delight.blend_type = 'DIVIDE'
-    background_delight.use_clamp = False
-    background_delight.inputs[0].default_value = 1.0
-
-    background_transparent.inputs['Color'].default_value = (1.0, 1.0, 1.0, 1.0)
-
-    background_1.inputs['Roughness'].default_value = 0.0
-    background_1.hide = True
-
-    background_debug.operation = 'MAXIMUM'
-    background_debug.use_clamp = True
-    background_debug.hide = True
-
-    # Hook up the nodes.
-    group.links.new(background_input.outputs['Background'], background_delight.inputs['Color1'])
-    group.links.new(background_input.outputs['Background'], background_2.inputs[2])
-    group.links.new(background_input.outputs['Background Alpha'], background_3.inputs['Fac'])
-    group.links.new(background_input.outputs['Background Emit'], background_debug.inputs[0])
-    group.links.new(background_input.outputs['Baked Lighting'], background_delight.inputs['Color2'])
-    group.links.new(background_input.outputs['Do Bake'], background_debug.inputs[1])
-    group.links.new(background_delight.outputs['Color'], background_1.inputs['Color'])
-    group.links.new(background_1.outputs['BSDF'], background_2.inputs[1])
-    group.links.new(background_debug.outputs['Value'], background_2.inputs['Fac'])
-    group.links.new(background_transparent.outputs['BSDF'], background_3.inputs[1])
-    group.links.new(background_2.outputs['Shader'], background_3.inputs[2])
-
-    #-------------------
-    # Camera Ray nodes.
-
-    # Create the nodes.
-    camera_ray_frame = group.nodes.new(type='NodeFrame')
-    camera_input = group.nodes.new(type='NodeGroupInput')
-    light_path = group.nodes.new(type='ShaderNodeLightPath')
-    debug_invert = group.nodes.new(type='ShaderNodeMath')
-    camera_ray = group.nodes.new(type='ShaderNodeMath')
-
-    # Label the nodes.
-    camera_ray_frame.label = "Camera Ray"
-    camera_input.label = "Camera Input"
-    light_path.label = "Light Path"
-    debug_invert.label = "Debug Invert"
-    camera_ray.label = "Camera Ray"
-
-    # Put the nodes in their frame.
-    camera_input.parent = camera_ray_frame
-    light_path.parent = camera_ray_frame
-    debug_invert.parent = camera_ray_frame
-    camera_ray.parent = camera_ray_frame
-
-    # Position the nodes.
-    hs = 200.0
-    x = 400.0
-    y = 260.0
-
-    camera_input.location = (x, y)
-    x += hs
-    light_path.location = (x, y)
-    debug_invert.location = (x, y + 50.0)
-    x += hs
-    camera_ray.location = (x, y)
-
-    # Configure the nodes.
-    for socket in camera_input.outputs:
-        socket.hide = True
-    camera_input.outputs["Debug"].hide = False
-
-    for socket in light_path.outputs:
-        socket.hide = True
-    light_path.outputs["Is Camera Ray"].hide = False
-
-    debug_invert.operation = 'MULTIPLY_ADD'
-    debug_invert.use_clamp = True
-    debug_invert.inputs[1].default_value = -1.0
-    debug_invert.inputs[2].default_value = 1.0
-    debug_invert.hide = True
-
-    camera_ray.operation = 'MINIMUM'
-    camera_ray.use_clamp = True
-    camera_ray.hide = True
-
-    # Hook up the nodes.
-    group.links.new(camera_input.outputs['Debug'], debug_invert.inputs['Value'])
-    group.links.new(light_path.outputs['Is Camera Ray'], camera_ray.inputs[0])
-    group.links.new(debug_invert.outputs['Value'], camera_ray.inputs[1])
-
-    #---------------
-    # Baking nodes.
-
-    # Create the nodes.
-    baking_frame = group.nodes.new(type='NodeFrame')
-    baking_input = group.nodes.new(type='NodeGroupInput')
-    baking_transparent = group.nodes.new(type='ShaderNodeBsdfTransparent')
-    baking_diffuse = group.nodes.new(type='ShaderNodeBsdfDiffuse')
-    baking_1 = group.nodes.new(type='ShaderNodeMixShader')
-    baking_2 = group.nodes.new(type='ShaderNodeMixShader')
-    baking_3 = group.nodes.new(type='ShaderNodeMixShader')
-
-    # Label the nodes.
-    baking_frame.label = "Baking"
-    baking_input.label = "Baking Input"
-    baking_transparent.label = "Baking Transparent"
-    baking_diffuse.label = "Baking Diffuse"
-    baking_1.label = "Baking 1"
-    baking_2.label = "Baking 2"
-    baking_3.label = "Baking 3"
-
-    # Put the nodes in their frame.
-    baking_input.parent = baking_frame
-    baking_transparent.parent = baking_frame
-    baking_diffuse.parent = baking_frame
-    baking_1.parent = baking_frame
-    baking_2.parent = baking_frame
-    baking_3.parent = baking_frame
-
-    # Position the nodes.
-    hs = 200.0
-    x = 850.0
-    y = 700.0
-
-    x += hs
-    baking_transparent.location = (x, y)
-    baking_input.location = (x, y - 140.0)
-
-    x += hs
-    baking_1.location = (x, y)
-
-    x += hs
-    baking_2.location = (x, y)
-    baking_diffuse.location = (x, y - 140.0)
-
-    x += hs
-    baking_3.location = (x, y)
-
-    # Configure the nodes.
-    for socket in baking_input.outputs:
-        socket.hide = True
-    baking_input.outputs["Footage"].hide = False
-    baking_input.outputs["Background"].hide = False
-    baking_input.outputs["Background Alpha"].hide = False
-    baking_input.outputs["Footage Alpha"].hide = False
-
-    baking_transparent.inputs['Color'].default_value = (1.0, 1.0, 1.0, 1.0)
-
-    baking_diffuse.inputs['Color'].default_value = (1.0, 1.0, 1.0, 1.0)
-    baking_diffuse.inputs['Roughness'].default_value = 0.0
-
-    # Hook up the nodes.
-    group.links.new(baking_transparent.outputs['BSDF'], baking_1.inputs[1])
-    group.links.new(baking_input.outputs['Footage'], baking_2.inputs[2])
-    group.links.new(baking_input.outputs['Background'], baking_1.inputs[2])
-    group.links.new(baking_input.outputs['Background Alpha'], baking_1.inputs['Fac'])
-    group.links.new(baking_input.outputs['Footage Alpha'], baking_2.inputs['Fac'])
-    group.links.new(baking_1.outputs['Shader'], baking_2.inputs[1])
-    group.links.new(baking_2.outputs['Shader'], baking_3.inputs[1])
-    group.links.new(baking_diffuse.outputs['BSDF'], baking_3.inputs[2])
-
-    #----------------------
-    # The remaining nodes.
-
-    # Create the nodes.
-    mix_input = group.nodes.new(type='NodeGroupInput')
-    background_mask = group.nodes.new(type='ShaderNodeMixShader')
-    backfacing1_mask = group.nodes.new(type='ShaderNodeMixShader')
-    backfacing1_geo = group.nodes.new(type='ShaderNodeNewGeometry')
-    hide_sockets(backfacing1_geo)
-    backfacing1_shader = group.nodes.new(type='ShaderNodeBsdfTransparent')
-    camera_switch = group.nodes.new(type='ShaderNodeMixShader')
-    bake_switch = group.nodes.new(type='ShaderNodeMixShader')
-    backfacing2_mask = group.nodes.new(type='ShaderNodeMixShader')
-    backfacing2_geo = group.nodes.new(type='ShaderNodeNewGeometry')
-    hide_sockets(backfacing2_geo)
-    backfacing2_shader = group.nodes.new(type='ShaderNodeBsdfTransparent')
-    output = group.nodes.new(type='NodeGroupOutput')
-
-    # Label the nodes.
-    mix_input.label = "Mix Input"
-    background_mask.label = "Background Mask"
-    backfacing1_mask.label = "Backfacing Mask"
-    backfacing2_mask.label = "Backfacing Mask"
-    camera_switch.label = "Camera Switch"
-    bake_switch.label = "Bake Switch"
-
-    # Position the nodes.
-    hs = 200.0
-    x = 1200.0
-    y = 300.0
-
-    mix_input.location = (x, y)
-
-    x += hs
-    background_mask.location = (x, y - 200.0)
-    backfacing1_geo.location = (x, y - 450)
-    backfacing1_shader.location = (x, y - 550)
-
-    x += hs
-    backfacing1_mask.location = (x, y - 450)
-
-    x += hs
-    camera_switch.location = (x, y - 200.0)
-
-    x += 50.0
-    y = 600.0
-    backfacing2_geo.location = (x, y)
-    backfacing2_shader.location = (x, y - 100)
-
-    x += hs
-    backfacing2_mask.location = (x, y)
-
-    x += hs
-    y = 300.0
-    bake_switch.location = (x, y)
-
-    x += hs
-    output.location = (x, y)
-
-    # Configure the nodes.
-    for socket in mix_input.outputs:
-        socket.hide = True
-    mix_input.outputs["Footage Alpha"].hide = False
-    mix_input.outputs["Do Bake"].hide = False
-
-    # Hook up the nodes.
-    group.links.new(mix_input.outputs['Footage Alpha'], background_mask.inputs['Fac'])
-    group.links.new(mix_input.outputs['Do Bake'], bake_switch.inputs['Fac'])
-    group.links.new(backfacing1_geo.outputs['Backfacing'], backfacing1_mask.inputs['Fac'])
-    group.links.new(background_mask.outputs['Shader'], backfacing1_mask.inputs[1])
-    group.links.new(backfacing1_shader.outputs[0], backfacing1_mask.inputs[2])
-    group.links.new(backfacing1_mask.outputs['Shader'], camera_switch.inputs[1])
-    group.links.new(camera_switch.outputs['Shader'], bake_switch.inputs[1])
-    group.links.new(bake_switch.outputs['Shader'], output.inputs['Shader'])
-    group.links.new(backfacing2_geo.outputs['Backfacing'], backfacing2_mask.inputs['Fac'])
-    group.links.new(backfacing2_shader.outputs[0], backfacing2_mask.inputs[2])
-
-    #-------------------------------------------------
-    # Final hook up of all the groups of nodes above.
-
-    group.links.new(camera_ray.outputs['Value'], baking_3.inputs['Fac'])
-    group.links.new(camera_ray.outputs['Value'], camera_switch.inputs['Fac'])
-    group.links.new(background_3.outputs['Shader'], background_mask.inputs[1])
-    group.links.new(footage_2.outputs['Shader'], background_mask.inputs[2])
-    group.links.new(footage_2.outputs['Shader'], camera_switch.inputs[2])
-    group.links.new(baking_3.outputs['Shader'], backfacing2_mask.inputs[1])
-    group.links.new(backfacing2_mask.outputs['Shader'], bake_switch.inputs[2])
 
-    return group
+    # If it already exists and is up to date, just return it.
+    group = current_group(NAME, FOOTAGE_GROUP_VERSION)
+    if group != None:
+        return group
+
+    return build_group(NAME, FOOTAGE_GROUP_SPEC, FOOTAGE_GROUP_VERSION)
+
+
+#========================================================
+# Compify Footage Render.
+
+# Nodes of the footage group that are only needed when "Do Bake" or
+# "Debug" are non-zero.
+FOOTAGE_BAKE_AND_DEBUG_NODES = {
+    "footage_debug",
+    "background_debug",
+    "camera_input",
+    "debug_invert",
+    "camera_ray",
+    "baking_frame",
+    "baking_input",
+    "baking_transparent",
+    "baking_diffuse",
+    "baking_1",
+    "baking_2",
+    "baking_3",
+    "backfacing2_geo",
+    "backfacing2_shader",
+    "backfacing2_mask",
+    "bake_switch",
+}
+
+# A lean variant of the footage group for final renders, where "Do Bake"
+# and "Debug" are always 0: the baking and debug branches are stripped
+# out, and what they switched between is hooked up directly.  It has the
+# same interface as the full group, so the two can be swapped.
+FOOTAGE_RENDER_GROUP_SPEC = {
+    "inputs": FOOTAGE_GROUP_SPEC["inputs"],
+    "outputs": FOOTAGE_GROUP_SPEC["outputs"],
+
+    "nodes": [
+        (name, node_type, properties)
+        for name, node_type, properties in FOOTAGE_GROUP_SPEC["nodes"]
+        if name not in FOOTAGE_BAKE_AND_DEBUG_NODES
+    ],
+
+    "links": [
+        link
+        for link in FOOTAGE_GROUP_SPEC["links"]
+        if link[0] not in FOOTAGE_BAKE_AND_DEBUG_NODES and link[2] not in FOOTAGE_BAKE_AND_DEBUG_NODES
+    ] + [
+        # The mix shaders clamp their factor, like the removed debug
+        # nodes did.
+        ("footage_input", 'Footage Emit', "footage_2", 'Fac'),
+        ("background_input", 'Background Emit', "background_2", 'Fac'),
+        ("light_path", 'Is Camera Ray', "camera_switch", 'Fac'),
+        ("camera_switch", 'Shader', "output", 'Shader'),
+    ],
+}
+
+
+# Ensures that the Compify Footage Render shader group (see
+# `FOOTAGE_RENDER_GROUP_SPEC`) exists.
+#
+# It will create it if it doesn't exist, rebuild it in place if it was
+# built by an older version of Compify, and returns the group.
+def ensure_footage_render_group():
+    NAME = "Compify Footage Render"
+
+    # If it already exists and is up to date, just return it.
+    group = current_group(NAME, FOOTAGE_RENDER_GROUP_VERSION)
+    if group != None:
+        return group
+
+    return build_group(NAME, FOOTAGE_RENDER_GROUP_SPEC, FOOTAGE_RENDER_GROUP_VERSION)
+
+
+#========================================================
+# Feathered Square.
+
+FEATHERED_SQUARE_GROUP_SPEC = {
+    "inputs": [
+        ("Vector", 'NodeSocketVector', {}),
+        ("Feather", 'NodeSocketFloat', unit_float(0.0)),
+        ("Dilate", 'NodeSocketFloat', {"default_value": 0.0, "min_value": 0.0, "max_value": 0.1}),
+    ],
+    "outputs": [
+        ("Value", 'NodeSocketFloat', {}),
+    ],
+
+    "nodes": [
+        ("input", 'NodeGroupInput', {"location": (0.0, 0.0)}),
+
+        ("xyz", 'ShaderNodeSeparateXYZ', {"label": "XYZ", "location": (250.0, 0.0)}),
+        ("feather_clamp", 'ShaderNodeMath', {
+            "label": "Feather Clamp", "location": (250.0, -200.0),
+            "operation": 'MAXIMUM', "use_clamp": False, "inputs": {1: 0.000001},
+        }),
+
+        ("madd_x", 'ShaderNodeMath', {
+            "label": "Multiply-Add X", "location": (500.0, 0.0),
+            "operation": 'MULTIPLY_ADD', "use_clamp": False, "inputs": {1: 2.0, 2: -1.0},
+        }),
+        ("madd_y", 'ShaderNodeMath', {
+            "label": "Multiply-Add Y", "location": (500.0, -200.0),
+            "operation": 'MULTIPLY_ADD', "use_clamp": False, "inputs": {1: 2.0, 2: -1.0},
+        }),
+
+        ("abs_x", 'ShaderNodeMath', {
+            "label": "Abs X", "location": (750.0, 0.0),
+            "operation": 'ABSOLUTE', "use_clamp": False,
+        }),
+        ("abs_y", 'ShaderNodeMath', {
+            "label": "Abs Y", "location": (750.0, -200.0),
+            "operation": 'ABSOLUTE', "use_clamp": False,
+        }),
+
+        ("xy_max", 'ShaderNodeMath', {
+            "label": "XY Max", "location": (1000.0, 0.0),
+            "operation": 'MAXIMUM', "use_clamp": False,
+        }),
+        ("xy_invert", 'ShaderNodeMath', {
+            "label": "XY Invert", "location": (1250.0, 0.0),
+            "operation": 'MULTIPLY_ADD', "use_clamp": False, "inputs": {1: -1.0, 2: 1.0},
+        }),
+        ("xy_add", 'ShaderNodeMath', {
+            "label": "XY Add", "location": (1500.0, 0.0),
+            "operation": 'ADD', "use_clamp": False,
+        }),
+        ("xy_divide", 'ShaderNodeMath', {
+            "label": "XY Divide", "location": (1750.0, 0.0),
+            "operation": 'DIVIDE', "use_clamp": True,
+        }),
+
+        ("smoothstep1", 'ShaderNodeMath', {
+            "label": "Smoothstep 1", "location": (2000.0, 0.0),
+            "operation": 'MULTIPLY', "use_clamp": False,
+        }),
+        ("smoothstep2", 'ShaderNodeMath', {
+            "label": "Smoothstep 2", "location": (2250.0, -200.0),
+            "operation": 'MULTIPLY', "use_clamp": False,
+        }),
+        ("smoothstep3", 'ShaderNodeMath', {
+            "label": "Smoothstep 3", "location": (2500.0, 0.0),
+            "operation": 'MULTIPLY', "use_clamp": False, "inputs": {1: 3.0},
+        }),
+        ("smoothstep4", 'ShaderNodeMath', {
+            "label": "Smoothstep 4", "location": (2500.0, -200.0),
+            "operation": 'MULTIPLY', "use_clamp": False, "inputs": {1: 2.0},
+        }),
+        ("smoothstep5", 'ShaderNodeMath', {
+            "label": "Smoothstep 5", "location": (2750.0, 0.0),
+            "operation": 'SUBTRACT', "use_clamp": True,
+        }),
+
+        ("output", 'NodeGroupOutput', {"location": (3000.0, 0.0)}),
+    ],
+
+    "links": [
+        ("input", 'Vector', "xyz", 0),
+        ("input", 'Feather', "feather_clamp", 0),
+        ("input", 'Dilate', "xy_add", 1),
+
+        ("xyz", 'X', "madd_x", 0),
+        ("xyz", 'Y', "madd_y", 0),
+        ("feather_clamp", 0, "xy_divide", 1),
+
+        ("madd_x", 0, "abs_x", 0),
+        ("madd_y", 0, "abs_y", 0),
+
+        ("abs_x", 0, "xy_max", 0),
+        ("abs_y", 0, "xy_max", 1),
+
+        ("xy_max", 0, "xy_invert", 'Value'),
+        ("xy_invert", 0, "xy_add", 0),
+        ("xy_add", 0, "xy_divide", 0),
+
+        ("xy_divide", 0, "smoothstep1", 0),
+        ("xy_divide", 0, "smoothstep1", 1),
+        ("xy_divide", 0, "smoothstep2", 1),
+        ("smoothstep1", 0, "smoothstep2", 0),
+
+        ("smoothstep1", 0, "smoothstep3", 0),
+        ("smoothstep2", 0, "smoothstep4", 0),
+
+        ("smoothstep3", 0, "smoothstep5", 0),
+        ("smoothstep4", 0, "smoothstep5", 1),
+
+        ("smoothstep5", 0, "output", 'Value'),
+    ],
+}
 
 
 # Ensures that the Feathered Square shader group exists.
@@ -444,484 +481,396 @@ def ensure_footage_group():
 # It will create it if it doesn't exist, and returns the group.
 def ensure_feathered_square_group():
     NAME = "Feathered Square"
-    
-    # If it already exists, just return it.
-    if NAME in bpy.data.node_groups:
-        return bpy.data.node_groups[NAME]
-
-    # Create the group.
-    group = bpy.data.node_groups.new(NAME, type='ShaderNodeTree')
-    for node in group.nodes:
-        group.nodes.remove(node)
-    
-    # Create the group inputs and outputs.
-    group.interface.new_socket(name="Vector", socket_type='NodeSocketVector', in_out='INPUT')
-    
-    socket = group.interface.new_socket(name="Feather", socket_type='NodeSocketFloat', in_out='INPUT')
-    socket.default_value = 0.0
-    socket.min_value = 0.0
-    socket.max_value = 1.0
-    
-    socket = group.interface.new_socket(name="Dilate", socket_type='NodeSocketFloat', in_out='INPUT')
-    socket.default_value = 0.0
-    socket.min_value = 0.0
-    socket.max_value = 0.1
-    
-    group.interface.new_socket(name="Value", socket_type='NodeSocketFloat', in_out='OUTPUT')
-
-    #-------------------
-    # Create the nodes.
-    input = group.nodes.new(type='NodeGroupInput')
-    output = group.nodes.new(type='NodeGroupOutput')
-    
-    xyz = group.nodes.new(type='ShaderNodeSeparateXYZ')
-    feather_clamp = group.nodes.new(type='ShaderNodeMath')
-    
-    madd_x = group.nodes.new(type='ShaderNodeMath')
-    madd_y = group.nodes.new(type='ShaderNodeMath')
-    
-    abs_x = group.nodes.new(type='ShaderNodeMath')
-    abs_y = group.nodes.new(type='ShaderNodeMath')
-    
-    xy_max = group.nodes.new(type='ShaderNodeMath')
-    xy_invert = group.nodes.new(type='ShaderNodeMath')
-    xy_add = group.nodes.new(type='ShaderNodeMath')
-    xy_divide = group.nodes.new(type='ShaderNodeMath')
-    
-    smoothstep1 = group.nodes.new(type='ShaderNodeMath')
-    smoothstep2 = group.nodes.new(type='ShaderNodeMath')
-    smoothstep3 = group.nodes.new(type='ShaderNodeMath')
-    smoothstep4 = group.nodes.new(type='ShaderNodeMath')
-    smoothstep5 = group.nodes.new(type='ShaderNodeMath')
-    
-    #------------------
-    # Label the nodes.
-    xyz.label = "XYZ"
-    feather_clamp.label = "Feather Clamp"
-    
-    madd_x.label = "Multiply-Add X"
-    madd_y.label = "Multiply-Add Y"
-    
-    abs_x.label = "Abs X"
-    abs_y.label = "Abs Y"
-    
-    xy_max.label = "XY Max"
-    xy_invert.label = "XY Invert"
-    xy_add.label = "XY Add"
-    xy_divide.label = "XY Divide"
-    
-    smoothstep1.label = "Smoothstep 1"
-    smoothstep2.label = "Smoothstep 2"
-    smoothstep3.label = "Smoothstep 3"
-    smoothstep4.label = "Smoothstep 4"
-    smoothstep5.label = "Smoothstep 5"
-
-    #---------------------
-    # Position the nodes.
-    hs = 250.0
-    x = 0.0
-    
-    input.location = (x, 0.0)
-    
-    x += hs
-    xyz.location = (x, 0.0)
-    feather_clamp.location = (x, -200.0)
-    
-    x += hs
-    madd_x.location = (x, 0.0)
-    madd_y.location = (x, -200.0)
-    
-    x += hs
-    abs_x.location = (x, 0.0)
-    abs_y.location = (x, -200.0)
-    
-    x += hs
-    xy_max.location = (x, 0.0)
-    
-    x += hs
-    xy_invert.location = (x, 0.0)
-    
-    x += hs
-    xy_add.location = (x, 0.0)
-    
-    x += hs
-    xy_divide.location = (x, 0.0)
-    
-    x += hs
-    smoothstep1.location = (x, 0.0)
-    
-    x += hs
-    smoothstep2.location = (x, -200.0)
-    
-    x += hs
-    smoothstep3.location = (x, 0.0)
-    smoothstep4.location = (x, -200.0)
-    
-    x += hs
-    smoothstep5.location = (x, 0.0)
-    
-    x += hs
-    output.location = (x, 0.0)
-
-    #----------------------
-    # Configure the nodes.
-    feather_clamp.operation = 'MAXIMUM'
-    feather_clamp.use_clamp = False
-    feather_clamp.inputs[1].default_value = 0.000001
-
-    madd_x.operation = 'MULTIPLY_ADD'
-    madd_x.use_clamp = False
-    madd_x.inputs[1].default_value = 2.0
-    madd_x.inputs[2].default_value = -1.0
-    madd_y.operation = 'MULTIPLY_ADD'
-    madd_y.use_clamp = False
-    madd_y.inputs[1].default_value = 2.0
-    madd_y.inputs[2].default_value = -1.0
-    
-    abs_x.operation = 'ABSOLUTE'
-    abs_x.use_clamp = False
-    abs_y.operation = 'ABSOLUTE'
-    abs_y.use_clamp = False
-    
-    xy_max.operation = 'MAXIMUM'
-    xy_max.use_clamp = False
-    xy_invert.operation = 'MULTIPLY_ADD'
-    xy_invert.use_clamp = False
-    xy_invert.inputs[1].default_value = -1.0
-    xy_invert.inputs[2].default_value = 1.0
-    xy_add.operation = 'ADD'
-    xy_add.use_clamp = False
-    xy_divide.operation = 'DIVIDE'
-    xy_divide.use_clamp = True
-    
-    smoothstep1.operation = 'MULTIPLY'
-    smoothstep1.use_clamp = False
-    smoothstep2.operation = 'MULTIPLY'
-    smoothstep2.use_clamp = False
-    smoothstep3.operation = 'MULTIPLY'
-    smoothstep3.use_clamp = False
-    smoothstep3.inputs[1].default_value = 3.0
-    smoothstep4.operation = 'MULTIPLY'
-    smoothstep4.use_clamp = False
-    smoothstep4.inputs[1].default_value = 2.0
-    smoothstep5.operation = 'SUBTRACT'
-    smoothstep5.use_clamp = True
-
-    #--------------------
-    # Hook up the nodes.
-    group.links.new(input.outputs['Vector'], xyz.inputs[0])
-    group.links.new(input.outputs['Feather'], feather_clamp.inputs[0])
-    group.links.new(input.outputs['Dilate'], xy_add.inputs[1])
-    
-    group.links.new(xyz.outputs['X'], madd_x.inputs[0])
-    group.links.new(xyz.outputs['Y'], madd_y.inputs[0])
-    group.links.new(feather_clamp.outputs[0], xy_divide.inputs[1])
-    
-    group.links.new(madd_x.outputs[0], abs_x.inputs[0])
-    group.links.new(madd_y.outputs[0], abs_y.inputs[0])
-    
-    group.links.new(abs_x.outputs[0], xy_max.inputs[0])
-    group.links.new(abs_y.outputs[0], xy_max.inputs[1])
-    
-    group.links.new(xy_max.outputs[0], xy_invert.inputs['Value'])
-    
-    group.links.new(xy_invert.outputs[0], xy_add.inputs[0])
-    
-    group.links.new(xy_add.outputs[0], xy_divide.inputs[0])
-    
-    group.links.new(xy_divide.outputs[0], smoothstep1.inputs[0])
-    group.links.new(xy_divide.outputs[0], smoothstep1.inputs[1])
-    group.links.new(xy_divide.outputs[0], smoothstep2.inputs[1])
-    group.links.new(smoothstep1.outputs[0], smoothstep2.inputs[0])
-    
-    group.links.new(smoothstep1.outputs[0], smoothstep3.inputs[0])
-    group.links.new(smoothstep2.outputs[0], smoothstep4.inputs[0])
-    
-    group.links.new(smoothstep3.outputs[0], smoothstep5.inputs[0])
-    group.links.new(smoothstep4.outputs[0], smoothstep5.inputs[1])
-    
-    group.links.new(smoothstep5.outputs[0], output.inputs['Value'])
 
-    return group
+    # If it already exists and is up to date, just return it.
+    group = current_group(NAME, FEATHERED_SQUARE_GROUP_VERSION)
+    if group != None:
+        return group
+
+    return build_group(NAME, FEATHERED_SQUARE_GROUP_SPEC, FEATHERED_SQUARE_GROUP_VERSION)
+
+
+#========================================================
+# Camera Project.
+
+# The camera lens settings used by the camera project group, as
+# `(node name, camera data property)` pairs.
+CAMERA_LENS_SETTINGS = [
+    ("lens", 'lens'),
+    ("sensor_width", 'sensor_width'),
+    ("lens_shift_x", 'shift_x'),
+    ("lens_shift_y", 'shift_y'),
+]
+
+
+# Gets the node spec properties that give the Value node for one of the
+# camera's lens settings its value.
+#
+# Rather than driving the nodes from the camera, the setting's value is
+# copied to the node, and its animation is copied to the node group as
+# F-Curves.  Simple property drivers like these are evaluated natively,
+# without Python, so this isn't about driver speed: it keeps the group
+# from depending on the camera data, so that the group (and every
+# material using it) is only re-evaluated when its own values change.
+# The copies are kept in sync by `camera_lens_update_handler()`.  Only
+# settings that can't be copied ahead of time (ones with drivers or
+# F-Curve modifiers of their own, or when the camera data uses the NLA)
+# fall back to a driver.
+def camera_lens_setting_properties(camera, data_path):
+    anim = camera.data.animation_data
+    if anim != None:
+        driver = ('CAMERA', camera.data, data_path)
+        if anim.drivers.find(data_path) != None or len(anim.nla_tracks) > 0:
+            return {"driver": driver}
+        fcurve = anim.action.fcurves.find(data_path) if anim.action != None else None
+        if fcurve != None:
+            if len(fcurve.modifiers) > 0:
+                return {"driver": driver}
+            return {"animation": fcurve}
+    return {"outputs": {0: getattr(camera.data, data_path)}}
+
+
+# Gets a hashable summary of how the camera project group's lens setting
+# nodes get their values (see `camera_lens_setting_properties()`), so the
+# group can be rebuilt when that changes.
+def camera_lens_settings_state(lens_settings):
+    state = []
+    for name, properties in lens_settings.items():
+        if "animation" in properties:
+            state.append((name, keyframes_state(properties["animation"])))
+        elif "driver" in properties:
+            state.append((name, properties["driver"][2]))
+        else:
+            state.append((name, properties["outputs"][0]))
+    return tuple(state)
+
+
+# Gets the node spec of the camera project group for the given camera,
+# given its lens setting node properties (see
+# `camera_lens_setting_properties()`).
+def camera_project_group_spec(camera, lens_settings, default_aspect=1.0):
+    return {
+        "inputs": [
+            ("Aspect Ratio", 'NodeSocketFloat', {}, {"default_value": default_aspect}),
+            ("Rotation", 'NodeSocketFloat', {}),
+            ("Loc X", 'NodeSocketFloat', {}),
+            ("Loc Y", 'NodeSocketFloat', {}),
+        ],
+        "outputs": [
+            ("Vector", 'NodeSocketVector', {}),
+        ],
+
+        "nodes": [
+            ("camera_transform", 'ShaderNodeTexCoord', {
+                "label": "Camera Transform", "location": (0.0, 0.0), "object": camera,
+            }),
+            ("lens", 'ShaderNodeValue', {
+                "label": "Lens", "location": (0.0, -700.0), **lens_settings["lens"],
+            }),
+            ("sensor_width", 'ShaderNodeValue', {
+                "label": "Sensor Width", "location": (0.0, -900.0), **lens_settings["sensor_width"],
+            }),
+            ("lens_shift_x", 'ShaderNodeValue', {
+                "label": "Lens Shift X", "location": (0.0, -1100.0), **lens_settings["lens_shift_x"],
+            }),
+            ("lens_shift_y", 'ShaderNodeValue', {
+                "label": "Lens Shift Y", "location": (0.0, -1300.0), **lens_settings["lens_shift_y"],
+            }),
+            ("input", 'NodeGroupInput', {"location": (0.0, -1500.0)}),
+
+            ("zoom_1", 'ShaderNodeMath', {
+                "label": "Zoom 1", "location": (250.0, -700.0),
+                "operation": 'DIVIDE', "use_clamp": False,
+            }),
+            ("lens_shift_1", 'ShaderNodeCombineXYZ', {
+                "label": "Lens Shift 1", "location": (250.0, -1100.0), "inputs": {2: 0.0},
+            }),
+            ("to_radians", 'ShaderNodeMath', {
+                "label": "Degrees to Radians", "location": (250.0, -1500.0),
+                "operation": 'MULTIPLY', "use_clamp": False, "inputs": {1: math.pi / 180.0},
+            }),
+            ("user_location", 'ShaderNodeCombineXYZ', {
+                "label": "User Location", "location": (250.0, -1700.0), "inputs": {2: 0.0},
+            }),
+
+            ("zoom_2", 'ShaderNodeMath', {
+                "label": "Zoom 2", "location": (500.0, -700.0),
+                "operation": 'MULTIPLY', "use_clamp": False, "inputs": {1: -1.0},
+            }),
+
+            ("perspective_1", 'ShaderNodeSeparateXYZ', {
+                "label": "Perspective 1", "location": (750.0, 0.0),
+            }),
+            ("perspective_2", 'ShaderNodeMath', {
+                "label": "Perspective 2", "location": (1000.0, 0.0),
+                "operation": 'DIVIDE', "use_clamp": False,
+            }),
+            ("perspective_3", 'ShaderNodeMath', {
+                "label": "Perspective 3", "location": (1000.0, -200.0),
+                "operation": 'DIVIDE', "use_clamp": False,
+            }),
+            ("perspective_4", 'ShaderNodeCombineXYZ', {
+                "label": "Perspective 4", "location": (1250.0, 0.0),
+            }),
+            ("zoom_3", 'ShaderNodeVectorMath', {
+                "label": "Zoom 3", "location": (1500.0, 0.0), "operation": 'MULTIPLY',
+            }),
+
+            ("lens_shift_2", 'ShaderNodeVectorMath', {
+                "label": "Lens Shift 2", "location": (1750.0, 0.0), "operation": 'SUBTRACT',
+            }),
+            ("aspect_ratio_div", 'ShaderNodeMath', {
+                "label": "Divide", "location": (1750.0, -850.0),
+                "operation": 'DIVIDE', "inputs": {0: 1.0},
+            }),
+
+            ("user_translate", 'ShaderNodeVectorMath', {
+                "label": "User Translate", "location": (2000.0, 0.0), "operation": 'SUBTRACT',
+            }),
+            ("aspect_ratio_lt", 'ShaderNodeMath', {
+                "label": "Less Than", "location": (2000.0, -500.0),
+                "operation": 'LESS_THAN', "inputs": {1: 1.0},
+            }),
+            ("aspect_ratio_1", 'ShaderNodeCombineXYZ', {
+                "label": "Aspect Ratio 1", "location": (2000.0, -700.0), "inputs": {'X': 1.0, 'Z': 0.0},
+            }),
+            ("aspect_ratio_2", 'ShaderNodeCombineXYZ', {
+                "label": "Aspect Ratio 2", "location": (2000.0, -850.0), "inputs": {'Y': 1.0, 'Z': 0.0},
+            }),
+
+            ("user_rotate", 'ShaderNodeVectorRotate', {
+                "label": "User Rotate", "location": (2250.0, 0.0),
+                "rotation_type": 'Z_AXIS', "invert": False, "inputs": {'Center': (0.0, 0.0, 0.0)},
+            }),
+            ("aspect_ratio_switch", 'ShaderNodeMixRGB', {
+                "label": "Aspect Ratio Switch", "location": (2250.0, -600.0),
+                "blend_type": 'MIX', "use_clamp": False,
+            }),
+
+            ("user_transforms", 'ShaderNodeVectorMath', {
+                "label": "User Transforms", "location": (2500.0, 0.0), "operation": 'MULTIPLY',
+            }),
+            ("recenter", 'ShaderNodeVectorMath', {
+                "label": "Recenter", "location": (2750.0, 0.0),
+                "operation": 'ADD', "inputs": {1: (0.5, 0.5, 0.0)},
+            }),
+            ("output", 'NodeGroupOutput', {"location": (3000.0, 0.0)}),
+        ],
+
+        "links": [
+            ("camera_transform", 'Object', "perspective_1", 'Vector'),
+            ("lens", 'Value', "zoom_1", 0),
+            ("sensor_width", 'Value', "zoom_1", 1),
+            ("zoom_1", 'Value', "zoom_2", 0),
+            ("zoom_2", 'Value', "zoom_3", 1),
+            ("lens_shift_x", 'Value', "lens_shift_1", 'X'),
+            ("lens_shift_y", 'Value', "lens_shift_1", 'Y'),
+            ("lens_shift_1", 'Vector', "lens_shift_2", 1),
+
+            ("input", 'Aspect Ratio', "aspect_ratio_1", 'Y'),
+            ("input", 'Aspect Ratio', "aspect_ratio_div", 1),
+            ("input", 'Aspect Ratio', "aspect_ratio_lt", 0),
+            ("input", 'Rotation', "to_radians", 0),
+            ("to_radians", 'Value', "user_rotate", 'Angle'),
+            ("input", 'Loc X', "user_location", 'X'),
+            ("input", 'Loc Y', "user_location", 'Y'),
+            ("user_location", 'Vector', "user_translate", 1),
+
+            ("perspective_1", 'X', "perspective_2", 0),
+            ("perspective_1", 'Y', "perspective_3", 0),
+            ("perspective_1", 'Z', "perspective_2", 1),
+            ("perspective_1", 'Z', "perspective_3", 1),
+            ("perspective_1", 'Z', "perspective_4", 'Z'),
+            ("perspective_2", 'Value', "perspective_4", 'X'),
+            ("perspective_3", 'Value', "perspective_4", 'Y'),
+            ("perspective_4", 'Vector', "zoom_3", 0),
+            ("zoom_3", 'Vector', "lens_shift_2", 0),
+            ("lens_shift_2", 'Vector', "user_translate", 0),
+
+            ("aspect_ratio_div", 0, "aspect_ratio_2", 'X'),
+            ("aspect_ratio_1", 0, "aspect_ratio_switch", 1),
+            ("aspect_ratio_2", 0, "aspect_ratio_switch", 2),
+            ("aspect_ratio_lt", 0, "aspect_ratio_switch", 0),
+
+            ("user_translate", 'Vector', "user_rotate", 'Vector'),
+            ("user_rotate", 'Vector', "user_transforms", 0),
+            ("aspect_ratio_switch", 0, "user_transforms", 1),
+            ("user_transforms", 'Vector', "recenter", 0),
+
+            ("recenter", 'Vector', "output", 'Vector'),
+        ],
+    }
 
 
 # Takes a camera object, and ensures there is a node group for
 # projecting textures from that camera.
 #
-# It will create it if it doesn't exist, and returns the group.
+# It will create it if it doesn't exist, and returns the group.  An
+# existing group is only updated if it's out of date, was built for a
+# different camera (data), or the camera's lens settings or their
+# animation changed since, which makes this cheap to call often.
 def ensure_camera_project_group(camera, default_aspect=1.0):
     name = "Camera Project | " + camera.name
+    lens_settings = {
+        node_name: camera_lens_setting_properties(camera, data_path)
+        for node_name, data_path in CAMERA_LENS_SETTINGS
+    }
+    inputs_hash = group_inputs_hash(camera.name, camera.data.name, camera_lens_settings_state(lens_settings))
+
+    # If it already exists and is up to date, just return it.
+    group = current_group(name, CAMERA_PROJECT_GROUP_VERSION, inputs_hash)
+    if group != None:
+        return group
+
+    spec = camera_project_group_spec(camera, lens_settings, default_aspect)
+    return build_group(name, spec, CAMERA_PROJECT_GROUP_VERSION, inputs_hash)
+
+
+#========================================================
+# Compify Lighting Decode.
+
+LIGHTING_DECODE_GROUP_SPEC = {
+    "inputs": [
+        ("Color", 'NodeSocketColor', {"default_value": (1.0, 1.0, 1.0, 1.0), "hide_value": True}),
+        ("Encoded", 'NodeSocketFloat', unit_float(0.0)),
+        ("Log Min", 'NodeSocketFloat', {"default_value": -16.0}),
+        ("Log Max", 'NodeSocketFloat', {"default_value": 0.0}),
+    ],
+    "outputs": [
+        ("Color", 'NodeSocketColor', {}),
+    ],
+
+    "nodes": [
+        ("input", 'NodeGroupInput', {"location": (0.0, 0.0)}),
+
+        ("separate", 'ShaderNodeSeparateColor', {
+            "label": "Separate", "location": (250.0, 0.0), "mode": 'RGB',
+        }),
+        ("log_range", 'ShaderNodeMath', {
+            "label": "Log Range", "location": (250.0, -200.0),
+            "operation": 'SUBTRACT', "use_clamp": False,
+        }),
+    ] + [
+        ("madd_" + c, 'ShaderNodeMath', {
+            "label": "Multiply-Add " + c.upper(), "location": (500.0, y),
+            "operation": 'MULTIPLY_ADD', "use_clamp": False,
+        })
+        for c, y in [("r", 0.0), ("g", -200.0), ("b", -400.0)]
+    ] + [
+        ("exp_" + c, 'ShaderNodeMath', {
+            "label": "Exp2 " + c.upper(), "location": (750.0, y),
+            "operation": 'POWER', "use_clamp": False, "inputs": {0: 2.0},
+        })
+        for c, y in [("r", 0.0), ("g", -200.0), ("b", -400.0)]
+    ] + [
+        ("combine", 'ShaderNodeCombineColor', {
+            "label": "Combine", "location": (1000.0, 0.0), "mode": 'RGB',
+        }),
+        ("encoded_switch", 'ShaderNodeMixRGB', {
+            "label": "Encoded Switch", "location": (1250.0, 0.0),
+            "blend_type": 'MIX', "use_clamp": False,
+        }),
+        ("output", 'NodeGroupOutput', {"location": (1500.0, 0.0)}),
+    ],
+
+    "links": [
+        ("input", 'Log Max', "log_range", 0),
+        ("input", 'Log Min', "log_range", 1),
+        ("input", 0, "separate", 'Color'),
+    ] + [
+        link
+        for channel, c in [('Red', "r"), ('Green', "g"), ('Blue', "b")]
+        for link in [
+            ("separate", channel, "madd_" + c, 0),
+            ("log_range", 0, "madd_" + c, 1),
+            ("input", 'Log Min', "madd_" + c, 2),
+            ("madd_" + c, 0, "exp_" + c, 1),
+            ("exp_" + c, 0, "combine", channel),
+        ]
+    ] + [
+        ("input", 'Encoded', "encoded_switch", 'Fac'),
+        ("input", 0, "encoded_switch", 'Color1'),
+        ("combine", 'Color', "encoded_switch", 'Color2'),
+        ("encoded_switch", 'Color', "output", 0),
+    ],
+}
+
+
+# Ensures that the Compify Lighting Decode shader group exists.
+#
+# This decodes log-encoded baked lighting (see `image_utils.encode_log8()`)
+# back to linear values.  When "Encoded" is 0 the color passes through
+# unchanged, so the group can always sit between the baked lighting image
+# and the footage group.
+#
+# It will create it if it doesn't exist, and returns the group.
+def ensure_lighting_decode_group():
+    NAME = "Compify Lighting Decode"
+
+    # If it already exists and is up to date, just return it.
+    group = current_group(NAME, LIGHTING_DECODE_GROUP_VERSION)
+    if group != None:
+        return group
+
+    return build_group(NAME, LIGHTING_DECODE_GROUP_SPEC, LIGHTING_DECODE_GROUP_VERSION)
+
+
+#========================================================
+# Compify Vertex Projection.
+
+# Reads the per-vertex footage projection written by
+# `vertex_projection.update_vertex_projection()`, which is stored in
+# homogeneous form (see `camera_utils.homogeneous_projection()`), so this
+# only has to divide it through.
+VERTEX_PROJECTION_GROUP_SPEC = {
+    "outputs": [
+        ("Vector", 'NodeSocketVector', {}),
+    ],
+
+    "nodes": [
+        ("attribute", 'ShaderNodeAttribute', {
+            "label": "Projection", "location": (0.0, 0.0),
+            "attribute_type": 'GEOMETRY', "attribute_name": PROJECTION_ATTRIBUTE_NAME,
+        }),
+        ("separate", 'ShaderNodeSeparateXYZ', {
+            "label": "Separate", "location": (250.0, 0.0),
+        }),
+        ("divide_u", 'ShaderNodeMath', {
+            "label": "Divide U", "location": (500.0, 0.0),
+            "operation": 'DIVIDE', "use_clamp": False,
+        }),
+        ("divide_v", 'ShaderNodeMath', {
+            "label": "Divide V", "location": (500.0, -200.0),
+            "operation": 'DIVIDE', "use_clamp": False,
+        }),
+        ("combine", 'ShaderNodeCombineXYZ', {
+            "label": "Combine", "location": (750.0, 0.0), "inputs": {'Z': 0.0},
+        }),
+        ("output", 'NodeGroupOutput', {"location": (1000.0, 0.0)}),
+    ],
+
+    "links": [
+        ("attribute", 'Vector', "separate", 0),
+        ("separate", 'X', "divide_u", 0),
+        ("separate", 'Z', "divide_u", 1),
+        ("separate", 'Y', "divide_v", 0),
+        ("separate", 'Z', "divide_v", 1),
+        ("divide_u", 'Value', "combine", 'X'),
+        ("divide_v", 'Value', "combine", 'Y'),
+        ("combine", 'Vector', "output", 'Vector'),
+    ],
+}
+
+
+# Ensures that the Compify Vertex Projection shader group exists.
+#
+# It will create it if it doesn't exist, and returns the group.
+def ensure_vertex_projection_group():
+    NAME = "Compify Vertex Projection"
 
-    # Fetch or create group.
-    group = None
-    if name in bpy.data.node_groups:
-        group = bpy.data.node_groups[name]
-    else:
-        group = bpy.data.node_groups.new(name, type='ShaderNodeTree')
-
-    # Clear all nodes, to start from a clean slate.
-    for node in group.nodes:
-        group.nodes.remove(node)
-
-    # Create the group inputs.
-    if not "Aspect Ratio" in group.interface.items_tree:
-        socket = group.interface.new_socket(name="Aspect Ratio", socket_type='NodeSocketFloat', in_out='INPUT')
-        socket.default_value = default_aspect
-    if not "Rotation" in group.interface.items_tree:
-        group.interface.new_socket(name="Rotation", socket_type='NodeSocketFloat', in_out='INPUT')
-    if not "Loc X" in group.interface.items_tree:
-        group.interface.new_socket(name="Loc X", socket_type='NodeSocketFloat', in_out='INPUT')
-    if not "Loc Y" in group.interface.items_tree:
-        group.interface.new_socket(name="Loc Y", socket_type='NodeSocketFloat', in_out='INPUT')
-
-    # Create the group outputs.
-    if not "Vector" in group.interface.items_tree:
-        group.interface.new_socket(name="Vector", socket_type='NodeSocketVector', in_out='OUTPUT')
-
-    #-------------------
-    # Create the nodes.
-    input = group.nodes.new(type='NodeGroupInput')
-    output = group.nodes.new(type='NodeGroupOutput')
-
-    camera_transform = group.nodes.new(type='ShaderNodeTexCoord')
-    lens = group.nodes.new(type='ShaderNodeValue')
-    sensor_width = group.nodes.new(type='ShaderNodeValue')
-    lens_shift_x = group.nodes.new(type='ShaderNodeValue')
-    lens_shift_y = group.nodes.new(type='ShaderNodeValue')
-
-    zoom_1 = group.nodes.new(type='ShaderNodeMath')
-    zoom_2 = group.nodes.new(type='ShaderNodeMath')
-    lens_shift_1 = group.nodes.new(type='ShaderNodeCombineXYZ')
-    to_radians = group.nodes.new(type='ShaderNodeMath')
-    user_location = group.nodes.new(type='ShaderNodeCombineXYZ')
-
-    perspective_1 = group.nodes.new(type='ShaderNodeSeparateXYZ')
-    perspective_2 = group.nodes.new(type='ShaderNodeMath')
-    perspective_3 = group.nodes.new(type='ShaderNodeMath')
-    perspective_4 = group.nodes.new(type='ShaderNodeCombineXYZ')
-    zoom_3 = group.nodes.new(type='ShaderNodeVectorMath')
-    lens_shift_2 = group.nodes.new(type='ShaderNodeVectorMath')
-
-    user_translate = group.nodes.new(type='ShaderNodeVectorMath')
-    user_rotate = group.nodes.new(type='ShaderNodeVectorRotate')
-    aspect_ratio_1 = group.nodes.new(type='ShaderNodeCombineXYZ')
-    aspect_ratio_2 = group.nodes.new(type='ShaderNodeCombineXYZ')
-    aspect_ratio_div = group.nodes.new(type='ShaderNodeMath')
-    aspect_ratio_lt = group.nodes.new(type='ShaderNodeMath')
-    aspect_ratio_switch = group.nodes.new(type='ShaderNodeMixRGB')
-    user_transforms = group.nodes.new(type='ShaderNodeVectorMath')
-
-    recenter = group.nodes.new(type='ShaderNodeVectorMath')
-    
-    #--------------------
-    # Label the nodes.
-    camera_transform.label = "Camera Transform"
-    lens.label = "Lens"
-    sensor_width.label = "Sensor Width"
-    lens_shift_x.label = "Lens Shift X"
-    lens_shift_y.label = "Lens Shift Y"
-
-    zoom_1.label = "Zoom 1"
-    zoom_2.label = "Zoom 2"
-    lens_shift_1.label = "Lens Shift 1"
-    to_radians.label = "Degrees to Radians"
-    user_location.label = "User Location"
-
-    perspective_1.label = "Perspective 1"
-    perspective_2.label = "Perspective 2"
-    perspective_3.label = "Perspective 3"
-    perspective_4.label = "Perspective 4"
-    zoom_3.label = "Zoom 3"
-    lens_shift_2.label = "Lens Shift 2"
-
-    user_translate.label = "User Translate"
-    user_rotate.label = "User Rotate"
-
-    aspect_ratio_1.label = "Aspect Ratio 1"
-    aspect_ratio_2.label = "Aspect Ratio 2"
-    aspect_ratio_div.label = "Divide"
-    aspect_ratio_lt.label = "Less Than"
-    aspect_ratio_switch.label = "Aspect Ratio Switch"
-
-    user_transforms.label = "User Transforms"
-
-    recenter.label = "Recenter"
-
-    #---------------------
-    # Position the nodes.
-    hs = 250.0
-    x = 0.0
-
-    camera_transform.location = (x, 0.0)
-    lens.location = (x, -700.0)
-    sensor_width.location = (x, -900.0)
-    lens_shift_x.location = (x, -1100.0)
-    lens_shift_y.location = (x, -1300.0)
-    input.location = (x, -1500.0)
-
-    x += hs
-    zoom_1.location = (x, -700.0)
-    lens_shift_1.location = (x, -1100.0)
-    to_radians.location = (x, -1500.0)
-    user_location.location = (x, -1700.0)
-
-    x += hs
-    zoom_2.location = (x, -700.0)
-
-    x += hs
-    perspective_1.location = (x, 0.0)
-
-    x += hs
-    perspective_2.location = (x, 0.0)
-    perspective_3.location = (x, -200.0)
-
-    x += hs
-    perspective_4.location = (x, 0.0)
-
-    x += hs
-    zoom_3.location = (x, 0.0)
-
-    x += hs
-    lens_shift_2.location = (x, 0.0)
-    aspect_ratio_div.location = (x, -850.0)
-
-    x += hs
-    user_translate.location = (x, 0.0)
-    aspect_ratio_lt.location = (x, -500.0)
-    aspect_ratio_1.location = (x, -700.0)
-    aspect_ratio_2.location = (x, -850.0)
-
-    x += hs
-    user_rotate.location = (x, 0.0)
-    aspect_ratio_switch.location = (x, -600.0)
-
-    x += hs
-    user_transforms.location = (x, 0.0)
-
-    x += hs
-    recenter.location = (x, 0.0)
-
-    x += hs
-    output.location = (x, 0.0)
-
-    #---------------------
-    # Set up the drivers.
-
-    drv_lens = lens.outputs['Value'].driver_add("default_value").driver
-    drv_lens.type = 'SUM'
-    var = drv_lens.variables.new()
-    var.type = 'SINGLE_PROP'
-    var.targets[0].id_type = 'CAMERA'
-    var.targets[0].id = camera.data
-    var.targets[0].data_path = 'lens'
-
-    drv_width = sensor_width.outputs['Value'].driver_add("default_value").driver
-    drv_width.type = 'SUM'
-    var = drv_width.variables.new()
-    var.type = 'SINGLE_PROP'
-    var.targets[0].id_type = 'CAMERA'
-    var.targets[0].id = camera.data
-    var.targets[0].data_path = 'sensor_width'
-
-    drv_shift_x = lens_shift_x.outputs['Value'].driver_add("default_value").driver
-    drv_shift_x.type = 'SUM'
-    var = drv_shift_x.variables.new()
-    var.type = 'SINGLE_PROP'
-    var.targets[0].id_type = 'CAMERA'
-    var.targets[0].id = camera.data
-    var.targets[0].data_path = 'shift_x'
-
-    drv_shift_y = lens_shift_y.outputs['Value'].driver_add("default_value").driver
-    drv_shift_y.type = 'SUM'
-    var = drv_shift_y.variables.new()
-    var.type = 'SINGLE_PROP'
-    var.targets[0].id_type = 'CAMERA'
-    var.targets[0].id = camera.data
-    var.targets[0].data_path = 'shift_y'
-
-    #----------------------
-    # Configure the nodes.
-    camera_transform.object = camera
-
-    zoom_1.operation = 'DIVIDE'
-    zoom_1.use_clamp = False
-    zoom_2.operation = 'MULTIPLY'
-    zoom_2.use_clamp = False
-    zoom_2.inputs[1].default_value = -1.0
-    lens_shift_1.inputs[2].default_value = 0.0
-    to_radians.operation = 'MULTIPLY'
-    to_radians.use_clamp = False
-    to_radians.inputs[1].default_value = math.pi / 180.0
-    user_location.inputs[2].default_value = 0.0
-
-    perspective_2.operation = 'DIVIDE'
-    perspective_2.use_clamp = False
-    perspective_3.operation = 'DIVIDE'
-    perspective_3.use_clamp = False
-    zoom_3.operation = 'MULTIPLY'
-    lens_shift_2.operation = 'SUBTRACT'
-
-    user_translate.operation = 'SUBTRACT'
-    user_rotate.rotation_type = 'Z_AXIS'
-    user_rotate.invert = False
-    user_rotate.inputs['Center'].default_value = (0.0, 0.0, 0.0)
-    aspect_ratio_1.inputs['X'].default_value = 1.0
-    aspect_ratio_1.inputs['Z'].default_value = 0.0
-    aspect_ratio_2.inputs['Y'].default_value = 1.0
-    aspect_ratio_2.inputs['Z'].default_value = 0.0
-    aspect_ratio_div.operation = 'DIVIDE'
-    aspect_ratio_div.inputs[0].default_value = 1.0
-    aspect_ratio_lt.operation = 'LESS_THAN'
-    aspect_ratio_lt.inputs[1].default_value = 1.0
-    aspect_ratio_switch.blend_type = 'MIX'
-    aspect_ratio_switch.use_clamp = False
-
-    user_transforms.operation = 'MULTIPLY'
-
-    recenter.operation = 'ADD'
-    recenter.inputs[1].default_value = (0.5, 0.5, 0.0)
-
-    #--------------------
-    # Hook up the nodes.
-    group.links.new(camera_transform.outputs['Object'], perspective_1.inputs['Vector'])
-    group.links.new(lens.outputs['Value'], zoom_1.inputs[0])
-    group.links.new(sensor_width.outputs['Value'], zoom_1.inputs[1])
-    group.links.new(zoom_1.outputs['Value'], zoom_2.inputs[0])
-    group.links.new(zoom_2.outputs['Value'], zoom_3.inputs[1])
-    group.links.new(lens_shift_x.outputs['Value'], lens_shift_1.inputs['X'])
-    group.links.new(lens_shift_y.outputs['Value'], lens_shift_1.inputs['Y'])
-    group.links.new(lens_shift_1.outputs['Vector'], lens_shift_2.inputs[1])
-
-    group.links.new(input.outputs['Aspect Ratio'], aspect_ratio_1.inputs['Y'])
-    group.links.new(input.outputs['Aspect Ratio'], aspect_ratio_div.inputs[1])
-    group.links.new(input.outputs['Aspect Ratio'], aspect_ratio_lt.inputs[0])
-    group.links.new(input.outputs['Rotation'], to_radians.inputs[0])
-    group.links.new(to_radians.outputs['Value'], user_rotate.inputs['Angle'])
-    group.links.new(input.outputs['Loc X'], user_location.inputs['X'])
-    group.links.new(input.outputs['Loc Y'], user_location.inputs['Y'])
-    group.links.new(user_location.outputs['Vector'], user_translate.inputs[1])
-
-    group.links.new(perspective_1.outputs['X'], perspective_2.inputs[0])
-    group.links.new(perspective_1.outputs['Y'], perspective_3.inputs[0])
-    group.links.new(perspective_1.outputs['Z'], perspective_2.inputs[1])
-    group.links.new(perspective_1.outputs['Z'], perspective_3.inputs[1])
-    group.links.new(perspective_1.outputs['Z'], perspective_4.inputs['Z'])
-    group.links.new(perspective_2.outputs['Value'], perspective_4.inputs['X'])
-    group.links.new(perspective_3.outputs['Value'], perspective_4.inputs['Y'])
-    group.links.new(perspective_4.outputs['Vector'], zoom_3.inputs[0])
-    group.links.new(zoom_3.outputs['Vector'], lens_shift_2.inputs[0])
-    group.links.new(lens_shift_2.outputs['Vector'], user_translate.inputs[0])
-
-    group.links.new(aspect_ratio_div.outputs[0], aspect_ratio_2.inputs['X'])
-    group.links.new(aspect_ratio_1.outputs[0], aspect_ratio_switch.inputs[1])
-    group.links.new(aspect_ratio_2.outputs[0], aspect_ratio_switch.inputs[2])
-    group.links.new(aspect_ratio_lt.outputs[0], aspect_ratio_switch.inputs[0])
-
-    group.links.new(user_translate.outputs['Vector'], user_rotate.inputs['Vector'])
-    group.links.new(user_rotate.outputs['Vector'], user_transforms.inputs[0])
-    group.links.new(aspect_ratio_switch.outputs[0], user_transforms.inputs[1])
-    group.links.new(user_transforms.outputs['Vector'], recenter.inputs[0])
-
-    group.links.new(recenter.outputs['Vector'], output.inputs['Vector'])
+    # If it already exists and is up to date, just return it.
+    group = current_group(NAME, VERTEX_PROJECTION_GROUP_VERSION)
+    if group != None:
+        return group
 
-    return group
+    return build_group(NAME, VERTEX_PROJECTION_GROUP_SPEC, VERTEX_PROJECTION_GROUP_VERSION)
@@ -0,0 +1,17 @@
+import os
+import sys
+import types
+
+# The addon's own `__init__.py` needs Blender, but the helper modules that
+# the tests cover don't.  So the addon directory is registered as a bare
+# `compify` package (without running its `__init__.py`) whose submodules
+# can be imported as usual.  It's registered under the directory's own
+# name as well, which is what pytest imports the directory as.
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "compify" not in sys.modules:
+    package = types.ModuleType("compify")
+    package.__file__ = os.path.join(ADDON_DIR, "__init__.py")
+    package.__path__ = [ADDON_DIR]
+    sys.modules["compify"] = package
+    sys.modules.setdefault(os.path.basename(ADDON_DIR), package)
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+# Minimal stand-ins for the Blender data that the helper modules read,
+# with just the attributes and bulk access methods they use.
+
+
+# Stands in for a mesh element collection, with bulk access to some
+# attributes of its elements.
+class FakeCollection:
+    def __init__(self, count, **attributes):
+        self.count = count
+        self.attributes = {name: np.asarray(values) for name, values in attributes.items()}
+
+    def __len__(self):
+        return self.count
+
+    def foreach_get(self, attribute, array):
+        array[:] = self.attributes[attribute].astype(array.dtype).ravel()
+
+    def foreach_set(self, attribute, array):
+        self.attributes[attribute] = np.array(array).reshape(self.attributes[attribute].shape)
+
+
+# Stands in for a mesh.  Like Blender's data, it's hashable and only equal
+# to itself.
+class FakeMesh(SimpleNamespace):
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+
+# Stands in for a 4x4 transform matrix.
+class FakeMatrix:
+    def __init__(self, rows):
+        self.rows = np.array(rows, dtype=np.float64)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.rows if dtype == None else self.rows.astype(dtype)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def inverted(self):
+        return FakeMatrix(np.linalg.inv(self.rows))
+
+    def to_3x3(self):
+        return self.rows[:3, :3]
+
+
+def translation(x, y, z, scale=1.0):
+    matrix = np.identity(4) * scale
+    matrix[3, 3] = 1.0
+    matrix[:3, 3] = (x, y, z)
+    return FakeMatrix(matrix)
+
+
+# A mesh object made of quads, given the vertex indices and UVs of each
+# quad's corners (in a UV layer named "UV"), and optionally the area of
+# each quad.
+def fake_quad_object(quad_vertices, quad_uvs, areas=None, matrix_world=None):
+    count = len(quad_vertices)
+    mesh = FakeMesh(
+        loops=FakeCollection(count * 4, vertex_index=np.reshape(quad_vertices, -1)),
+        polygons=FakeCollection(
+            count,
+            loop_start=np.arange(count) * 4,
+            loop_total=[4] * count,
+            area=np.ones(count) if areas == None else areas,
+        ),
+        uv_layers={"UV": SimpleNamespace(data=FakeCollection(count * 4, uv=np.reshape(quad_uvs, (-1, 2))))},
+    )
+    return SimpleNamespace(data=mesh, matrix_world=matrix_world if matrix_world != None else translation(0, 0, 0))
+
+
+# The corners of a square in UV space, counter-clockwise.
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size]]
+
+
+def empty_object():
+    return fake_quad_object(np.empty((0, 4)), np.empty((0, 4, 2)))
+
+
+def object_uvs(obj):
+    return obj.data.uv_layers["UV"].data.attributes["uv"]
@@ -0,0 +1,144 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from fakes import translation
+from compify.camera_utils import \
+    render_aspect, \
+    project_points, \
+    bounding_box_corners, \
+    frame_rects, \
+    objects_in_frame, \
+    frame_coverage, \
+    camera_texel_weights, \
+    texel_density_resolution
+
+
+# A camera at the origin looking down -Z, whose frame is 1 unit wide at a
+# distance of 2 units.
+def fake_camera(shift_x=0.0, shift_y=0.0):
+    return SimpleNamespace(
+        matrix_world=translation(0, 0, 0),
+        data=SimpleNamespace(lens=72.0, sensor_width=36.0, shift_x=shift_x, shift_y=shift_y),
+    )
+
+
+# An object whose bounding box is a cube of the given size, or a square
+# facing the camera if `flat` is True.
+def fake_box(location, size=1.0, flat=False):
+    half = size * 0.5
+    depth = 0.0 if flat else half
+    corners = [(x, y, z) for x in [-half, half] for y in [-half, half] for z in [-depth, depth]]
+    return SimpleNamespace(matrix_world=translation(*location), bound_box=corners)
+
+
+def fake_scene(resolution_x=200, resolution_y=100, percentage=100, frame_range=(1, 10)):
+    scene = SimpleNamespace(
+        render=SimpleNamespace(
+            resolution_x=resolution_x,
+            resolution_y=resolution_y,
+            resolution_percentage=percentage,
+            pixel_aspect_x=1.0,
+            pixel_aspect_y=1.0,
+        ),
+        frame_start=frame_range[0],
+        frame_end=frame_range[1],
+        frame_current=frame_range[0],
+        frames_set=[],
+    )
+
+    def frame_set(frame):
+        scene.frame_current = frame
+        scene.frames_set.append(frame)
+    scene.frame_set = frame_set
+    return scene
+
+
+def test_render_aspect():
+    scene = fake_scene(1920, 1080)
+    assert np.isclose(render_aspect(scene), 16.0 / 9.0)
+    scene.render.pixel_aspect_x = 2.0
+    assert np.isclose(render_aspect(scene), 32.0 / 9.0)
+
+
+def test_project_points():
+    camera = fake_camera()
+    uvs, depths = project_points([[0, 0, -2], [0.5, 0, -2], [0, 0.5, -4], [0, 0, 3]], camera, 1.0)
+    assert np.allclose(uvs[:3], [[0.5, 0.5], [1.0, 0.5], [0.5, 0.75]])
+    assert np.allclose(depths, [2.0, 2.0, 4.0, -3.0])
+    # Points behind the camera still project to finite coordinates.
+    assert np.all(np.isfinite(uvs))
+
+
+def test_project_points_aspect_and_shift():
+    # The frame's longer side spans 0-1.
+    uvs, _ = project_points([[0.5, 0.25, -2]], fake_camera(), 2.0)
+    assert np.allclose(uvs, [[1.0, 1.0]])
+    uvs, _ = project_points([[0.25, 0.5, -2]], fake_camera(), 0.5)
+    assert np.allclose(uvs, [[1.0, 1.0]])
+    uvs, _ = project_points([[0, 0, -2]], fake_camera(shift_x=0.25, shift_y=-0.25), 1.0)
+    assert np.allclose(uvs, [[0.25, 0.75]])
+
+
+def test_bounding_box_corners():
+    corners = bounding_box_corners([fake_box((1, 2, 3), size=2.0)])
+    assert corners.shape == (1, 8, 3)
+    assert np.allclose(corners[0].min(axis=0), [0, 1, 2])
+    assert np.allclose(corners[0].max(axis=0), [2, 3, 4])
+    assert bounding_box_corners([]).shape == (0, 8, 3)
+
+
+def test_frame_rects_and_coverage():
+    camera = fake_camera()
+    objects = [
+        # Filling the left half of the frame, and poking out of it.
+        fake_box((-0.5, 0, -2), size=1.0),
+        # Off to the side, behind the camera, and partly behind it.
+        fake_box((10, 0, -2), size=1.0),
+        fake_box((0, 0, 5), size=1.0),
+        fake_box((0, 0, 0), size=1.0),
+    ]
+    rects = frame_rects(objects, camera, 1.0)
+
+    assert np.allclose(rects[0, [0, 2]], [0.0, 0.5])
+    assert rects[0, 1] == 0.0 and rects[0, 3] == 1.0
+    assert rects[1, 0] == rects[1, 2] == 1.0
+    assert np.all(rects[2] == 0.0)
+    assert np.allclose(rects[3], [0.0, 0.0, 1.0, 1.0])
+
+    coverage = frame_coverage(objects, camera, 1.0)
+    assert np.allclose(coverage, [0.5, 0.0, 0.0, 1.0])
+    assert objects_in_frame(objects, camera, 1.0) == [objects[0], objects[3]]
+    assert objects_in_frame([], camera, 1.0) == []
+
+
+def test_camera_texel_weights():
+    scene = fake_scene(200, 100, percentage=50, frame_range=(1, 20))
+    scene.frame_current = 7
+    camera = fake_camera()
+    # A square covering an eighth of the (2:1) frame, and a box out of
+    # view.
+    objects = [fake_box((0, 0, -2), size=0.25, flat=True), fake_box((10, 0, -2))]
+    weights = camera_texel_weights(scene, camera, objects, 2.0, samples=4)
+
+    pixels = 100 * 50
+    assert np.isclose(weights[0], 0.125 * pixels * 2.0)
+    assert np.isclose(weights[1], weights[0] * 0.01)
+    assert scene.frames_set == [1, 7, 14, 20, 7]
+    assert scene.frame_current == 7
+
+
+def test_camera_texel_weights_nothing_seen():
+    weights = camera_texel_weights(fake_scene(), fake_camera(), [fake_box((10, 0, -2))], 1.0)
+    assert list(weights) == [1.0]
+
+
+def test_texel_density_resolution():
+    # Half of a 1024 x 1024 tile's texels, at half packing efficiency.
+    assert texel_density_resolution([2**18, 2**18 - 1000], 1) == 1024
+    assert texel_density_resolution([2**18, 2**18 + 1000], 1) == 1280
+    assert texel_density_resolution([2**20, 2**20], 4) == 1024
+    assert texel_density_resolution([1.0], 1) == 256
+    assert texel_density_resolution([1.0], 1, min_res=512) == 512
+    assert texel_density_resolution([2.0**40], 1) == 2**14
+    assert texel_density_resolution([], 1) == 64
@@ -0,0 +1,169 @@
+import numpy as np
+
+from compify import denoise
+from compify.denoise import \
+    tiles_touching, \
+    padded_window, \
+    bilateral_denoise, \
+    fill_margin, \
+    island_labels
+
+from fakes import fake_quad_object, square, object_uvs
+
+
+# Two square islands (labels 1 and 2) with different constant lighting
+# plus noise, in a 48x48 bake.
+def noisy_islands(seed=0):
+    rng = np.random.default_rng(seed)
+    labels = np.zeros((48, 48), dtype=np.int32)
+    labels[4:20, 4:20] = 1
+    labels[24:44, 8:40] = 2
+    pixels = np.zeros((48, 48, 4), dtype=np.float32)
+    pixels[..., 3] = 1.0
+    pixels[labels == 1, :3] = 0.25
+    pixels[labels == 2, :3] = 2.0
+    pixels[labels > 0, :3] *= np.exp2(rng.normal(0.0, 0.1, ((labels > 0).sum(), 1))).astype(np.float32)
+    return pixels, labels
+
+
+def test_tiles_touching(monkeypatch):
+    monkeypatch.setattr(denoise, "TILE_SIZE", 4)
+    mask = np.zeros((10, 10), dtype=bool)
+    mask[5, 5] = True
+    assert list(tiles_touching(mask, 0)) == [(4, 8, 4, 8)]
+    assert list(tiles_touching(mask, 1)) == [(4, 8, 4, 8)]
+    assert list(tiles_touching(mask, 2)) == [(0, 4, 0, 4), (0, 4, 4, 8), (4, 8, 0, 4), (4, 8, 4, 8)]
+    assert list(tiles_touching(mask, 3)) == [
+        (0, 4, 0, 4), (0, 4, 4, 8), (0, 4, 8, 10),
+        (4, 8, 0, 4), (4, 8, 4, 8), (4, 8, 8, 10),
+        (8, 10, 0, 4), (8, 10, 4, 8), (8, 10, 8, 10),
+    ]
+    assert list(tiles_touching(np.zeros((10, 10), dtype=bool), 3)) == []
+
+
+def test_padded_window():
+    array = np.arange(1, 26).reshape(5, 5)
+    window = padded_window(array, (0, 2, 3, 5), 1)
+    assert window.shape == (4, 4)
+    assert np.array_equal(window[0], [0, 0, 0, 0])
+    assert np.array_equal(window[:, 3], [0, 0, 0, 0])
+    assert np.array_equal(window[1:, :3], array[:3, 2:])
+
+    rgb = np.ones((5, 5, 3))
+    assert padded_window(rgb, (2, 5, 2, 5), 2).shape == (7, 7, 3)
+
+
+def test_bilateral_denoise_reduces_noise_within_islands():
+    pixels, labels = noisy_islands()
+    mask = labels > 0
+    denoised = bilateral_denoise(pixels, labels, mask)
+
+    for label, value in [(1, 0.25), (2, 2.0)]:
+        island = labels == label
+        before = np.log2(pixels[island, 0] / value).std()
+        after = np.log2(denoised[island, 0] / value).std()
+        assert after < before * 0.6
+        # No light leaks in from the other island or the gutter.
+        assert abs(np.log2(denoised[island, 0] / value).mean()) < 0.05
+    assert np.array_equal(denoised[~mask], pixels[~mask])
+    assert np.array_equal(denoised[..., 3], pixels[..., 3])
+
+
+def test_bilateral_denoise_only_changes_masked_texels():
+    pixels, labels = noisy_islands()
+    mask = labels == 2
+    denoised = bilateral_denoise(pixels, labels, mask)
+    assert np.array_equal(denoised[~mask], pixels[~mask])
+    assert not np.array_equal(denoised[mask], pixels[mask])
+
+
+def test_bilateral_denoise_does_nothing():
+    pixels, labels = noisy_islands()
+    assert bilateral_denoise(pixels, labels, labels > 0, strength=0.0) is pixels
+    assert bilateral_denoise(pixels, labels, np.zeros_like(labels, dtype=bool)) is pixels
+    flat = np.ones_like(pixels)
+    assert bilateral_denoise(flat, labels, labels > 0) is flat
+
+
+def test_bilateral_denoise_tiling_doesnt_change_result(monkeypatch):
+    pixels, labels = noisy_islands()
+    mask = labels > 0
+    whole = bilateral_denoise(pixels, labels, mask)
+    monkeypatch.setattr(denoise, "TILE_SIZE", 7)
+    tiled = bilateral_denoise(pixels, labels, mask)
+    assert np.allclose(tiled, whole, rtol=1.0e-6, atol=0.0)
+
+
+def test_fill_margin():
+    pixels = np.zeros((12, 12, 4), dtype=np.float32)
+    covered = np.zeros((12, 12), dtype=bool)
+    covered[4:8, 4:8] = True
+    pixels[4:8, 4:8] = 3.0
+    filled = fill_margin(pixels, covered, covered, 2)
+
+    # Two rings around the island are filled, and nothing further out.
+    ring = np.zeros((12, 12), dtype=bool)
+    ring[2:10, 2:10] = True
+    ring[4:8, 4:8] = False
+    assert np.all(filled[ring & (filled[..., 0] > 0.0)] == 3.0)
+    assert np.all(filled[3, 4:8] == 3.0) and np.all(filled[2, 4:8] == 3.0)
+    assert np.all(filled[8:10, 4:8] == 3.0)
+    assert np.all(filled[:, :2] == 0.0) and np.all(filled[10:] == 0.0)
+    assert np.array_equal(filled[covered], pixels[covered])
+    assert np.array_equal(fill_margin(pixels, covered, covered, 0), pixels)
+
+
+def test_fill_margin_leaves_unbaked_islands_alone():
+    pixels = np.zeros((12, 12, 4), dtype=np.float32)
+    covered = np.zeros((12, 12), dtype=bool)
+    covered[2:5, 2:5] = True
+    covered[2:5, 6:9] = True
+    baked = covered.copy()
+    baked[:, 6:] = False
+    pixels[2:5, 2:5] = 1.0
+    pixels[2:5, 6:9] = 5.0
+    filled = fill_margin(pixels, covered, baked, 3)
+
+    # The gutter between the islands is filled from the baked one, but the
+    # unbaked island keeps its texels and its own margin.
+    assert np.array_equal(filled[2:5, 6:9], pixels[2:5, 6:9])
+    assert np.all(filled[2:5, 5] == 1.0)
+    assert np.all(filled[2:5, 9] == 0.0)
+
+
+def test_fill_margin_tiling_doesnt_change_result(monkeypatch):
+    pixels, labels = noisy_islands()
+    covered = labels > 0
+    baked = labels == 2
+    whole = fill_margin(pixels, covered, baked, 4)
+    monkeypatch.setattr(denoise, "TILE_SIZE", 5)
+    tiled = fill_margin(pixels, covered, baked, 4)
+    assert np.array_equal(tiled, whole)
+
+
+def test_island_labels_reuses_rasterization(monkeypatch):
+    calls = []
+    rasterize = denoise.rasterize_uv_islands
+    def counting_rasterize(*args):
+        calls.append(args)
+        return rasterize(*args)
+    monkeypatch.setattr(denoise, "rasterize_uv_islands", counting_rasterize)
+    monkeypatch.setattr(denoise, "island_cache", None)
+
+    obj = fake_quad_object([[0, 1, 2, 3]], [square(0.25, 0.25, 0.5)])
+    obj.name = "Proxy"
+    labels, label_objects = island_labels([obj], "UV", 8, 8)
+    assert labels[4, 4] == 1
+    assert list(label_objects) == [-1, 0]
+
+    again, _ = island_labels([obj], "UV", 8, 8)
+    assert len(calls) == 1
+    assert np.array_equal(again, labels)
+
+    # A different bake size or UV layout needs rasterizing again.
+    island_labels([obj], "UV", 16, 16)
+    assert len(calls) == 2
+    object_uvs(obj)[:] = square(0.0, 0.0, 0.25)
+    moved, _ = island_labels([obj], "UV", 16, 16)
+    assert len(calls) == 3
+    assert moved[1, 1] == 1 and moved[8, 8] == 0
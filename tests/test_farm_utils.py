@@ -0,0 +1,31 @@
+from compify.farm_utils import \
+    frame_chunks, \
+    parse_progress_line, \
+    progress_line, \
+    threads_per_worker
+
+
+def test_frame_chunks():
+    assert frame_chunks(1, 10, 4) == [(1, 4), (5, 8), (9, 10)]
+    assert frame_chunks(1, 8, 4) == [(1, 4), (5, 8)]
+    assert frame_chunks(3, 3, 10) == [(3, 3)]
+    assert frame_chunks(5, 4, 10) == []
+
+
+def test_threads_per_worker():
+    assert threads_per_worker(3, 4, cpu_count=16) == 3
+    assert threads_per_worker(0, 4, cpu_count=16) == 4
+    assert threads_per_worker(0, 3, cpu_count=16) == 5
+    assert threads_per_worker(0, 32, cpu_count=16) == 1
+
+
+def test_progress_round_trip():
+    assert parse_progress_line(progress_line(12, "bake", "camera moved") + "\n") == (12, "bake")
+    assert parse_progress_line(progress_line(7, "exists", "already rendered")) == (7, "exists")
+    assert parse_progress_line(progress_line(3, "reuse")) == (3, "reuse")
+
+
+def test_parse_other_output():
+    assert parse_progress_line("Fra:12 Mem:120M | Rendering") == None
+    assert parse_progress_line("") == None
+    assert parse_progress_line(progress_line("x", "bake")) == None
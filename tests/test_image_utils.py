@@ -0,0 +1,244 @@
+import os
+
+import numpy as np
+
+from compify.image_utils import \
+    LOG_ENCODE_STOPS, \
+    IMAGE_FILE_MAGIC, \
+    IMAGE_FILE_TRAILER, \
+    encode_log8, \
+    decode_log8, \
+    quantize_half, \
+    relative_error, \
+    image_user_frame, \
+    downsample_pixels, \
+    resize_pixels_nearest, \
+    write_exr, \
+    saved_image_ok, \
+    AsyncFileWriter
+
+
+def lighting(height=8, width=16, seed=0):
+    rng = np.random.default_rng(seed)
+    pixels = np.ones((height, width, 4), dtype=np.float32)
+    pixels[..., :3] = np.exp2(rng.uniform(-6.0, 3.0, (height, width, 3)))
+    return pixels
+
+
+def test_log8_round_trip_error_is_bounded():
+    pixels = lighting()
+    encoded, log_min, log_max = encode_log8(pixels)
+    decoded = decode_log8(encoded, log_min, log_max)
+
+    assert decoded.shape == pixels.shape
+    assert decoded.dtype == np.float32
+    # Half an 8-bit step of the encoded range, in stops.
+    max_stops = 0.5 * LOG_ENCODE_STOPS / 255.0
+    _, max_error = relative_error(pixels, decoded)
+    assert max_error <= 2.0 ** max_stops - 1.0 + 1.0e-5
+
+
+def test_log8_encoding_range():
+    pixels = lighting()
+    encoded, log_min, log_max = encode_log8(pixels)
+
+    assert log_max == np.float32(np.log2(pixels[..., :3].max()))
+    assert log_max - log_min == LOG_ENCODE_STOPS
+    assert encoded[..., :3].min() >= 0.0
+    assert encoded[..., :3].max() == 1.0
+    assert np.all(encoded[..., 3] == 1.0)
+
+
+def test_log8_clamps_values_below_the_range():
+    pixels = lighting()
+    pixels[0, 0, :3] = 0.0
+    pixels[0, 1, :3] = 2.0 ** -30
+    encoded, log_min, log_max = encode_log8(pixels)
+    decoded = decode_log8(encoded, log_min, log_max)
+
+    assert np.all(encoded[0, :2, :3] == 0.0)
+    assert np.allclose(decoded[0, :2, :3], 2.0 ** log_min)
+
+
+def test_log8_all_black():
+    pixels = np.zeros((4, 4, 4), dtype=np.float32)
+    encoded, log_min, log_max = encode_log8(pixels)
+    decoded = decode_log8(encoded, log_min, log_max)
+
+    assert np.all(np.isfinite(encoded))
+    assert np.all(decoded[..., :3] <= 1.0e-8)
+
+
+def test_log8_decode_quantizes_to_8_bits():
+    encoded = np.zeros((1, 3, 4), dtype=np.float32)
+    encoded[0, :, :3] = np.array([0.5 / 255.0 - 1.0e-4, 0.5 / 255.0 + 1.0e-4, 1.5])[:, None]
+    decoded = decode_log8(encoded, -12.0, 0.0)
+
+    assert np.allclose(decoded[0, 0, :3], 2.0 ** -12.0)
+    assert np.allclose(decoded[0, 1, :3], 2.0 ** (12.0 / 255.0 - 12.0))
+    assert np.allclose(decoded[0, 2, :3], 1.0)
+
+
+def test_quantize_half():
+    pixels = np.array([[[1.0, 1.0001, 65504.0, 1.0e-8]]], dtype=np.float32)
+    quantized = quantize_half(pixels)
+
+    assert quantized.dtype == np.float32
+    assert quantized[0, 0, 0] == 1.0
+    assert quantized[0, 0, 1] == 1.0
+    assert quantized[0, 0, 2] == 65504.0
+
+
+def test_relative_error_ignores_black_pixels():
+    pixels = np.zeros((1, 2, 4), dtype=np.float32)
+    pixels[0, 1, :3] = 2.0
+    stored = pixels.copy()
+    stored[0, 0, :3] = 5.0
+    stored[0, 1, :3] = 2.5
+
+    assert relative_error(pixels, stored) == (0.25, 0.25)
+    assert relative_error(np.zeros_like(pixels), stored) == (0.0, 0.0)
+
+
+def test_write_exr_layout(tmp_path):
+    pixels = lighting(height=3, width=5)
+    path = str(tmp_path / "lighting.exr")
+    write_exr(pixels, path, half=False)
+
+    # Uncompressed scanlines, top to bottom, each made up of its y
+    # coordinate, its data size, and then the B, G, and R planes.
+    line_size = 5 * 3 * 4
+    with open(path, "rb") as f:
+        data = f.read()
+    blocks = np.frombuffer(data[-3 * (8 + line_size):], dtype=np.uint8).reshape(3, 8 + line_size)
+    assert list(blocks[:, :4].copy().view("<i4").ravel()) == [0, 1, 2]
+    assert list(blocks[:, 4:8].copy().view("<i4").ravel()) == [line_size] * 3
+    planes = blocks[:, 8:].copy().view("<f4").reshape(3, 3, 5)
+    assert np.array_equal(planes.transpose(0, 2, 1)[..., ::-1], pixels[::-1, :, :3])
+
+
+def test_write_exr_half(tmp_path):
+    pixels = lighting(height=4, width=4)
+    full_path = str(tmp_path / "full.exr")
+    half_path = str(tmp_path / "half.exr")
+    write_exr(pixels, full_path, half=False)
+    write_exr(pixels, half_path)
+
+    assert os.path.getsize(full_path) - os.path.getsize(half_path) == 4 * 4 * 3 * 2
+    assert saved_image_ok(half_path, 'OPEN_EXR')
+
+
+def test_saved_image_ok_exr(tmp_path):
+    path = str(tmp_path / "lighting.exr")
+    write_exr(lighting(), path)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    assert saved_image_ok(path, 'OPEN_EXR')
+    assert saved_image_ok(path)
+    assert not saved_image_ok(path, 'PNG')
+
+    # Truncated in the pixels, the offset table, and the header.
+    for size in [len(data) - 1, len(data) - 500, 400, 200, 8]:
+        with open(path, "wb") as f:
+            f.write(data[:size])
+        assert not saved_image_ok(path, 'OPEN_EXR'), size
+
+    # Offset table not filled in yet.
+    header_size = len(data) - 8 * 8 - 8 * (8 + 16 * 3 * 2)
+    with open(path, "wb") as f:
+        f.write(data[:header_size] + bytes(8 * 8) + data[header_size + 8 * 8:])
+    assert not saved_image_ok(path, 'OPEN_EXR')
+
+
+def test_saved_image_ok_png(tmp_path):
+    path = str(tmp_path / "frame.png")
+    data = IMAGE_FILE_MAGIC['PNG'][0] + bytes(100) + IMAGE_FILE_TRAILER['PNG']
+    with open(path, "wb") as f:
+        f.write(data)
+    assert saved_image_ok(path, 'PNG')
+
+    with open(path, "wb") as f:
+        f.write(data[:-1])
+    assert not saved_image_ok(path, 'PNG')
+
+    with open(path, "wb") as f:
+        f.write(IMAGE_FILE_MAGIC['PNG'][0][:4])
+    assert not saved_image_ok(path, 'PNG')
+
+
+def test_saved_image_ok_missing_or_empty(tmp_path):
+    path = str(tmp_path / "frame.png")
+    assert not saved_image_ok(path)
+
+    open(path, "wb").close()
+    assert not saved_image_ok(path)
+    assert not saved_image_ok(str(tmp_path))
+
+
+def test_image_user_frame():
+    # A 5 frame sequence starting on scene frame 10.  Before it starts,
+    # Blender shows frame 0.
+    assert image_user_frame(10, 10, 5, 0, False) == 1
+    assert image_user_frame(12, 10, 5, 0, False) == 3
+    assert image_user_frame(20, 10, 5, 0, False) == 5
+    assert image_user_frame(5, 10, 5, 0, False) == 0
+    assert image_user_frame(12, 10, 5, 100, False) == 103
+    assert image_user_frame(15, 10, 5, 0, True) == 1
+    assert image_user_frame(9, 10, 5, 0, True) == 5
+    assert image_user_frame(3, 10, 5, 0, True) == 4
+    assert image_user_frame(12, 10, 0, 0, False) == 0
+
+
+def test_downsample_pixels():
+    pixels = np.arange(4 * 6 * 2, dtype=np.float32).reshape(4, 6, 2)
+    small = downsample_pixels(pixels, 2)
+    assert small.shape == (2, 3, 2)
+    assert small.dtype == np.float32
+    assert np.allclose(small[0, 0], pixels[:2, :2].mean(axis=(0, 1)))
+    assert np.allclose(small[1, 2], pixels[2:, 4:].mean(axis=(0, 1)))
+    assert downsample_pixels(pixels, 1) is pixels
+
+
+def test_downsample_pixels_drops_partial_boxes():
+    pixels = lighting(height=5, width=7)
+    small = downsample_pixels(pixels, 2)
+    assert small.shape == (2, 3, 4)
+    assert np.allclose(small[1, 2], pixels[2:4, 4:6].mean(axis=(0, 1)))
+
+
+def test_resize_pixels_nearest():
+    pixels = np.arange(2 * 3, dtype=np.float32).reshape(2, 3, 1)
+    large = resize_pixels_nearest(pixels, 4, 6)
+    assert large.shape == (4, 6, 1)
+    assert np.array_equal(large[..., 0], [
+        [0, 0, 1, 1, 2, 2],
+        [0, 0, 1, 1, 2, 2],
+        [3, 3, 4, 4, 5, 5],
+        [3, 3, 4, 4, 5, 5],
+    ])
+    assert np.array_equal(resize_pixels_nearest(large, 2, 3), pixels)
+
+
+def test_async_file_writer(tmp_path):
+    def write(path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def fail(path):
+        raise OSError("disk full")
+
+    writer = AsyncFileWriter(max_workers=2, max_pending=2)
+    paths = [os.path.join(str(tmp_path), "{}.bin".format(i)) for i in range(6)]
+    for i, path in enumerate(paths):
+        writer.submit(path, write, path, bytes([i]) * 8)
+    bad_path = os.path.join(str(tmp_path), "bad.bin")
+    writer.submit(bad_path, fail, bad_path)
+    failures = writer.finish()
+
+    for i, path in enumerate(paths):
+        with open(path, "rb") as f:
+            assert f.read() == bytes([i]) * 8
+    assert len(failures) == 1
+    assert failures[0][0] == bad_path
+    assert isinstance(failures[0][1], OSError)
@@ -0,0 +1,87 @@
+import numpy as np
+
+from compify.interpolation import KeyframeSchedule
+
+
+def constant(value):
+    return np.full(16, value, dtype=np.float32)
+
+
+def rendered_frames(schedule, skip_frames=()):
+    frames = []
+    while True:
+        render = schedule.next_render(skip_frames)
+        if render == None:
+            return frames
+        frames.append(render)
+
+
+def test_first_keyframe():
+    schedule = KeyframeSchedule((1, 10), 4, 5.0)
+    assert schedule.next_bake_frame == 1
+    schedule.keyframe_baked(1, constant(1.0))
+    assert schedule.render_queue == []
+    assert schedule.next_bake_frame == 5
+
+
+def test_interval_queues_segment():
+    schedule = KeyframeSchedule((1, 10), 4, 50.0)
+    schedule.keyframe_baked(1, constant(1.0))
+    schedule.keyframe_baked(5, constant(1.2))
+    assert [render[0] for render in schedule.render_queue] == [1, 2, 3, 4]
+    assert [render[3] for render in schedule.render_queue] == [0.0, 0.25, 0.5, 0.75]
+    assert schedule.next_bake_frame == 9
+
+
+def test_last_keyframe_clamped_to_end():
+    schedule = KeyframeSchedule((1, 7), 4, 50.0)
+    schedule.keyframe_baked(1, constant(1.0))
+    schedule.keyframe_baked(5, constant(1.0))
+    assert schedule.next_bake_frame == 7
+    schedule.keyframe_baked(7, constant(1.0))
+    assert schedule.next_bake_frame == None
+    frames = [frame for frame, _ in rendered_frames(schedule)]
+    assert frames == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_threshold_bakes_in_between():
+    schedule = KeyframeSchedule((1, 9), 8, 5.0)
+    schedule.keyframe_baked(1, constant(1.0))
+    schedule.keyframe_baked(9, constant(2.0))
+    assert schedule.render_queue == []
+    assert schedule.next_bake_frame == 5
+
+    # Matches the first keyframe, so its segment gets queued, but still
+    # differs from the last one.
+    schedule.keyframe_baked(5, constant(1.0))
+    assert [render[0] for render in schedule.render_queue] == [1, 2, 3, 4]
+    assert 9 in schedule.future_keys
+    assert schedule.next_bake_frame == 7
+
+    schedule.keyframe_baked(7, constant(1.95))
+    assert schedule.next_bake_frame == 6
+    schedule.keyframe_baked(6, constant(1.95))
+    assert schedule.future_keys == {}
+    assert schedule.next_bake_frame == None
+    frames = [frame for frame, _ in rendered_frames(schedule)]
+    assert frames == [1, 2, 3, 4, 5, 6, 7, 8, 9]
+
+
+def test_next_render_blends():
+    schedule = KeyframeSchedule((1, 5), 4, 100.0)
+    schedule.keyframe_baked(1, constant(1.0))
+    schedule.keyframe_baked(5, constant(2.0))
+    frames = rendered_frames(schedule)
+    assert [frame for frame, _ in frames] == [1, 2, 3, 4, 5]
+    assert np.allclose(frames[0][1], 1.0)
+    assert np.allclose(frames[2][1], 1.5)
+    assert np.allclose(frames[4][1], 2.0)
+
+
+def test_next_render_skips_frames():
+    schedule = KeyframeSchedule((1, 5), 4, 100.0)
+    schedule.keyframe_baked(1, constant(1.0))
+    schedule.keyframe_baked(5, constant(2.0))
+    frames = rendered_frames(schedule, skip_frames={2, 3, 5})
+    assert [frame for frame, _ in frames] == [1, 4]
+    assert np.allclose(frames[1][1], 1.75)
@@ -0,0 +1,138 @@
+import json
+import os
+from types import SimpleNamespace
+
+from compify.image_utils import IMAGE_FILE_MAGIC, IMAGE_FILE_TRAILER
+from compify.journal import journal_path, RenderJournal
+
+
+def fake_scene(directory, frame_start=1, frame_end=5):
+    return SimpleNamespace(
+        frame_start=frame_start,
+        frame_end=frame_end,
+        render=SimpleNamespace(
+            frame_path=lambda frame: os.path.join(directory, "{:04}.png".format(frame)),
+            image_settings=SimpleNamespace(file_format='PNG'),
+        ),
+    )
+
+
+def write_png(path, complete=True):
+    data = IMAGE_FILE_MAGIC['PNG'][0] + bytes(16) + IMAGE_FILE_TRAILER['PNG']
+    with open(path, "wb") as f:
+        f.write(data if complete else data[:-4])
+
+
+def new_journal(directory):
+    path = journal_path(os.path.join(directory, "render_"))
+    return RenderJournal(path, (1, 5), "/shots/shot.blend")
+
+
+def test_journal_path():
+    assert journal_path("/renders/shot_") == "/renders/shot_compify_journal.json"
+    assert journal_path("/renders/shot_", (11, 20)) == "/renders/shot_11-20_compify_journal.json"
+
+
+def test_save_and_load(tmp_path):
+    journal = new_journal(str(tmp_path))
+    journal.frame_started(1)
+    journal.frame_completed(1)
+    journal.frame_started(2)
+
+    with open(journal.path) as f:
+        data = json.load(f)
+    assert data["blend_file"] == "/shots/shot.blend"
+    assert (data["frame_start"], data["frame_end"]) == (1, 5)
+    assert data["completed"] == [1]
+    assert data["in_progress"] == 2
+    assert not os.path.exists(journal.path + ".tmp")
+
+    loaded = new_journal(str(tmp_path))
+    loaded.load()
+    assert loaded.completed == {1}
+    assert loaded.in_progress == 2
+
+
+def test_frame_completed_clears_in_progress(tmp_path):
+    journal = new_journal(str(tmp_path))
+    journal.frame_started(3)
+    journal.frame_completed(3)
+    assert journal.in_progress == None
+    assert journal.completed == {3}
+
+
+def test_load_missing_or_corrupt(tmp_path):
+    journal = new_journal(str(tmp_path))
+    journal.load()
+    assert journal.completed == set()
+    assert journal.in_progress == None
+
+    with open(journal.path, "w") as f:
+        f.write("{\"completed\": [1, 2")
+    journal.completed = {4}
+    journal.in_progress = 4
+    journal.load()
+    assert journal.completed == set()
+    assert journal.in_progress == None
+
+
+def test_save_creates_directory(tmp_path):
+    journal = new_journal(str(tmp_path / "renders"))
+    journal.frame_started(1)
+    assert os.path.isfile(journal.path)
+
+
+def test_existing_frames_skips_in_progress_frame(tmp_path):
+    scene = fake_scene(str(tmp_path))
+    for frame in [1, 2, 3]:
+        write_png(scene.render.frame_path(frame))
+    write_png(scene.render.frame_path(4), complete=False)
+
+    journal = new_journal(str(tmp_path))
+    journal.frame_completed(1)
+    journal.frame_completed(2)
+    # Frame 3 was being saved when the render was interrupted, so its
+    # file can't be trusted even though it looks complete.
+    journal.frame_started(3)
+
+    resumed = new_journal(str(tmp_path))
+    resumed.load()
+    assert resumed.existing_frames(scene) == {1, 2}
+
+
+def test_existing_frames_without_journal(tmp_path):
+    scene = fake_scene(str(tmp_path))
+    write_png(scene.render.frame_path(2))
+    write_png(scene.render.frame_path(6))
+
+    journal = new_journal(str(tmp_path))
+    journal.load()
+    assert journal.existing_frames(scene) == {2}
+
+
+def test_existing_frames_resumes_from_completed(tmp_path):
+    scene = fake_scene(str(tmp_path))
+    for frame in [1, 2, 3, 4]:
+        write_png(scene.render.frame_path(frame))
+
+    journal = new_journal(str(tmp_path))
+    journal.frame_completed(1)
+    journal.frame_completed(2)
+    journal.frame_completed(5)
+
+    # Frames 3 and 4 weren't rendered by this journal's render, and frame
+    # 5's file has gone missing since.
+    resumed = new_journal(str(tmp_path))
+    resumed.load()
+    assert resumed.is_loaded
+    assert resumed.existing_frames(scene) == {1, 2}
+
+
+def test_existing_frames_uses_journal_frame_range(tmp_path):
+    scene = fake_scene(str(tmp_path), frame_start=1, frame_end=10)
+    for frame in range(1, 11):
+        write_png(scene.render.frame_path(frame))
+
+    journal = RenderJournal(journal_path(str(tmp_path) + "/", (3, 6)), (3, 6), "/shots/shot.blend")
+    journal.load()
+    assert journal.existing_frames(scene) == {3, 4, 5, 6}
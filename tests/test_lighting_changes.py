@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from compify.lighting_changes import \
+    bake_input_hash, \
+    bake_reason, \
+    changed_bake_inputs, \
+    light_influence, \
+    proxy_affected, \
+    ProxyBakeTracker
+
+
+def translation(x, y, z):
+    return ((1.0, 0.0, 0.0, x), (0.0, 1.0, 0.0, y), (0.0, 0.0, 1.0, z), (0.0, 0.0, 0.0, 1.0))
+
+
+# A light state like `bake_cache.object_state()` gives.
+def light_state(location, energy=10.0, cutoff_distance=None):
+    properties = [("energy", energy), ("use_custom_distance", cutoff_distance != None)]
+    if cutoff_distance != None:
+        properties.append(("cutoff_distance", cutoff_distance))
+    return (translation(*location), tuple(properties))
+
+
+# A proxy object with a unit cube as its bounding box.
+def fake_proxy(name, location):
+    corners = [(x, y, z) for x in [-0.5, 0.5] for y in [-0.5, 0.5] for z in [-0.5, 0.5]]
+    return SimpleNamespace(name=name, matrix_world=translation(*location), bound_box=corners)
+
+
+def test_changed_bake_inputs():
+    previous = {"World": ("World",), "Light \"Key\"": 1, "Proxy \"Floor\"": 2}
+    current = {"World": ("World",), "Light \"Key\"": 3, "Light \"Fill\"": 4}
+    assert changed_bake_inputs(previous, current) == ["Light \"Fill\"", "Light \"Key\"", "Proxy \"Floor\""]
+    assert changed_bake_inputs(previous, dict(previous)) == []
+    assert changed_bake_inputs({}, {}) == []
+
+
+def test_bake_input_hash():
+    states = {"World": ("World", 1.0), "Bake Settings": (1024, 2)}
+    assert bake_input_hash(states) == bake_input_hash(dict(reversed(list(states.items()))))
+    assert bake_input_hash(states) != bake_input_hash({**states, "World": ("World", 2.0)})
+    assert bake_input_hash({}) == bake_input_hash({})
+
+
+def test_bake_reason():
+    states = {"World": 1, "Bake Settings": 2}
+    assert bake_reason(None, states, True) == (False, "first frame")
+    assert bake_reason(states, states, True) == (True, "no lighting inputs changed")
+    assert bake_reason(states, states, False) == (False, "skipping unchanged frames is disabled")
+    assert bake_reason(states, {"World": 3, "Bake Settings": 2}, True) == (False, "changed: World")
+
+
+def test_bake_reason_lists_at_most_five_changes():
+    previous = {"Input {}".format(i): 0 for i in range(8)}
+    current = {"Input {}".format(i): 1 for i in range(8)}
+    skip, reason = bake_reason(previous, current, True)
+    assert not skip
+    assert reason == "changed: Input 0, Input 1, Input 2, Input 3, Input 4, 3 more"
+
+
+def test_light_influence():
+    assert light_influence(light_state((1.0, 2.0, 3.0))) == None
+    center, radius = light_influence(light_state((1.0, 2.0, 3.0), cutoff_distance=4.0))
+    assert np.array_equal(center, [1.0, 2.0, 3.0])
+    assert radius == 4.0
+
+
+def test_proxy_affected_by_light_range():
+    low, high = np.array([-1.0, -1.0, -1.0]), np.array([1.0, 1.0, 1.0])
+    name = "Light \"Lamp\""
+    previous = {name: light_state((5.0, 0.0, 0.0), energy=10.0, cutoff_distance=2.0)}
+    near = {name: light_state((5.0, 0.0, 0.0), energy=20.0, cutoff_distance=4.5)}
+    far = {name: light_state((5.0, 0.0, 0.0), energy=20.0, cutoff_distance=2.0)}
+
+    assert proxy_affected([name], previous, near, low, high)
+    assert not proxy_affected([name], previous, far, low, high)
+    # A light moving into range affects the proxy, as does one moving out.
+    moved = {name: light_state((2.0, 0.0, 0.0), cutoff_distance=2.0)}
+    assert proxy_affected([name], previous, moved, low, high)
+    assert proxy_affected([name], moved, previous, low, high)
+
+
+def test_proxy_affected_by_other_changes():
+    low, high = np.zeros(3), np.ones(3)
+    name = "Light \"Sun\""
+    unlimited = {name: light_state((100.0, 0.0, 0.0))}
+    assert proxy_affected([name], {}, unlimited, low, high)
+    assert proxy_affected(["Proxy \"Wall\""], {}, {}, low, high)
+    assert proxy_affected(["World"], {}, {}, low, high)
+    assert not proxy_affected(["Visible Proxies"], {}, {}, low, high)
+    assert not proxy_affected([], {}, {}, low, high)
+    # A removed light with a limited range only affects what was near it.
+    limited = {name: light_state((100.0, 0.0, 0.0), cutoff_distance=1.0)}
+    assert not proxy_affected([name], limited, {}, low, high)
+
+
+def test_tracker():
+    name = "Light \"Lamp\""
+    floor = fake_proxy("Floor", (0.0, 0.0, 0.0))
+    wall = fake_proxy("Wall", (10.0, 0.0, 0.0))
+    states = {name: light_state((0.0, 0.0, 2.0), cutoff_distance=3.0), "World": 1}
+
+    tracker = ProxyBakeTracker()
+    assert tracker.dirty_proxies([], states) == []
+    assert tracker.dirty_proxies([floor, wall], states) == [floor, wall]
+
+    tracker.record([floor, wall], states)
+    assert tracker.dirty_proxies([floor, wall], states) == []
+
+    brighter = {**states, name: light_state((0.0, 0.0, 2.0), energy=50.0, cutoff_distance=3.0)}
+    assert tracker.dirty_proxies([floor, wall], brighter) == [floor]
+    assert tracker.dirty_proxies([floor, wall], {**states, "World": 2}) == [floor, wall]
+
+    # Only the baked proxies are brought up to date.
+    tracker.record([floor], brighter)
+    assert tracker.dirty_proxies([floor, wall], brighter) == []
+    assert tracker.dirty_proxies([floor, wall], states) == [floor]
+    assert tracker.dirty_proxies([fake_proxy("Roof", (0.0, 0.0, 5.0))], states) != []
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from fakes import FakeCollection, fake_quad_object, empty_object, translation
+from compify.mesh_utils import FINGERPRINT_SAMPLES, mesh_fingerprint, world_surface_areas
+
+
+def fake_mesh(co, edges=0, loops=0, polygons=0):
+    co = np.asarray(co, dtype=np.float32).reshape(-1, 3)
+    return SimpleNamespace(
+        vertices=FakeCollection(len(co), co=co),
+        edges=FakeCollection(edges),
+        loops=FakeCollection(loops),
+        polygons=FakeCollection(polygons),
+    )
+
+
+def quad():
+    return fake_mesh([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], edges=4, loops=4, polygons=1)
+
+
+def test_same_mesh_same_fingerprint():
+    assert mesh_fingerprint(quad()) == mesh_fingerprint(quad())
+
+
+def test_empty_mesh():
+    empty = fake_mesh(np.empty((0, 3)))
+    assert mesh_fingerprint(empty) == mesh_fingerprint(fake_mesh(np.empty((0, 3))))
+    assert mesh_fingerprint(empty) != mesh_fingerprint(quad())
+    assert mesh_fingerprint(empty) != mesh_fingerprint(empty, extra=(1,))
+
+
+def test_moved_vertex_changes_fingerprint():
+    moved = quad()
+    moved.vertices.attributes["co"][2, 2] = 0.001
+    assert mesh_fingerprint(moved) != mesh_fingerprint(quad())
+
+
+def test_counts_change_fingerprint():
+    mesh = quad()
+    mesh.polygons.count = 2
+    assert mesh_fingerprint(mesh) != mesh_fingerprint(quad())
+
+
+def test_extra_changes_fingerprint():
+    assert mesh_fingerprint(quad(), extra=(0.1, 2)) != mesh_fingerprint(quad(), extra=(0.1, 3))
+    assert mesh_fingerprint(quad(), extra=(0.1, 2)) == mesh_fingerprint(quad(), extra=[0.1, 2])
+
+
+def test_unsampled_vertex_changes_fingerprint():
+    # With more vertices than are sampled, a change to a vertex that's
+    # skipped by the sampling is still caught by the position sum.
+    co = np.random.default_rng(0).uniform(-1.0, 1.0, (FINGERPRINT_SAMPLES * 3, 3))
+    moved = co.copy()
+    moved[1, 0] += 0.5
+    assert mesh_fingerprint(fake_mesh(moved)) != mesh_fingerprint(fake_mesh(co))
+
+
+def test_world_surface_areas():
+    square = [[0, 0], [1, 0], [1, 1], [0, 1]]
+    plain = fake_quad_object([[0, 1, 2, 3]] * 2, [square] * 2, areas=[1.5, 2.5])
+    scaled = fake_quad_object([[0, 1, 2, 3]], [square], areas=[1.0], matrix_world=translation(5, 0, 0, scale=3.0))
+    areas = world_surface_areas([plain, empty_object(), scaled])
+
+    assert np.allclose(areas, [4.0, 0.0, 9.0])
+    assert len(world_surface_areas([])) == 0
@@ -0,0 +1,287 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from fakes import FakeCollection, fake_quad_object, square, empty_object, object_uvs
+
+from compify.uv_utils import \
+    uv_bounds, \
+    leftmost_u, \
+    island_margin_fraction, \
+    offset_uvs, \
+    udim_tile_offset, \
+    assign_udim_tiles, \
+    uv_areas, \
+    scale_uvs, \
+    connected_components, \
+    uv_island_indices, \
+    rasterize_uv_islands, \
+    rasterize_triangles, \
+    uv_layout_hash
+
+
+def test_uv_bounds():
+    first = fake_quad_object([[0, 1, 2, 3], [4, 5, 6, 7]], [square(0.1, 0.2, 0.3), square(0.6, 0.05, 0.1)])
+    second = fake_quad_object([[0, 1, 2, 3]], [square(-0.5, 1.5, 0.25)])
+    bounds = uv_bounds([first, empty_object(), second], "UV")
+
+    assert bounds.shape == (3, 4)
+    assert np.allclose(bounds[0], [0.1, 0.05, 0.7, 0.5])
+    assert list(bounds[1]) == [np.inf, np.inf, -np.inf, -np.inf]
+    assert np.allclose(bounds[2], [-0.5, 1.5, -0.25, 1.75])
+    assert uv_bounds([], "UV").shape == (0, 4)
+
+
+def test_uv_bounds_reuses_buffer_across_mesh_sizes():
+    # A smaller mesh after a bigger one must only see its own UVs.
+    big = fake_quad_object([[0, 1, 2, 3]] * 3, [square(0.0, 0.0, 0.1)] * 2 + [square(0.9, 0.9, 0.1)])
+    small = fake_quad_object([[0, 1, 2, 3]], [square(0.4, 0.4, 0.1)])
+    bounds = uv_bounds([big, small], "UV")
+    assert np.allclose(bounds[1], [0.4, 0.4, 0.5, 0.5])
+
+
+def test_leftmost_u():
+    objects = [
+        fake_quad_object([[0, 1, 2, 3]], [square(0.3, 0.0, 0.1)]),
+        empty_object(),
+        fake_quad_object([[0, 1, 2, 3]], [square(0.2, 0.5, 0.1)]),
+    ]
+    assert np.isclose(leftmost_u(objects, "UV"), 0.2)
+    assert leftmost_u([], "UV") == np.inf
+    assert leftmost_u([empty_object()], "UV") == np.inf
+
+
+def test_island_margin_fraction():
+    # Twice the bake margin between islands, plus a quarter.
+    assert island_margin_fraction(4, 1024) == 4 * 2 * 1.25 / 1024
+    assert island_margin_fraction(4, 2048) == island_margin_fraction(2, 1024)
+    assert island_margin_fraction(0, 1024) == 0.0
+    # Capped for margins too wide for the image.
+    assert island_margin_fraction(100, 64) == 0.5
+
+
+def test_offset_uvs_moves_shared_meshes_once():
+    obj = fake_quad_object([[0, 1, 2, 3]], [square(0.25, 0.5, 0.25)])
+    instance = SimpleNamespace(data=obj.data)
+    other = fake_quad_object([[0, 1, 2, 3]], [square(0.0, 0.0, 0.5)])
+    offset_uvs([obj, instance, other], "UV", (2, 1))
+
+    assert np.allclose(object_uvs(obj), np.array(square(2.25, 1.5, 0.25)))
+    assert np.allclose(object_uvs(other), np.array(square(2.0, 1.0, 0.5)))
+    offset_uvs([empty_object()], "UV", (1, 0))
+
+
+def test_udim_tile_offset():
+    assert udim_tile_offset(0) == (0, 0)
+    assert udim_tile_offset(9) == (9, 0)
+    assert udim_tile_offset(10) == (0, 1)
+    assert udim_tile_offset(23) == (3, 2)
+
+
+def test_assign_udim_tiles_balances_areas():
+    tiles = assign_udim_tiles([5.0, 4.0, 3.0, 3.0, 1.0], 2, [-1] * 5)
+    loads = np.bincount(tiles, weights=[5.0, 4.0, 3.0, 3.0, 1.0], minlength=2)
+    assert list(tiles) == [0, 1, 1, 0, 1]
+    assert list(loads) == [8.0, 8.0]
+
+
+def test_assign_udim_tiles_keeps_fixed_tiles():
+    # The fixed item weighs down tile 0, so the new ones go elsewhere.
+    # Fixed tiles that no longer exist are reassigned.
+    tiles = assign_udim_tiles([10.0, 2.0, 2.0, 1.0], 3, [0, -1, 5, -1])
+    assert tiles[0] == 0
+    assert 0 not in tiles[1:]
+    assert np.all(tiles < 3)
+
+
+def test_assign_udim_tiles_edge_cases():
+    assert len(assign_udim_tiles([], 4, [])) == 0
+    assert list(assign_udim_tiles([1.0, 2.0, 3.0], 1, [-1, -1, -1])) == [0, 0, 0]
+    # More tiles than items, with ties going to the lowest tile.
+    assert list(assign_udim_tiles([1.0, 1.0], 4, [-1, -1])) == [0, 1]
+
+
+def test_uv_areas():
+    first = fake_quad_object([[0, 1, 2, 3], [4, 5, 6, 7]], [square(0.0, 0.0, 0.5), square(0.5, 0.5, 0.25)])
+    # Clockwise winding counts the same.
+    second = fake_quad_object([[0, 1, 2, 3]], [square(0.0, 0.0, 0.1)[::-1]])
+    areas = uv_areas([first, empty_object(), second], "UV")
+    assert np.allclose(areas, [0.3125, 0.0, 0.01])
+    assert len(uv_areas([], "UV")) == 0
+
+
+def test_uv_areas_triangle_and_unsorted_loops():
+    # A triangle whose loops are stored after those of a quad listed
+    # after it.
+    obj = fake_quad_object([[0, 1, 2, 3]], [square(0.0, 0.0, 0.5)])
+    obj.data.loops = FakeCollection(7)
+    obj.data.polygons = FakeCollection(2, loop_start=[4, 0], loop_total=[3, 4])
+    obj.data.uv_layers["UV"].data = FakeCollection(7, uv=square(0.0, 0.0, 0.5) + [[0, 0], [1, 0], [0, 1]])
+    assert np.allclose(uv_areas([obj], "UV"), [0.75])
+
+
+def test_scale_uvs():
+    obj = fake_quad_object([[0, 1, 2, 3], [4, 5, 6, 7]], [square(0.0, 0.0, 0.25), square(0.75, 0.75, 0.25)])
+    instance = SimpleNamespace(data=obj.data)
+    other = fake_quad_object([[0, 1, 2, 3]], [square(0.0, 0.0, 1.0)])
+    scale_uvs([obj, instance, other, empty_object()], "UV", [0.5, 0.5, 2.0, 3.0])
+
+    # Scaled around the center of each mesh's bounds, and only once for
+    # the shared mesh.
+    uvs = object_uvs(obj)
+    assert np.allclose(uvs.min(axis=0), [0.25, 0.25])
+    assert np.allclose(uvs.max(axis=0), [0.75, 0.75])
+    assert np.allclose(uv_areas([obj], "UV"), [0.03125])
+    assert np.allclose(object_uvs(other), np.array(square(-0.5, -0.5, 2.0)))
+
+
+# Brute force reference for `rasterize_triangles()`: tests every texel
+# center against every triangle, later triangles winning.
+def reference_rasterize(labels, p0, p1, p2, triangle_labels):
+    height, width = labels.shape
+    ys, xs = np.mgrid[0:height, 0:width]
+    for a, b, c, label in zip(p0, p1, p2, triangle_labels):
+        area = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+        if area == 0.0:
+            continue
+        inside = np.ones((height, width), dtype=bool)
+        for u, v in [(a, b), (b, c), (c, a)]:
+            inside &= ((v[0] - u[0]) * (ys - u[1]) - (v[1] - u[1]) * (xs - u[0])) * np.sign(area) >= 0.0
+        labels[inside] = label
+
+
+def rasterize(shape, p0, p1, p2, triangle_labels):
+    labels = np.zeros(shape, dtype=np.int32)
+    rasterize_triangles(labels, np.array(p0, float), np.array(p1, float), np.array(p2, float), np.array(triangle_labels))
+    return labels
+
+
+def test_connected_components():
+    a = np.array([0, 1, 5, 4])
+    b = np.array([1, 2, 6, 3])
+    assert list(connected_components(7, a, b)) == [0, 0, 0, 1, 1, 2, 2]
+    assert list(connected_components(3, np.array([], int), np.array([], int))) == [0, 1, 2]
+    assert len(connected_components(0, np.array([], int), np.array([], int))) == 0
+
+
+def test_connected_components_long_chain():
+    # A chain linked up in reverse order, the slowest case for label
+    # propagation alone.
+    count = 1000
+    a = np.arange(count - 1)[::-1]
+    labels = connected_components(count, a, a + 1)
+    assert np.all(labels == 0)
+
+
+def test_rasterize_square():
+    # Two triangles exactly covering texel centers 1-3 in x and 2-4 in y.
+    labels = rasterize(
+        (6, 6),
+        [[1, 2], [1, 2]],
+        [[3, 2], [3, 4]],
+        [[3, 4], [1, 4]],
+        [7, 7],
+    )
+    expected = np.zeros((6, 6), dtype=np.int32)
+    expected[2:5, 1:4] = 7
+    assert np.array_equal(labels, expected)
+
+
+def test_rasterize_degenerate_triangles():
+    labels = rasterize(
+        (8, 8),
+        [[1, 1], [2, 2], [3, 3]],
+        [[5, 5], [2, 2], [3, 3]],
+        [[3, 3], [2, 2], [3, 3.0000001]],
+        [1, 2, 3],
+    )
+    assert not labels.any()
+
+
+def test_rasterize_outside_and_partly_outside():
+    labels = rasterize(
+        (4, 4),
+        [[-10, -10], [-2, -2]],
+        [[-5, -10], [6, -2]],
+        [[-5, -5], [-2, 6]],
+        [1, 2],
+    )
+    expected = np.zeros((4, 4), dtype=np.int32)
+    reference_rasterize(expected, [(-2, -2)], [(6, -2)], [(-2, 6)], [2])
+    assert np.array_equal(labels, expected)
+    assert labels[0, 0] == 2 and labels[3, 3] == 0
+
+
+def test_rasterize_winding_doesnt_matter():
+    p0, p1, p2 = [[0.3, 0.2]], [[6.7, 1.1]], [[2.2, 5.9]]
+    assert np.array_equal(rasterize((8, 8), p0, p1, p2, [1]), rasterize((8, 8), p0, p2, p1, [1]))
+
+
+def test_rasterize_matches_reference():
+    rng = np.random.default_rng(0)
+    count = 300
+    centers = rng.uniform(-4.0, 68.0, (count, 1, 2))
+    # Mostly small triangles, with a few big ones, so several batch sizes
+    # are used.
+    sizes = np.where(rng.random(count) < 0.1, 40.0, 4.0)[:, None, None]
+    corners = centers + rng.uniform(-1.0, 1.0, (count, 3, 2)) * sizes
+    triangle_labels = np.arange(1, count + 1)
+
+    # Overlapping triangles may win in either order, so compare triangle by
+    # triangle coverage instead of the final labels.
+    labels = rasterize((64, 64), corners[:, 0], corners[:, 1], corners[:, 2], triangle_labels)
+    expected = np.zeros((64, 64), dtype=np.int32)
+    reference_rasterize(expected, corners[:, 0], corners[:, 1], corners[:, 2], triangle_labels)
+    assert np.array_equal(labels > 0, expected > 0)
+    for label in np.unique(labels[labels > 0]):
+        single = np.zeros((64, 64), dtype=np.int32)
+        reference_rasterize(single, corners[label - 1:label, 0], corners[label - 1:label, 1], corners[label - 1:label, 2], [label])
+        assert np.all(single[labels == label] == label)
+
+
+def test_rasterize_huge_triangle():
+    # Bigger than a single batch, so it's rasterized in bands of rows.
+    p0, p1, p2 = [[-0.5, -0.5]], [[1100.0, 3.0]], [[7.0, 1050.0]]
+    labels = rasterize((1040, 1040), p0, p1, p2, [5])
+    expected = np.zeros((1040, 1040), dtype=np.int32)
+    reference_rasterize(expected, np.array(p0), np.array(p1), np.array(p2), [5])
+    assert np.array_equal(labels, expected)
+
+
+def test_uv_island_indices():
+    # Quads 0 and 1 share an edge with matching UVs, quads 1 and 2 share
+    # an edge whose UVs are split, and quad 3 is on its own.
+    obj = fake_quad_object(
+        [[0, 1, 4, 3], [1, 2, 5, 4], [2, 6, 7, 5], [8, 9, 10, 11]],
+        [square(0.0, 0.0, 0.1), square(0.1, 0.0, 0.1), square(0.5, 0.5, 0.1), square(0.8, 0.8, 0.1)],
+    )
+    assert list(uv_island_indices(obj.data, "UV")) == [0, 0, 1, 2]
+
+
+def test_uv_island_indices_empty_mesh():
+    obj = empty_object()
+    assert len(uv_island_indices(obj.data, "UV")) == 0
+
+
+def test_rasterize_uv_islands():
+    first = fake_quad_object([[0, 1, 2, 3]], [square(0.0, 0.0, 0.5)])
+    empty = empty_object()
+    second = fake_quad_object([[0, 1, 2, 3], [4, 5, 6, 7]], [square(0.5, 0.5, 0.25), square(0.75, 0.0, 0.25)])
+    labels, label_objects = rasterize_uv_islands([first, empty, second], "UV", 8, 8)
+
+    assert list(label_objects) == [-1, 0, 2, 2]
+    expected = np.zeros((8, 8), dtype=np.int32)
+    expected[0:4, 0:4] = 1
+    expected[4:6, 4:6] = 2
+    expected[0:2, 6:8] = 3
+    assert np.array_equal(labels, expected)
+
+
+def test_uv_layout_hash():
+    obj = fake_quad_object([[0, 1, 2, 3]], [square(0.0, 0.0, 0.5)])
+    same = fake_quad_object([[0, 1, 2, 3]], [square(0.0, 0.0, 0.5)])
+    moved = fake_quad_object([[0, 1, 2, 3]], [square(0.25, 0.0, 0.5)])
+    empty = empty_object()
+    assert uv_layout_hash(obj.data, "UV") == uv_layout_hash(same.data, "UV")
+    assert uv_layout_hash(obj.data, "UV") != uv_layout_hash(moved.data, "UV")
+    assert uv_layout_hash(empty.data, "UV") == uv_layout_hash(empty.data, "UV")
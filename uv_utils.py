@@ -1,10 +1,369 @@
-from math import inf
-
-
-def leftmost_u(mesh_objects, uv_layer_name):
-    leftmost = inf
-    for obj in mesh_objects:
-        uvs = obj.data.uv_layers[uv_layer_name].data
-        for uv in uvs:
-            leftmost = min(leftmost, uv.uv[0])
-    return leftmost
+import hashlib
+
+import numpy as np
+
+
+# Computes the UV bounds of each of the given mesh objects for the named
+# UV layer.
+#
+# The UVs are read in bulk with `foreach_get` into a single preallocated
+# float32 buffer (sized for the largest mesh), so this is fast even with
+# millions of loops.
+#
+# Returns an Nx4 float array with one `(min_u, min_v, max_u, max_v)` row
+# per object, in the same order as `mesh_objects`.  Objects without any
+# loops get `(inf, inf, -inf, -inf)`.
+def uv_bounds(mesh_objects, uv_layer_name):
+    mesh_objects = list(mesh_objects)
+    bounds = np.empty((len(mesh_objects), 4), dtype=np.float64)
+    bounds[:, :2] = np.inf
+    bounds[:, 2:] = -np.inf
+
+    max_loops = max((len(obj.data.loops) for obj in mesh_objects), default=0)
+    buffer = np.empty(max_loops * 2, dtype=np.float32)
+
+    for i, obj in enumerate(mesh_objects):
+        loop_count = len(obj.data.loops)
+        if loop_count == 0:
+            continue
+        uvs = buffer[:loop_count * 2]
+        obj.data.uv_layers[uv_layer_name].data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2)
+        bounds[i, :2] = uvs.min(axis=0)
+        bounds[i, 2:] = uvs.max(axis=0)
+
+    return bounds
+
+
+def leftmost_u(mesh_objects, uv_layer_name):
+    bounds = uv_bounds(mesh_objects, uv_layer_name)
+    if len(bounds) == 0:
+        return np.inf
+    return float(bounds[:, 0].min())
+
+
+# Computes a hash string of a mesh's UVs in the named UV layer, for
+# cheaply detecting whether its UV layout changed.
+def uv_layout_hash(mesh, uv_layer_name):
+    uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+    if len(uvs) > 0:
+        mesh.uv_layers[uv_layer_name].data.foreach_get("uv", uvs)
+    return hashlib.sha1(uvs.tobytes()).hexdigest()
+
+
+# Computes the `island_margin` to pass to Blender's UV packing operators
+# with `margin_method='FRACTION'`, given the bake margin and bake image
+# resolution in pixels.
+#
+# The bake extends each island outwards by `margin_pixels`, so neighbouring
+# islands need twice that between them.  An extra quarter is added as a
+# buffer against pixel-snapping of island edges during the bake.
+def island_margin_fraction(margin_pixels, image_res):
+    return min(margin_pixels * 2.0 * (5.0 / 4.0) / image_res, 0.5)
+
+
+# Pins all UVs of the given mesh objects in the named UV layer.
+#
+# Returns the previous pin state of each mesh, to be passed to
+# `restore_uv_pins()` afterwards.
+def pin_uvs(mesh_objects, uv_layer_name):
+    saved = {}
+    for obj in mesh_objects:
+        mesh = obj.data
+        if mesh in saved:
+            continue
+        uv_data = mesh.uv_layers[uv_layer_name].data
+        pins = np.empty(len(mesh.loops), dtype=bool)
+        uv_data.foreach_get("pin_uv", pins)
+        saved[mesh] = pins
+        uv_data.foreach_set("pin_uv", np.ones(len(mesh.loops), dtype=bool))
+    return saved
+
+
+def restore_uv_pins(saved, uv_layer_name):
+    for mesh, pins in saved.items():
+        mesh.uv_layers[uv_layer_name].data.foreach_set("pin_uv", pins)
+
+
+# Translates all UVs of the given mesh objects in the named UV layer by
+# `offset`, a `(u, v)` pair.  Meshes shared between objects are only
+# translated once.
+def offset_uvs(mesh_objects, uv_layer_name, offset):
+    meshes = []
+    for obj in mesh_objects:
+        if obj.data not in meshes:
+            meshes.append(obj.data)
+
+    for mesh in meshes:
+        uv_data = mesh.uv_layers[uv_layer_name].data
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        uv_data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2)
+        uvs += np.array(offset, dtype=np.float32)
+        uv_data.foreach_set("uv", uvs.ravel())
+
+
+# Returns the UV space `(u, v)` offset of the given zero-based UDIM tile
+# index (i.e. tile number 1001 + `tile`).
+def udim_tile_offset(tile):
+    return (tile % 10, tile // 10)
+
+
+# Distributes items across `tile_count` UDIM tiles, balancing the total
+# `areas` on each tile.
+#
+# `fixed_tiles` gives an already-assigned tile index for each item, or -1
+# for items that should be (re)assigned.  Fixed items count towards the
+# balance but are never moved.  Returns the tile index of each item.
+def assign_udim_tiles(areas, tile_count, fixed_tiles):
+    areas = np.asarray(areas, dtype=np.float64)
+    tiles = np.array(fixed_tiles, dtype=np.int64)
+    tiles[tiles >= tile_count] = -1
+
+    loads = np.zeros(tile_count, dtype=np.float64)
+    np.add.at(loads, tiles[tiles >= 0], areas[tiles >= 0])
+
+    # Largest first, each onto the currently least loaded tile.
+    for i in np.argsort(-areas, kind='stable'):
+        if tiles[i] < 0:
+            tiles[i] = np.argmin(loads)
+            loads[tiles[i]] += areas[i]
+
+    return tiles
+
+
+# Computes the total UV space area of each of the given mesh objects in
+# the named UV layer.
+#
+# Returns a float array with one entry per object.
+def uv_areas(mesh_objects, uv_layer_name):
+    mesh_objects = list(mesh_objects)
+    areas = np.zeros(len(mesh_objects), dtype=np.float64)
+
+    for i, obj in enumerate(mesh_objects):
+        mesh = obj.data
+        loop_count = len(mesh.loops)
+        polygon_count = len(mesh.polygons)
+        if loop_count == 0 or polygon_count == 0:
+            continue
+
+        uvs = np.empty(loop_count * 2, dtype=np.float32)
+        mesh.uv_layers[uv_layer_name].data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2).astype(np.float64)
+        loop_starts = np.empty(polygon_count, dtype=np.int32)
+        mesh.polygons.foreach_get("loop_start", loop_starts)
+        loop_totals = np.empty(polygon_count, dtype=np.int32)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+
+        # Shoelace formula over each polygon's loops.
+        next_loop = np.arange(1, loop_count + 1)
+        next_loop[loop_starts + loop_totals - 1] = loop_starts
+        cross = uvs[:, 0] * uvs[next_loop, 1] - uvs[next_loop, 0] * uvs[:, 1]
+        order = np.argsort(loop_starts)
+        polygon_areas = np.add.reduceat(cross, loop_starts[order])
+        areas[i] = np.abs(polygon_areas).sum() * 0.5
+
+    return areas
+
+
+# Scales the UVs of each of the given mesh objects in the named UV layer
+# by the corresponding factor in `scales`, around the center of that
+# mesh's UV bounds.  Meshes shared between objects are only scaled once.
+def scale_uvs(mesh_objects, uv_layer_name, scales):
+    done = set()
+    for obj, scale in zip(mesh_objects, scales):
+        mesh = obj.data
+        if mesh in done or len(mesh.loops) == 0:
+            continue
+        done.add(mesh)
+
+        uv_data = mesh.uv_layers[uv_layer_name].data
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        uv_data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2)
+        center = (uvs.min(axis=0) + uvs.max(axis=0)) * 0.5
+        uvs -= center
+        uvs *= scale
+        uvs += center
+        uv_data.foreach_set("uv", uvs.ravel())
+
+
+# Labels the connected components of a graph with `count` nodes and edges
+# between nodes `a[i]` and `b[i]`.
+#
+# Returns an int array with a component index (0-based and contiguous,
+# in order of each component's lowest node) per node.
+def connected_components(count, a, b):
+    labels = np.arange(count)
+    while True:
+        # Propagate the lowest label across each edge, and then jump
+        # pointers so that long chains converge quickly.
+        lowest = np.minimum(labels[a], labels[b])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, a, lowest)
+        np.minimum.at(new_labels, b, lowest)
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return np.unique(labels, return_inverse=True)[1]
+
+
+# Finds the UV islands of a mesh in the named UV layer: groups of polygons
+# connected through edges whose UVs match on both sides.
+#
+# Returns an int array with an island index (0-based and contiguous) per
+# polygon.
+def uv_island_indices(mesh, uv_layer_name):
+    loop_count = len(mesh.loops)
+    polygon_count = len(mesh.polygons)
+    if loop_count == 0 or polygon_count == 0:
+        return np.zeros(polygon_count, dtype=np.int64)
+
+    uvs = np.empty(loop_count * 2, dtype=np.float32)
+    mesh.uv_layers[uv_layer_name].data.foreach_get("uv", uvs)
+    uvs = uvs.reshape(-1, 2)
+    vertices = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertices)
+    loop_starts = np.empty(polygon_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    loop_totals = np.empty(polygon_count, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+
+    order = np.argsort(loop_starts)
+    loop_polygons = np.repeat(order, loop_totals[order])
+    next_loop = np.arange(1, loop_count + 1)
+    next_loop[loop_starts + loop_totals - 1] = loop_starts
+
+    # Key each loop's edge by its vertices and their UVs, in a consistent
+    # order, so that the two sides of a UV-connected edge get equal keys.
+    v0 = vertices
+    v1 = vertices[next_loop]
+    uv0 = np.round(uvs * 2**20).astype(np.int64)
+    uv1 = uv0[next_loop]
+    swap = v0 > v1
+    keys = np.empty((loop_count, 6), dtype=np.int64)
+    keys[:, 0] = np.where(swap, v1, v0)
+    keys[:, 1] = np.where(swap, v0, v1)
+    keys[:, 2:4] = np.where(swap[:, None], uv1, uv0)
+    keys[:, 4:6] = np.where(swap[:, None], uv0, uv1)
+    _, edge_ids = np.unique(keys, axis=0, return_inverse=True)
+    edge_ids = edge_ids.ravel()
+
+    by_edge = np.argsort(edge_ids, kind='stable')
+    same = edge_ids[by_edge][1:] == edge_ids[by_edge][:-1]
+    a = loop_polygons[by_edge][:-1][same]
+    b = loop_polygons[by_edge][1:][same]
+
+    return connected_components(polygon_count, a, b)
+
+
+# Rasterizes the UV islands of the given mesh objects in the named UV
+# layer into a `width` x `height` texel grid, the way the bake covers
+# texels: a texel belongs to a triangle if its center is inside it.
+#
+# Returns a `(labels, label_objects)` tuple.  `labels` is a (height,
+# width) int array with an island label per texel, unique across all the
+# objects, and 0 for texels not covered by any island.  `label_objects`
+# maps each label to the index of the object it belongs to (-1 for 0).
+def rasterize_uv_islands(mesh_objects, uv_layer_name, width, height):
+    labels = np.zeros((height, width), dtype=np.int32)
+    label_objects = [-1]
+
+    for object_index, obj in enumerate(mesh_objects):
+        mesh = obj.data
+        loop_count = len(mesh.loops)
+        polygon_count = len(mesh.polygons)
+        if loop_count == 0 or polygon_count == 0:
+            continue
+
+        islands = uv_island_indices(mesh, uv_layer_name) + len(label_objects)
+        label_objects += [object_index] * (int(islands.max()) + 1 - len(label_objects))
+
+        uvs = np.empty(loop_count * 2, dtype=np.float32)
+        mesh.uv_layers[uv_layer_name].data.foreach_get("uv", uvs)
+        # In texel space, with texel centers at integer coordinates.
+        points = uvs.reshape(-1, 2).astype(np.float64) * (width, height) - 0.5
+        loop_starts = np.empty(polygon_count, dtype=np.int32)
+        mesh.polygons.foreach_get("loop_start", loop_starts)
+        loop_totals = np.empty(polygon_count, dtype=np.int32)
+        mesh.polygons.foreach_get("loop_total", loop_totals)
+
+        # Fan triangulate the polygons.
+        triangle_counts = np.maximum(loop_totals - 2, 0)
+        triangle_polygons = np.repeat(np.arange(polygon_count), triangle_counts)
+        first_triangles = np.cumsum(triangle_counts) - triangle_counts
+        fan_index = np.arange(len(triangle_polygons)) - np.repeat(first_triangles, triangle_counts) + 1
+        p0 = points[loop_starts[triangle_polygons]]
+        p1 = points[loop_starts[triangle_polygons] + fan_index]
+        p2 = points[loop_starts[triangle_polygons] + fan_index + 1]
+        triangle_labels = islands[triangle_polygons]
+
+        rasterize_triangles(labels, p0, p1, p2, triangle_labels)
+
+    return (labels, np.array(label_objects, dtype=np.int64))
+
+
+# Writes `triangle_labels` into the texels of `labels` whose centers
+# (at integer coordinates) are inside the triangles `p0`, `p1`, `p2`
+# (Nx2 arrays of texel space points).
+#
+# Triangles are processed in batches of similar bounding box size, with
+# every texel of each batch's bounding boxes tested at once.  Triangles
+# too big for that are processed one at a time, in bands of rows, so that
+# no more than about `BATCH_TEXELS` texels are ever tested at once.
+def rasterize_triangles(labels, p0, p1, p2, triangle_labels):
+    BATCH_TEXELS = 2**20
+    height, width = labels.shape
+
+    corners = np.stack([p0, p1, p2], axis=1)
+    low = np.maximum(np.ceil(corners.min(axis=1)), 0).astype(np.int64)
+    high = np.minimum(np.floor(corners.max(axis=1)), (width - 1, height - 1)).astype(np.int64)
+    extent = (high - low + 1).max(axis=1)
+    area = (p1[:, 0] - p0[:, 0]) * (p2[:, 1] - p0[:, 1]) - (p1[:, 1] - p0[:, 1]) * (p2[:, 0] - p0[:, 0])
+    drawable = (extent > 0) & (high >= low).all(axis=1) & (area != 0.0)
+    triangles = (p0, p1, p2, area, triangle_labels)
+
+    size = 1
+    while drawable.any():
+        batch = np.nonzero(drawable & (extent <= size))[0]
+        drawable[batch] = False
+        if size * size <= BATCH_TEXELS:
+            chunk = BATCH_TEXELS // (size * size)
+            for start in range(0, len(batch), chunk):
+                tris = batch[start:start + chunk]
+                rasterize_boxes(labels, triangles, tris, low[tris], high[tris], size, size)
+        else:
+            rows = max(1, BATCH_TEXELS // size)
+            for tri in batch:
+                for y in range(low[tri, 1], high[tri, 1] + 1, rows):
+                    band_low = np.array([[low[tri, 0], y]])
+                    band_high = np.array([[high[tri, 0], min(y + rows - 1, high[tri, 1])]])
+                    rasterize_boxes(labels, triangles, np.array([tri]), band_low, band_high, size, rows)
+        size *= 2
+
+
+# Writes the labels of the triangles with indices `tris` into the texels
+# of `labels` inside them, testing the texels of each triangle's box from
+# `low` to `high` (inclusive texel coordinates, at most `box_width` x
+# `box_height` texels).  `triangles` is a `(p0, p1, p2, area,
+# triangle_labels)` tuple as in `rasterize_triangles()`, with `area` the
+# signed doubled area of each triangle.
+def rasterize_boxes(labels, triangles, tris, low, high, box_width, box_height):
+    p0, p1, p2, area, triangle_labels = triangles
+    xs = low[:, 0][:, None, None] + np.arange(box_width)[None, None, :]
+    ys = low[:, 1][:, None, None] + np.arange(box_height)[None, :, None]
+    inside = (xs <= high[:, 0][:, None, None]) & (ys <= high[:, 1][:, None, None])
+
+    # Edge functions, with their signs flipped for clockwise triangles so
+    # that inside is always positive.
+    sign = np.sign(area[tris])[:, None, None]
+    for a, b in [(p0, p1), (p1, p2), (p2, p0)]:
+        ax = a[tris, 0][:, None, None]
+        ay = a[tris, 1][:, None, None]
+        bx = b[tris, 0][:, None, None]
+        by = b[tris, 1][:, None, None]
+        inside &= ((bx - ax) * (ys - ay) - (by - ay) * (xs - ax)) * sign >= 0.0
+
+    tri_index, y_index, x_index = np.nonzero(inside)
+    labels[ys[tri_index, y_index, 0], xs[tri_index, 0, x_index]] = triangle_labels[tris[tri_index]]
@@ -0,0 +1,191 @@
+import hashlib
+
+import bpy
+import numpy as np
+
+from .names import \
+    compify_mat_name, \
+    VERTEX_PROJECTION_NODE_NAME, \
+    PROJECTION_ATTRIBUTE_NAME
+from .node_groups import ensure_vertex_projection_group
+from .camera_utils import homogeneous_projection
+
+# Names of the Compify material nodes whose "Vector" input takes the
+# footage projection.
+PROJECTED_NODE_NAMES = ["Input Footage", "Feathered Square"]
+
+# The projection states (see `write_vertex_projection()`) that each proxy
+# mesh's projection attribute was last written for, by mesh name.
+written_states = {}
+
+
+# Ensures that the material has a vertex projection node next to its
+# camera projection node, adding one if it's missing.
+#
+# Returns the vertex projection node.
+def ensure_vertex_projection_node(material):
+    nodes = material.node_tree.nodes
+    if VERTEX_PROJECTION_NODE_NAME in nodes:
+        return nodes[VERTEX_PROJECTION_NODE_NAME]
+
+    camera_project = nodes["Camera Project"]
+
+    node = nodes.new(type='ShaderNodeGroup')
+    node.label = VERTEX_PROJECTION_NODE_NAME
+    node.name = VERTEX_PROJECTION_NODE_NAME
+    node.location = (camera_project.location[0], camera_project.location[1] + 200.0)
+    node.node_tree = ensure_vertex_projection_group()
+    return node
+
+
+# Checks whether the material's footage currently takes its projection
+# from the vertex projection node.
+def uses_vertex_projection(material):
+    links = material.node_tree.nodes[PROJECTED_NODE_NAMES[0]].inputs['Vector'].links
+    return len(links) > 0 and links[0].from_node.name == VERTEX_PROJECTION_NODE_NAME
+
+
+# Makes the material's footage take its projection from the vertex
+# projection node if `use_vertex` is True, and from the camera projection
+# node otherwise.
+#
+# Links are only touched if they need to change, since relinking makes
+# EEVEE recompile the material.
+def set_projection_source(material, use_vertex):
+    nodes = material.node_tree.nodes
+    if use_vertex:
+        source = ensure_vertex_projection_node(material).outputs['Vector']
+    else:
+        source = nodes["Camera Project"].outputs['Vector']
+
+    for name in PROJECTED_NODE_NAMES:
+        socket = nodes[name].inputs['Vector']
+        if len(socket.links) == 1 and socket.links[0].from_socket == source:
+            continue
+        material.node_tree.links.new(source, socket)
+
+
+# Writes the footage projection of each proxy's vertices on the current
+# frame into its mesh's projection attribute, in homogeneous form (see
+# `camera_utils.homogeneous_projection()`) so that it's exact across
+# whole faces and not just at the vertices.  The evaluated vertex
+# positions are used, so deforming proxies work.
+#
+# Writing the attribute makes the mesh's geometry get re-evaluated (and
+# re-synced by the renderer), so it's only written when the projection
+# actually changed: meshes are skipped if the camera, lens, projection
+# inputs, the proxy's transform, and its evaluated vertex positions are
+# the same as when they were last written.  Otherwise the new projection
+# is still compared against the attribute's values before writing it.
+#
+# Proxies whose evaluated mesh doesn't have the same vertices as their
+# mesh (e.g. due to a Subdivision Surface modifier), or whose mesh is
+# shared with other objects, can't have a per-vertex projection.
+#
+# Returns a list of those proxies.
+def write_vertex_projection(context, material):
+    config = context.scene.compify_config
+    depsgraph = context.evaluated_depsgraph_get()
+
+    camera_eval = config.camera.evaluated_get(depsgraph)
+    to_camera = np.array(camera_eval.matrix_world.inverted(), dtype=np.float64)
+    lens = camera_eval.data.lens
+    sensor_width = camera_eval.data.sensor_width
+    shift = (camera_eval.data.shift_x, camera_eval.data.shift_y)
+
+    inputs = material.node_tree.nodes["Camera Project"].inputs
+    location = (inputs['Loc X'].default_value, inputs['Loc Y'].default_value)
+    rotation = inputs['Rotation'].default_value
+    aspect = inputs['Aspect Ratio'].default_value
+
+    unsupported = []
+    for obj in config.geo_collection.objects:
+        if obj.type != 'MESH':
+            continue
+        mesh = obj.data
+        obj_eval = obj.evaluated_get(depsgraph)
+        mesh_eval = obj_eval.data
+        if mesh.users > 1 or len(mesh_eval.vertices) != len(mesh.vertices):
+            unsupported.append(obj)
+            continue
+
+        # The evaluated vertex positions cover deformation as well as
+        # edits to the mesh itself.
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh_eval.vertices.foreach_get("co", co)
+        matrix = to_camera @ np.array(obj_eval.matrix_world, dtype=np.float64)
+        state = (
+            matrix.tobytes(),
+            lens,
+            sensor_width,
+            shift,
+            location,
+            rotation,
+            aspect,
+            hashlib.sha1(co.tobytes()).hexdigest(),
+        )
+
+        attribute = mesh.attributes.get(PROJECTION_ATTRIBUTE_NAME)
+        if attribute != None and (attribute.data_type != 'FLOAT_VECTOR' or attribute.domain != 'POINT'):
+            mesh.attributes.remove(attribute)
+            attribute = None
+        if attribute != None and written_states.get(mesh.name) == state:
+            continue
+
+        local = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+        projected = homogeneous_projection(local, lens, sensor_width, shift, location, rotation, aspect)
+        projected = projected.astype(np.float32).ravel()
+
+        if attribute == None:
+            attribute = mesh.attributes.new(PROJECTION_ATTRIBUTE_NAME, 'FLOAT_VECTOR', 'POINT')
+        else:
+            written = np.empty(len(projected), dtype=np.float32)
+            attribute.data.foreach_get("vector", written)
+            if np.array_equal(written, projected):
+                written_states[mesh.name] = state
+                continue
+        attribute.data.foreach_set("vector", projected)
+        mesh.update()
+        written_states[mesh.name] = state
+
+    return unsupported
+
+
+# Updates the per-vertex footage projection of the proxies for the
+# current frame, and makes the Compify material use it.
+#
+# While any proxy can't use a per-vertex projection (see
+# `write_vertex_projection()`), the material automatically falls back to
+# projecting in the shader with the camera projection node group.
+#
+# Nothing is done while a render job is running without Lock Interface,
+# since the frame change handlers then run on the render thread while the
+# interface can still modify the same data.
+def update_vertex_projection(context):
+    config = context.scene.compify_config
+    material = bpy.data.materials.get(compify_mat_name(context))
+    if material == None or config.camera == None or config.geo_collection == None:
+        return
+    if bpy.app.is_job_running('RENDER') and not context.scene.render.use_lock_interface:
+        return
+
+    unsupported = write_vertex_projection(context, material)
+    if len(unsupported) > 0 and uses_vertex_projection(material):
+        print("Compify: falling back to shader projection, since these proxies can't use vertex projection: {}".format(
+            ", ".join(obj.name for obj in unsupported)
+        ))
+    set_projection_source(material, len(unsupported) == 0)
+
+
+# Makes the Compify material project the footage in the shader again, and
+# removes the per-vertex projection attributes from the proxies.
+def clear_vertex_projection(context):
+    config = context.scene.compify_config
+    material = bpy.data.materials.get(compify_mat_name(context))
+    if material != None:
+        set_projection_source(material, False)
+    written_states.clear()
+    if config.geo_collection != None:
+        for obj in config.geo_collection.objects:
+            if obj.type == 'MESH' and PROJECTION_ATTRIBUTE_NAME in obj.data.attributes:
+                obj.data.attributes.remove(obj.data.attributes[PROJECTION_ATTRIBUTE_NAME])